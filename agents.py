@@ -1,37 +1,104 @@
-from crewai import Agent
-from email_agent import emailer
-
-researcher = Agent(
-    role="Researcher",
-    goal="Conduct in-depth research on given topics",
-    backstory="An expert researcher who finds detailed and reliable information.",
-    allow_delegation=False
-)
-
-writer = Agent(
-    role="Writer",
-    goal="Create engaging and well-structured content",
-    backstory="A skilled writer who can produce articles and blogs.",
-    allow_delegation=False
-)
-
-summarizer = Agent(
-    role="Summarizer",
-    goal="Summarize long texts into concise points",
-    backstory="A summarizer who converts big text into short insights.",
-    allow_delegation=False
-)
-
-reviewer = Agent(
-    role="Reviewer",
-    goal="Review content for accuracy and clarity",
-    backstory="An experienced reviewer ensuring correctness and readability.",
-    allow_delegation=False
-)
-
-orchestrator = Agent(
-    role="Orchestrator",
-    goal="Decide the most appropriate agent (Researcher, Writer, Summarizer, Reviewer) for a given user prompt.",
-    backstory="A seasoned coordinator that understands task requirements and picks the best specialist agent.",
-    allow_delegation=False
-)
\ No newline at end of file
+import threading
+
+from email_agent import EMAILER_SPEC
+
+# Agent definitions; each Agent is only built the first time its role is used
+AGENT_SPECS = {
+    "Researcher": dict(
+        role="Researcher",
+        goal="Conduct in-depth research on given topics",
+        backstory="An expert researcher who finds detailed and reliable information.",
+        allow_delegation=False
+    ),
+    "Writer": dict(
+        role="Writer",
+        goal="Create engaging and well-structured content",
+        backstory="A skilled writer who can produce articles and blogs.",
+        allow_delegation=False
+    ),
+    "Summarizer": dict(
+        role="Summarizer",
+        goal="Summarize long texts into concise points",
+        backstory="A summarizer who converts big text into short insights.",
+        allow_delegation=False
+    ),
+    "Reviewer": dict(
+        role="Reviewer",
+        goal="Review content for accuracy and clarity",
+        backstory="An experienced reviewer ensuring correctness and readability.",
+        allow_delegation=False
+    ),
+    "Orchestrator": dict(
+        role="Orchestrator",
+        goal="Decide the most appropriate agent (Researcher, Writer, Summarizer, Reviewer) for a given user prompt.",
+        backstory="A seasoned coordinator that understands task requirements and picks the best specialist agent.",
+        allow_delegation=False
+    ),
+    "Emailer": EMAILER_SPEC,
+}
+
+# Roles that produce output for a user request, in display order
+ROLE_NAMES = ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer"]
+
+_agents: dict = {}
+_lock = threading.Lock()
+_llm_factory = None
+
+
+def set_llm_factory(factory) -> None:
+    """Build agents with llm=factory(role) from now on; None restores crewai's default LLM.
+
+    Already built agents are dropped so the next get_agent() uses the new LLM
+    (used by bench_offline.py to run without network access).
+    """
+    global _llm_factory
+    with _lock:
+        _llm_factory = factory
+        _agents.clear()
+
+
+def _build_agent(role: str, llm_factory):
+    from crewai import Agent
+
+    spec = AGENT_SPECS[role]
+    if llm_factory is not None:
+        spec = {**spec, "llm": llm_factory(role)}
+    return Agent(**spec)
+
+
+def get_agent(role: str):
+    """Return the Agent for role, importing crewai and building it on first use."""
+    with _lock:
+        agent = _agents.get(role)
+        if agent is None:
+            agent = _build_agent(role, _llm_factory)
+            _agents[role] = agent
+        return agent
+
+
+def new_agent(role: str):
+    """A fresh Agent for role that is not shared, for a run alongside the shared one.
+
+    crewai agents keep per-run state (tools handler, executor, LLM call
+    state), so two runs at the same time need two Agents.
+    """
+    with _lock:
+        llm_factory = _llm_factory
+    return _build_agent(role, llm_factory)
+
+
+_MODULE_ATTRIBUTES = {
+    "researcher": "Researcher",
+    "writer": "Writer",
+    "summarizer": "Summarizer",
+    "reviewer": "Reviewer",
+    "orchestrator": "Orchestrator",
+    "emailer": "Emailer",
+}
+
+
+def __getattr__(name: str):
+    # Keeps `from agents import researcher` working without eager construction
+    if name in _MODULE_ATTRIBUTES:
+        return get_agent(_MODULE_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
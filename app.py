@@ -1,7 +1,14 @@
 import streamlit as st
-import re
+import time
 
-from main import run_all_agents, run_specific_agent, run_with_orchestrator, run_with_orchestrator_multi
+from config import JOB_MAX_WORKERS, JOB_RETENTION_SECONDS, REQUEST_DEADLINE_SECONDS, ROLE_TIMEOUT_SECONDS
+from history import PAGE_SIZE, get_history
+from jobs import FINISHED, JobManager
+from plain_text import to_plain_text
+from hedge import get_hedger
+from ratelimit import get_rate_limiter
+from speculation import get_speculator
+import metrics
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,34 +18,94 @@ st.set_page_config(page_title="Agents UI", page_icon="🤖", layout="wide")
 st.title("Agents UI (Streamlit)")
 
 
-def to_plain_text(value) -> str:
-    """Convert likely-Markdown content to readable plain text for display."""
-    text = str(value or "")
-    # Remove code fences
-    text = re.sub(r"```[\s\S]*?```", lambda m: re.sub(r"^```.*\n|```$", "", m.group(0), flags=re.MULTILINE), text)
-    # Inline code backticks
-    text = text.replace("`", "")
-    # Images ![alt](url) -> alt (url)
-    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", r"\1 (\2)", text)
-    # Links [text](url) -> text (url)
-    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r"\1 (\2)", text)
-    # Bold/italic markers **text** *text* __text__ _text_
-    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-    text = re.sub(r"\*(.*?)\*", r"\1", text)
-    text = re.sub(r"__(.*?)__", r"\1", text)
-    text = re.sub(r"_(.*?)_", r"\1", text)
-    # Headings starting with #, #### -> just the text
-    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
-    # Blockquotes
-    text = re.sub(r"^>\s?", "", text, flags=re.MULTILINE)
-    # List markers - *, -, +, and numbered lists
-    text = re.sub(r"^\s*[-*+]\s+", "- ", text, flags=re.MULTILINE)
-    text = re.sub(r"^\s*\d+\.\s+", lambda m: f"{m.group(0)}", text, flags=re.MULTILINE)
-    # Horizontal rules
-    text = re.sub(r"^\s*([-*_]){3,}\s*$", "", text, flags=re.MULTILINE)
-    # Collapse excessive blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
+ALL_ROLES = ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer"]
+ORCHESTRATE_ROLES = ALL_ROLES + ["Email Delivery"]
+MODE_KEYS = {"Orchestrate": "orchestrate", "All agents": "all", "Force agent": "agent"}
+# Seconds between refreshes while the job on screen is still running
+JOB_POLL_SECONDS = 0.5
+
+
+@st.cache_resource
+def job_manager() -> JobManager:
+    # One bounded worker pool shared by every session and tab of this server
+    return JobManager(JOB_MAX_WORKERS, JOB_RETENTION_SECONDS)
+
+
+def job_label(job: dict) -> str:
+    prompt = job["prompt"] if len(job["prompt"]) <= 40 else job["prompt"][:37] + "..."
+    return f"{job['status']}: {prompt}"
+
+
+def history_label(run: dict) -> str:
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["created"]))
+    prompt = run["prompt"] if len(run["prompt"]) <= 60 else run["prompt"][:57] + "..."
+    return f"#{run['id']} {when}: {prompt}"
+
+
+def render_history() -> None:
+    """Search and page through earlier runs (history.py); reading one never calls the LLM."""
+    store = get_history()
+    if store is None:
+        return
+    with st.expander("History"):
+        query = st.text_input("Search past runs", key="history_query", placeholder="words or word starts, e.g. solid batt")
+        total = store.count(query)
+        pages = max(1, -(-total // PAGE_SIZE))
+        page = min(int(st.number_input("Page", min_value=1, value=1, step=1, key="history_page")), pages)
+        st.caption(f"{total} runs, page {page} of {pages}")
+        runs = store.search(query, PAGE_SIZE, (page - 1) * PAGE_SIZE)
+        if not runs:
+            return
+        labels = {run["id"]: history_label(run) for run in runs}
+        picked = st.selectbox("Run", list(labels), format_func=labels.get, key="history_run")
+        run = store.get(picked)
+        if run is None:
+            return
+        timing = f", {run['wall_s']}s" if run["wall_s"] is not None else ""
+        st.caption(f"{run['mode']}: {', '.join(run['roles'])}{timing}")
+        for role, text in run["outputs"].items():
+            st.markdown(f"**{role}**")
+            if role in run["failed"]:
+                st.error(text)
+            else:
+                st.text(to_plain_text(text))
+        if run["email_status"]:
+            st.caption(f"Email Delivery: {run['email_status']}")
+
+
+def render_job(job: dict, show_partial: bool) -> None:
+    """One expander per role; roles still running show the output received so far."""
+    running = job["status"] not in FINISHED
+    if job["mode"] == "all":
+        st.subheader("Results (All Agents)")
+        roles, idle = ALL_ROLES, "Not selected"
+    elif job["mode"] == "agent":
+        st.subheader(f"Result ({job['role']})")
+        roles, idle = ALL_ROLES, "Not related to this agent"
+    else:
+        if not job["selected"]:
+            if running:
+                st.info("Choosing roles...")
+            return
+        st.subheader(f"Results (Roles: {', '.join(job['selected'])})")
+        roles, idle = ORCHESTRATE_ROLES, "Not selected"
+
+    for role in roles:
+        expanded = role in job["selected"] or role in job["outputs"]
+        if role in job["outputs"]:
+            text = to_plain_text(job["outputs"][role])
+        elif show_partial and role in job["partial"]:
+            text = job["partial"][role]
+        elif expanded:
+            text = "Waiting..." if running else "Cancelled"
+        else:
+            text = idle
+        with st.expander(role, expanded=expanded):
+            if role in job["errors"]:
+                st.error(text)
+            else:
+                st.text(text)
+
 
 with st.sidebar:
     st.header("Mode")
@@ -52,6 +119,16 @@ with st.sidebar:
     if mode == "Force agent":
         force_role = st.selectbox("Agent", ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer"], index=0)
 
+    stream_output = st.checkbox("Stream output as it arrives", value=True)
+
+    st.header("Deadlines")
+    role_timeout = st.number_input(
+        "Per-role timeout (s, 0 = none)", min_value=0, value=int(ROLE_TIMEOUT_SECONDS), step=10
+    )
+    deadline = st.number_input(
+        "Request deadline (s, 0 = none)", min_value=0, value=int(REQUEST_DEADLINE_SECONDS), step=10
+    )
+
 prompt = st.text_area(
     "Prompt",
     value="",
@@ -61,44 +138,105 @@ prompt = st.text_area(
 
 run_clicked = st.button("Run", type="primary")
 
+manager = job_manager()
+# Jobs started from this session (newest last); their results survive reruns
+session_jobs = st.session_state.setdefault("jobs", [])
+
 if run_clicked:
     if not prompt.strip():
         st.warning("Please enter a prompt.")
     else:
-        with st.spinner("Running..."):
-            try:
-                if mode == "All agents":
-                    result = run_all_agents(prompt)
-                    st.subheader("Results (All Agents)")
-                    for role, content in result.items():
-                        with st.expander(role, expanded=True):
-                            st.text(to_plain_text(content))
-
-                elif mode == "Force agent" and force_role:
-                    result = run_specific_agent(prompt, force_role)
-                    st.subheader(f"Result ({force_role})")
-                    for role, content in result.items():
-                        with st.expander(role, expanded=(role == force_role)):
-                            st.text(to_plain_text(content))
-
-                else:
-                    # Orchestrate: detect explicit roles and run them; otherwise fall back
-                    result = run_with_orchestrator_multi(prompt, 4)
-                    # Show selected roles plus remaining as "Not selected"
-                    all_roles = ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer", "Email Delivery"]
-                    chosen_roles = [r for r in all_roles if r in result]
-                    subtitle = ", ".join(chosen_roles) if chosen_roles else "None"
-                    st.subheader(f"Results (Roles: {subtitle})")
-                    for role in all_roles:
-                        content = result.get(role, "Not selected")
-                        with st.expander(role, expanded=(role in chosen_roles)):
-                            st.text(to_plain_text(content))
-
-            except Exception as e:
-                st.error(f"Error: {e}")
+        try:
+            job_id = manager.submit(MODE_KEYS[mode], prompt, force_role, 4, role_timeout, deadline)
+        except ValueError as e:
+            st.error(f"Error: {e}")
+        else:
+            session_jobs.append(job_id)
+            st.session_state["shown_job"] = job_id
+
+snapshots = {job_id: manager.snapshot(job_id) for job_id in session_jobs}
+# Jobs older than JOB_RETENTION_SECONDS are gone from the manager
+session_jobs[:] = [job_id for job_id in session_jobs if snapshots[job_id] is not None]
 
-st.markdown("---")
-# st.caption("Powered by crewai. Ensure OPENAI_API_KEY and SMTP settings are set in your .env.")
+with st.sidebar:
+    if session_jobs:
+        ids = session_jobs[::-1]
+        shown = st.session_state.get("shown_job")
+        picked = st.selectbox(
+            "Jobs (this session)",
+            ids,
+            index=ids.index(shown) if shown in ids else 0,
+            format_func=lambda job_id: job_label(snapshots[job_id]),
+        )
+        st.session_state["shown_job"] = picked
+    counts = manager.stats()
+    st.caption(f"Server jobs: {counts['running']} running, {counts['queued']} queued")
+
+job = snapshots.get(st.session_state.get("shown_job"))
+job_running = job is not None and job["status"] not in FINISHED
+if job is not None:
+    status_col, cancel_col = st.columns([4, 1])
+    status_col.caption(f"Job {job['id']}: {job['status']} ({job['elapsed_s']}s)")
+    if job_running and cancel_col.button("Cancel"):
+        manager.cancel(job["id"])
+        st.rerun()
+    if job["error"]:
+        st.error(f"Error: {job['error']}")
+    render_job(job, stream_output)
+
+render_history()
 
+with st.sidebar:
+    # Rendered last so the summary includes the latest runs
+    with st.expander("Metrics (this server)"):
+        rows = metrics.summarize()
+        if rows:
+            st.dataframe(
+                [
+                    {
+                        "role": row["role"] if row["kind"] == "role" else f"{row['role']} ({row['kind']})",
+                        "runs": row["count"],
+                        "errors": row["errors"],
+                        "cache hits": row["cache_hits"],
+                        "p50 s": row["p50_s"],
+                        "p95 s": row["p95_s"],
+                        "p99 s": row["p99_s"],
+                        "tokens": row["prompt_tokens"] + row["completion_tokens"],
+                        "cost $": row["cost_usd"],
+                    }
+                    for row in rows
+                ],
+                hide_index=True,
+            )
+        else:
+            st.caption("No runs yet.")
+        limiter = get_rate_limiter()
+        if limiter is not None:
+            state = limiter.stats()
+            st.caption(
+                f"LLM limiter: {state['in_flight']} running of {state['concurrency_limit']} allowed, "
+                f"{state['rate_limited']} rate-limit errors, {state['retries']} retries, "
+                f"{state['throttled_s']}s waiting"
+            )
+        speculated = get_speculator().stats()
+        if speculated["started"]:
+            st.caption(
+                f"Speculation: {speculated['hits']} of {speculated['started']} roles started early were chosen "
+                f"({speculated['hit_rate']:.0%}), {speculated['head_start_s']}s head start, "
+                f"{speculated['wasted_tokens']} tokens discarded"
+            )
+        hedger = get_hedger()
+        if hedger is not None:
+            hedges = hedger.stats()
+            st.caption(
+                f"Hedging: {hedges['hedged']} of {hedges['calls']} LLM calls duplicated "
+                f"({hedges['hedge_rate']:.1%}), duplicate answered first in {hedges['won']}"
+            )
 
+st.markdown("---")
+# st.caption("Powered by crewai. Ensure OPENAI_API_KEY and SMTP settings are set in your .env.")
 
+if job_running:
+    # Poll the job; the LLM work itself never reruns with the script
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
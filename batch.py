@@ -0,0 +1,137 @@
+"""Run many prompts from a JSONL file in one process.
+
+Each input line is either a JSON string (the prompt) or an object with a
+"prompt" and an optional "id". Results are appended to the output JSONL as
+soon as each prompt finishes:
+
+    {"id": "...", "prompt": "...", "ok": true, "outputs": {...}, "elapsed_s": 12.3}
+
+The output file is also the checkpoint: on a re-run, ids already written
+with "ok": true are skipped, so an interrupted batch resumes where it
+stopped and failed prompts are retried. A prompt only counts as ok when
+the runner returned no "Error" and no role failed or timed out; otherwise
+its outputs are written with "ok": false and the reason in "error". Prompts without an id are keyed by
+a hash of their text.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from deadline import is_incomplete
+
+
+def prompt_id(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def read_prompts(path: str):
+    """Yield (id, prompt) pairs from a JSONL file, one line at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({exc})") from None
+            if isinstance(item, str):
+                prompt, item_id = item, None
+            elif isinstance(item, dict) and isinstance(item.get("prompt"), str):
+                prompt, item_id = item["prompt"], item.get("id")
+            else:
+                raise ValueError(f'{path}:{line_no}: expected a string or an object with "prompt"')
+            if prompt.strip():
+                yield str(item_id) if item_id is not None else prompt_id(prompt), prompt
+
+
+def completed_ids(output_path: str) -> set[str]:
+    """Ids already written successfully to the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if isinstance(record, dict) and record.get("ok"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def failure(outputs: dict) -> str | None:
+    """Why a runner's outputs are not a success, or None when every role finished."""
+    if "Error" in outputs:
+        return str(outputs["Error"])
+    incomplete = [role for role, text in outputs.items() if is_incomplete(text)]
+    if incomplete:
+        return f"Incomplete roles: {', '.join(incomplete)}"
+    return None
+
+
+def run_batch(input_path: str, output_path: str, runner, concurrency: int = 2, on_result=None) -> dict:
+    """Run runner(prompt) -> dict for every prompt not yet in the output.
+
+    At most `concurrency` prompts run at once and only that many are read
+    ahead from the input. on_result(record) is called after each record is
+    written. Returns a summary with counts and throughput.
+    """
+    concurrency = max(1, int(concurrency))
+    done = completed_ids(output_path)
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    write_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run_one(item_id: str, prompt: str) -> dict:
+        t0 = time.perf_counter()
+        try:
+            outputs = runner(prompt)
+            error = failure(outputs)
+            record = {"id": item_id, "prompt": prompt, "ok": error is None, "outputs": {k: str(v) for k, v in outputs.items()}}
+            if error is not None:
+                record["error"] = error
+        except Exception as exc:
+            record = {"id": item_id, "prompt": prompt, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        record["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        return record
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+        def record_result(future) -> None:
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["completed" if record["ok"] else "failed"] += 1
+            if on_result is not None:
+                on_result(record)
+
+        in_flight = set()
+        seen = set()
+        for item_id, prompt in read_prompts(input_path):
+            if item_id in done or item_id in seen:
+                counts["skipped"] += 1
+                continue
+            seen.add(item_id)
+            if len(in_flight) >= concurrency:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record_result(future)
+            in_flight.add(pool.submit(run_one, item_id, prompt))
+        for future in wait(in_flight).done:
+            record_result(future)
+
+    elapsed = time.perf_counter() - started
+    processed = counts["completed"] + counts["failed"]
+    return {
+        **counts,
+        "elapsed_s": round(elapsed, 2),
+        "prompts_per_min": round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "output": output_path,
+    }
@@ -0,0 +1,162 @@
+"""Per-invocation CLI latency, cold (in-process) vs warm (forwarded to daemon.py).
+
+Both sides run the real CLI in a fresh interpreter with the simulated LLM
+from bench_offline.py, so no network or API key is needed and the LLM time
+is the same small constant on both sides:
+
+  - cold: `main.py --no-daemon ...` imports crewai, builds the agents and runs
+  - warm: `main.py ...` forwards to a daemon started once before the runs
+
+Caches, history and the metrics file are off, so every run reaches the LLM.
+
+Usage:
+    python bench_daemon.py [--mode agent|all|orchestrate] [--runs 5] [--min-speedup 2]
+
+Prints one JSON object; with --min-speedup, exits with status 1 when the
+median cold/warm ratio is lower.
+"""
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+MODE_ARGS = {
+    "agent": ["--agent", "Writer", "Write about renewable energy policy"],
+    "all": ["--all", "Solid-state batteries for electric vehicles"],
+    # No address in the prompt, so no email is queued
+    "orchestrate": ["--orchestrate", "Research and summarize solid-state batteries"],
+}
+
+_SIMULATED = """
+import sys
+sys.path.insert(0, {root!r})
+from bench_offline import PROFILES, SimulatedBackend, make_llm_factory
+import agents
+agents.set_llm_factory(make_llm_factory(SimulatedBackend(PROFILES["fast"])))
+"""
+
+_CLI_PROBE = _SIMULATED + """
+import runpy
+sys.argv = ["main.py"] + {args!r}
+runpy.run_path({main!r}, run_name="__main__")
+"""
+
+_DAEMON_PROBE = _SIMULATED + """
+import asyncio
+from daemon import serve_daemon
+asyncio.run(serve_daemon({socket!r}))
+"""
+
+
+def _environment(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-offline-benchmark",
+        "RESULT_CACHE_DISABLED": "true",
+        "SEMANTIC_CACHE_DISABLED": "true",
+        "LLM_RATE_LIMIT_DISABLED": "true",
+        "HISTORY_PATH": "",
+        "METRICS_JSONL_PATH": "",
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite3"),
+        "DAEMON_SOCKET_PATH": os.path.join(workdir, "daemon.sock"),
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "OTEL_SDK_DISABLED": "true",
+    })
+    return env
+
+
+def _timed(command: list[str], env: dict) -> float:
+    started = time.perf_counter()
+    proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0 or "=== Final Outputs" not in proc.stdout:
+        raise RuntimeError(f"{' '.join(command[:3])} failed:\n{proc.stdout[-500:]}{proc.stderr[-2000:]}")
+    return elapsed
+
+
+def _wait_healthy(socket_path: str, timeout: float) -> float:
+    from daemon_client import call_daemon, daemon_running
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if daemon_running(socket_path) and call_daemon("GET", "/healthz", timeout=5, path=socket_path)[0] == 200:
+            return (time.perf_counter() - started) * 1000
+        time.sleep(0.05)
+    raise RuntimeError(f"Daemon not healthy after {timeout:g}s")
+
+
+def _summary(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "median_ms": round(statistics.median(ordered), 1),
+        "min_ms": round(ordered[0], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+def run(mode: str = "agent", runs: int = 5) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_daemon_")
+    env = _environment(workdir)
+    socket_path = env["DAEMON_SOCKET_PATH"]
+    args = MODE_ARGS[mode]
+    main_path = os.path.join(ROOT, "main.py")
+
+    cold_probe = _CLI_PROBE.format(root=ROOT, args=["--no-daemon"] + args, main=main_path)
+    cold = [_timed([sys.executable, "-c", cold_probe], env) for _ in range(runs)]
+
+    daemon = subprocess.Popen(
+        [sys.executable, "-c", _DAEMON_PROBE.format(root=ROOT, socket=socket_path)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup_ms = _wait_healthy(socket_path, 120)
+        # The client is the plain CLI: nothing simulated on this side
+        warm = [_timed([sys.executable, main_path] + args, env) for _ in range(runs)]
+    finally:
+        from daemon_client import call_daemon
+
+        try:
+            call_daemon("POST", "/shutdown", timeout=5, path=socket_path)
+        except OSError:
+            pass
+        try:
+            daemon.wait(10)
+        except subprocess.TimeoutExpired:
+            daemon.kill()
+
+    cold_summary, warm_summary = _summary(cold), _summary(warm)
+    return {
+        "mode": mode,
+        "runs": runs,
+        "cold": cold_summary,
+        "warm": warm_summary,
+        "daemon_startup_ms": round(startup_ms, 1),
+        "speedup": round(cold_summary["median_ms"] / warm_summary["median_ms"], 2),
+    }
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    mode = argv[argv.index("--mode") + 1] if "--mode" in argv else "agent"
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 5
+    min_speedup = float(argv[argv.index("--min-speedup") + 1]) if "--min-speedup" in argv else None
+    if mode not in MODE_ARGS:
+        raise SystemExit(f"--mode must be one of: {', '.join(MODE_ARGS)}")
+    if importlib.util.find_spec("crewai") is None:
+        raise SystemExit("crewai is not installed; install the project requirements first.")
+    if sys.platform == "win32":
+        raise SystemExit("The daemon needs Unix sockets.")
+
+    report = run(mode, runs)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if min_speedup is not None and report["speedup"] < min_speedup else 0)
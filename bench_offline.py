@@ -0,0 +1,412 @@
+"""Offline benchmark of the orchestration layer with a simulated LLM.
+
+The agents are rebuilt with a local stand-in LLM (agents.set_llm_factory),
+SMTP goes to an in-process sink, and all caches, the LLM rate limiter, the
+run history and the metrics file are off, so the run needs no network and no API key and
+measures the code rather than limiter waits. Each entry point is
+driven at increasing concurrency:
+
+    run_all_agents, run_specific_agent (Writer), run_with_orchestrator_multi
+
+and reported with throughput, latency percentiles, peak RSS and per-phase
+time (role runs, Orchestrator decision, SMTP) next to the time spent inside
+the simulated LLM, whose difference is the framework overhead.
+
+Usage:
+    python bench_offline.py [--profile fast|realistic|flaky] [--concurrency 1,2,4,8]
+                            [--requests N] [--latency-ms 5] [--jitter-ms 2]
+                            [--tokens-per-second 5000] [--output-tokens 200]
+                            [--error-rate 0] [--slow-rate 0] [--slow-factor 1] [--hedge]
+                            [--seed 1] [--json] [--output results.json]
+                            [--baseline results.json] [--max-regression 0.2]
+
+--slow-rate/--slow-factor (or --profile tail) make that share of calls that
+many times slower, like provider-side queueing; --hedge turns on hedged
+calls (hedge.py) and adds hedge counts to each scenario.
+
+With --baseline, exits with status 1 when throughput of any matching
+scenario drops by more than --max-regression (default 20%).
+"""
+import json
+import math
+import os
+import platform
+import random
+import resource
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class LLMProfile:
+    """Simulated LLM behaviour: a call takes latency (+/- jitter) plus output_tokens / tokens_per_second.
+
+    slow_rate of the calls take slow_factor times as long.
+    """
+    latency_ms: float = 5.0
+    jitter_ms: float = 2.0
+    tokens_per_second: float = 5000.0
+    output_tokens: int = 200
+    error_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_factor: float = 1.0
+
+
+PROFILES = {
+    "fast": LLMProfile(),
+    "realistic": LLMProfile(latency_ms=400, jitter_ms=150, tokens_per_second=80, output_tokens=300),
+    "flaky": LLMProfile(error_rate=0.05),
+    "tail": LLMProfile(latency_ms=40, jitter_ms=5, slow_rate=0.03, slow_factor=10),
+}
+
+PROMPTS = {
+    "run_all_agents": "Solid-state batteries for electric vehicles",
+    "run_specific_agent": "Write about renewable energy policy",
+    "run_with_orchestrator_multi": "Research and summarize solid-state batteries and email the results to bench@example.com",
+}
+
+
+class SimulatedBackend:
+    """Shared state behind every simulated LLM instance."""
+
+    def __init__(self, profile: LLMProfile, seed: int = 1):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.busy_s = 0.0
+
+    def complete(self, role: str, prompt: str) -> str:
+        p = self.profile
+        with self._lock:
+            jitter = self._rng.uniform(-p.jitter_ms, p.jitter_ms)
+            tokens = max(1, int(p.output_tokens * self._rng.uniform(0.8, 1.2)))
+            fail = self._rng.random() < p.error_rate
+            slow = self._rng.random() < p.slow_rate
+        duration = max(0.0, p.latency_ms + jitter) / 1000 + tokens / max(p.tokens_per_second, 1e-9)
+        if slow:
+            duration *= p.slow_factor
+        time.sleep(duration)
+        with self._lock:
+            self.calls += 1
+            self.busy_s += duration
+            self.prompt_tokens += len(prompt) // 4
+            if fail:
+                self.errors += 1
+            else:
+                self.completion_tokens += tokens
+        if fail:
+            raise RuntimeError("simulated LLM error")
+        if "Valid roles:" in prompt:
+            # Orchestrator decision
+            return "Thought: I now can give a great answer\nFinal Answer: Researcher, Summarizer"
+        return "Thought: I now can give a great answer\nFinal Answer: " + _markdown_body(role, tokens)
+
+
+def _markdown_body(role: str, tokens: int) -> str:
+    lines = [f"## {role} output", ""]
+    words = 0
+    while words < tokens:
+        lines.append(f"- **Point {len(lines) - 1}**: simulated finding with a [source](https://example.com/{words}) and detail")
+        words += 12
+    return "\n".join(lines)
+
+
+def make_llm_factory(backend: SimulatedBackend):
+    """Return factory(role) -> crewai LLM that answers from backend."""
+    try:
+        from crewai import BaseLLM
+    except ImportError:
+        from crewai.llms.base_llm import BaseLLM
+
+    class SimulatedLLM(BaseLLM):
+        def __init__(self, role: str):
+            super().__init__(model="simulated")
+            self._backend = backend
+            self._role = role
+
+        def call(self, messages, *args, **kwargs):
+            if isinstance(messages, str):
+                prompt = messages
+            else:
+                prompt = "\n".join(str(m.get("content", "")) for m in messages)
+            return self._backend.complete(self._role, prompt)
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return False
+
+        def get_context_window_size(self) -> int:
+            return 128_000
+
+    return SimulatedLLM
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL/RCPT, DATA, NOOP, QUIT
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self._reply("220 bench-sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self._reply("250-bench-sink")
+                self._reply("250 AUTH PLAIN")
+            elif command.startswith("AUTH"):
+                self._reply("235 Authentication successful")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                with self.server.lock:
+                    self.server.messages += 1
+                self._reply("250 OK")
+            elif command.startswith("QUIT"):
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.messages = 0
+        threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+def _configure_environment(smtp_port: int, workdir: str, hedge: bool = False) -> None:
+    # Must run before config.py is imported
+    os.environ.update({
+        "HEDGE_ENABLED": "true" if hedge else "false",
+        "OPENAI_API_KEY": "sk-offline-benchmark",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USERNAME": "bench",
+        "SMTP_PASSWORD": "bench",
+        "SMTP_FROM": "bench@example.com",
+        "SMTP_STARTTLS": "false",
+        "RESULT_CACHE_DISABLED": "true",
+        # The limiter's TPM budget would hold the simulated backend to a few calls/s
+        "LLM_RATE_LIMIT_DISABLED": "true",
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite3"),
+        "HISTORY_PATH": "",
+        "METRICS_JSONL_PATH": "",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q * len(ordered)))) - 1]
+
+
+def _mean(values: list[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def run_scenario(main, metrics, outbox, sink, backend, entry: str, concurrency: int, requests: int) -> dict:
+    calls = {
+        "run_all_agents": lambda prompt: main.run_all_agents(prompt, use_cache=False),
+        "run_specific_agent": lambda prompt: main.run_specific_agent(prompt, "Writer", use_cache=False),
+        "run_with_orchestrator_multi": lambda prompt: main.run_with_orchestrator_multi(prompt, 5, use_cache=False),
+    }
+    call = calls[entry]
+    prompt = PROMPTS[entry]
+    backend.reset()
+    messages_before = sink.messages
+    since = time.time()
+
+    def one(index: int):
+        t0 = time.perf_counter()
+        # A distinct prompt per request so no layer can reuse another's work
+        outputs = call(f"{prompt} (request {index})")
+        failed = any(str(v).startswith("Failed to run") for v in outputs.values())
+        return time.perf_counter() - t0, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    outbox.drain(30)
+
+    latencies = [r[0] for r in results]
+    recent = [r for r in metrics.records() if r.get("ts", 0) >= since]
+    phases = {}
+    for kind in ("role", "router", "orchestrator", "smtp"):
+        walls = [r["wall_s"] for r in recent if r["kind"] == kind]
+        if walls:
+            phases[kind] = {
+                "count": len(walls),
+                "mean_s": round(_mean(walls), 4),
+                "p95_s": round(_percentile(walls, 0.95), 4),
+                "queue_mean_s": round(_mean([r["queue_s"] for r in recent if r["kind"] == kind]), 4),
+            }
+    llm_mean = backend.busy_s / backend.calls if backend.calls else 0.0
+    if "role" in phases:
+        hedged = [r["hedge"] for r in recent if r["kind"] == "role" and r.get("hedge")]
+        if hedged:
+            phases["role"]["hedged"] = len(hedged)
+            phases["role"]["hedges_won"] = hedged.count("won")
+        # Time per role run not spent inside the (simulated) LLM
+        phases["role"]["overhead_mean_s"] = round(phases["role"]["mean_s"] - llm_mean, 4)
+    return {
+        "entry": entry,
+        "concurrency": concurrency,
+        "requests": requests,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 3) if wall > 0 else 0.0,
+        "latency_p50_s": round(_percentile(latencies, 0.5), 4),
+        "latency_p95_s": round(_percentile(latencies, 0.95), 4),
+        "latency_p99_s": round(_percentile(latencies, 0.99), 4),
+        "failed_requests": sum(1 for r in results if r[1]),
+        "peak_rss_mb": _peak_rss_mb(),
+        "phases": phases,
+        "llm": {
+            "calls": backend.calls,
+            "errors": backend.errors,
+            "prompt_tokens": backend.prompt_tokens,
+            "completion_tokens": backend.completion_tokens,
+            "mean_call_s": round(llm_mean, 4),
+        },
+        "emails_delivered": sink.messages - messages_before,
+    }
+
+
+def compare(results: list[dict], baseline: dict, max_regression: float) -> list[str]:
+    """Scenarios whose throughput fell more than max_regression below the baseline."""
+    previous = {(r["entry"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for row in results:
+        base = previous.get((row["entry"], row["concurrency"]))
+        if base and base["throughput_rps"] > 0:
+            change = row["throughput_rps"] / base["throughput_rps"] - 1
+            if change < -max_regression:
+                regressions.append(
+                    f"{row['entry']} x{row['concurrency']}: {base['throughput_rps']} -> {row['throughput_rps']} req/s ({change:+.0%})"
+                )
+    return regressions
+
+
+def run(profile: LLMProfile, concurrency_levels: list[int], requests: int | None = None, seed: int = 1,
+        hedge: bool = False) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_offline_")
+    sink = SMTPSink()
+    _configure_environment(sink.port, workdir, hedge)
+    sys.path.insert(0, ROOT)
+    try:
+        import crewai  # noqa: F401
+    except ImportError:
+        raise SystemExit("crewai is not installed; install the project requirements first.")
+
+    import agents
+    import main
+    import metrics
+    from outbox import get_outbox
+
+    backend = SimulatedBackend(profile, seed)
+    llm_class = make_llm_factory(backend)
+    agents.set_llm_factory(llm_class)
+
+    results = []
+    try:
+        for entry in PROMPTS:
+            for concurrency in concurrency_levels:
+                count = requests or max(4, 2 * concurrency)
+                results.append(run_scenario(main, metrics, get_outbox(), sink, backend, entry, concurrency, count))
+    finally:
+        agents.set_llm_factory(None)
+        sink.shutdown()
+    return {
+        "profile": asdict(profile),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _arg(args: list[str], name: str, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    base_profile = PROFILES[_arg(args, "--profile", "fast")]
+    profile = LLMProfile(
+        latency_ms=float(_arg(args, "--latency-ms", base_profile.latency_ms)),
+        jitter_ms=float(_arg(args, "--jitter-ms", base_profile.jitter_ms)),
+        tokens_per_second=float(_arg(args, "--tokens-per-second", base_profile.tokens_per_second)),
+        output_tokens=int(_arg(args, "--output-tokens", base_profile.output_tokens)),
+        error_rate=float(_arg(args, "--error-rate", base_profile.error_rate)),
+        slow_rate=float(_arg(args, "--slow-rate", base_profile.slow_rate)),
+        slow_factor=float(_arg(args, "--slow-factor", base_profile.slow_factor)),
+    )
+    levels = [int(c) for c in _arg(args, "--concurrency", "1,2,4,8").split(",")]
+    requests = int(_arg(args, "--requests")) if "--requests" in args else None
+
+    report = run(profile, levels, requests, int(_arg(args, "--seed", 1)), "--hedge" in args)
+
+    output_path = _arg(args, "--output")
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if "--json" in args:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'entry':<28} {'conc':>4} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'fail':>5} {'RSS MB':>7} {'role ovh s':>10}")
+        for row in report["results"]:
+            overhead = row["phases"].get("role", {}).get("overhead_mean_s", 0.0)
+            print(
+                f"{row['entry']:<28} {row['concurrency']:>4} {row['throughput_rps']:>8} {row['latency_p50_s']:>8} "
+                f"{row['latency_p95_s']:>8} {row['latency_p99_s']:>8} {row['failed_requests']:>5} "
+                f"{row['peak_rss_mb']:>7} {overhead:>10}"
+            )
+
+    baseline_path = _arg(args, "--baseline")
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), float(_arg(args, "--max-regression", 0.2)))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,225 @@
+"""Golden-corpus check and micro-benchmark for plain_text.to_plain_text.
+
+Compares the single-pass converter with the regex chain it replaced
+(legacy_to_plain_text below, kept verbatim as the reference) on a corpus of
+typical agent outputs, then times both on inputs from 1KB to 1MB:
+  - whole input converted in one call (uncached)
+  - converter fed in 64-byte chunks
+  - streaming refresh: output rendered after every 1KB of input, which the
+    regex chain can only do by reconverting the whole buffer (up to 100KB)
+
+Usage:
+    python bench_plain_text.py [--repeat 5] [--json]
+
+Exits with status 1 if any golden document converts differently.
+"""
+import json
+import re
+import sys
+import timeit
+
+from plain_text import PlainTextConverter, convert
+
+
+def legacy_to_plain_text(value) -> str:
+    """The former main.py/app.py implementation, used as the reference."""
+    text = str(value or "")
+    text = re.sub(r"```[\s\S]*?```", lambda m: re.sub(r"^```.*\n|```$", "", m.group(0), flags=re.MULTILINE), text)
+    text = text.replace("`", "")
+    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", r"\1 (\2)", text)
+    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r"\1 (\2)", text)
+    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
+    text = re.sub(r"\*(.*?)\*", r"\1", text)
+    text = re.sub(r"__(.*?)__", r"\1", text)
+    text = re.sub(r"_(.*?)_", r"\1", text)
+    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^>\s?", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^\s*[-*+]\s+", "- ", text, flags=re.MULTILINE)
+    text = re.sub(r"^\s*([-*_]){3,}\s*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+GOLDEN_CORPUS = [
+    # Research brief
+    """# Research Brief: Solid-State Batteries
+
+## Key Findings
+- **Energy density**: up to *2x* that of lithium-ion cells.
+- **Safety**: non-flammable solid electrolytes reduce fire risk.
+* Manufacturing costs remain __high__ at scale.
++ Toyota targets 2027-2028 for first vehicles.
+
+## Evidence
+1. QuantumScape reported 800 cycles with >80% capacity retention.
+2. Samsung SDI published results in [Nature Energy](https://www.nature.com/nenergy).
+
+---
+
+## Sources
+- [DOE Battery Report](https://energy.gov/report_2024.pdf)
+- ![Chart of energy density](https://example.com/img/chart.png)
+
+> Note: figures are vendor-reported and not independently verified.
+
+This concludes the structured research brief.
+""",
+    # Article with code
+    """Renewable Energy Policy in 2024
+================================
+
+### Introduction
+
+Governments are *rapidly* expanding **renewable** targets. The `feed_in_tariff`
+model is being replaced by auctions.
+
+```python
+def levelized_cost(capex, opex, years):
+    # simple LCOE estimate
+    return (capex + opex * years) / years
+```
+
+### Conclusion
+In short, policy matters.
+
+
+
+Thanks for reading!
+""",
+    # Summary
+    """**Summary**
+
+* Inflation fell to 3.1% in January.
+* Core services remain *sticky*.
+* Markets expect **two** rate cuts.
+
+___
+""",
+    # Review
+    """## Review
+
+**Strengths**
+- Clear structure
+- Good use of examples
+
+**Weaknesses**
+-   Some claims lack citations
+-   Paragraph 3 repeats paragraph 1
+
+**Suggestions**
+1. Add sources for the market-size numbers.
+2. Cut the second paragraph.
+3. Replace jargon like `TAM_SAM_SOM` with plain words.
+
+> *Overall*: solid draft, needs tightening.
+""",
+    # Email draft
+    """Subject: Quarterly results
+
+Dear Team,
+
+Please find the **key points** below:
+
+- Revenue up 12%
+- Churn down to 2.1%
+
+Best regards,
+[Your Name]
+""",
+    # Plain prose
+    "Just a short plain answer with no markup at all.\nSecond line of it.",
+    # Nested quote, deep heading, inline fence
+    """#### Deep heading
+>> nested quote
+Inline ```code``` and `more_code` here.
+    indented paragraph text
+""",
+    "",
+]
+
+
+def check_golden() -> list[int]:
+    """Return the indexes of golden documents whose output differs."""
+    mismatches = []
+    for index, doc in enumerate(GOLDEN_CORPUS):
+        expected = legacy_to_plain_text(doc)
+        chunked = PlainTextConverter()
+        for start in range(0, len(doc), 7):
+            chunked.feed(doc[start:start + 7])
+        if convert(doc) != expected or chunked.close() != expected:
+            mismatches.append(index)
+    return mismatches
+
+
+def _sample(size: int) -> str:
+    unit = "\n".join(GOLDEN_CORPUS)
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def _feed_chunks(text: str, chunk_size: int = 64) -> str:
+    converter = PlainTextConverter()
+    for start in range(0, len(text), chunk_size):
+        converter.feed(text[start:start + chunk_size])
+    return converter.close()
+
+
+def _stream_legacy(text: str, refresh: int = 1024) -> str:
+    out = ""
+    for end in range(refresh, len(text) + refresh, refresh):
+        out = legacy_to_plain_text(text[:end])
+    return out
+
+
+def _stream_single_pass(text: str, refresh: int = 1024) -> str:
+    converter = PlainTextConverter()
+    for start in range(0, len(text), refresh):
+        converter.feed(text[start:start + refresh])
+        converter.text()
+    return converter.close()
+
+
+def run(repeat: int = 5) -> list[dict]:
+    results = []
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        text = _sample(size)
+        number = max(1, 200_000 // size)
+        cases = [
+            ("legacy_regex", legacy_to_plain_text),
+            ("single_pass", convert),
+            ("single_pass_chunked", _feed_chunks),
+        ]
+        if size <= 100_000:
+            cases += [("stream_legacy", _stream_legacy), ("stream_single_pass", _stream_single_pass)]
+        row = {"bytes": size}
+        for name, fn in cases:
+            best = min(timeit.repeat(lambda: fn(text), number=number, repeat=repeat))
+            row[f"{name}_ms"] = round(best / number * 1000, 3)
+        row["speedup"] = round(row["legacy_regex_ms"] / row["single_pass_ms"], 2)
+        if "stream_legacy_ms" in row:
+            row["stream_speedup"] = round(row["stream_legacy_ms"] / row["stream_single_pass_ms"], 2)
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = int(args[args.index("--repeat") + 1]) if "--repeat" in args else 5
+
+    mismatches = check_golden()
+    results = run(repeat)
+    if "--json" in args:
+        print(json.dumps({"golden_mismatches": mismatches, "results": results}, indent=2))
+    else:
+        print(f"Golden corpus: {len(GOLDEN_CORPUS) - len(mismatches)}/{len(GOLDEN_CORPUS)} identical")
+        print(
+            f"{'bytes':>9} {'legacy ms':>10} {'single ms':>10} {'chunked ms':>11} {'speedup':>8}"
+            f" {'stream legacy ms':>17} {'stream single ms':>17} {'speedup':>8}"
+        )
+        for row in results:
+            print(
+                f"{row['bytes']:>9} {row['legacy_regex_ms']:>10} {row['single_pass_ms']:>10} "
+                f"{row['single_pass_chunked_ms']:>11} {row['speedup']:>7}x"
+                f" {row.get('stream_legacy_ms', '-'):>17} {row.get('stream_single_pass_ms', '-'):>17}"
+                f" {str(row.get('stream_speedup', '-')) + 'x':>8}"
+            )
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,83 @@
+"""Startup benchmark for the CLI entry points.
+
+Measures, in fresh interpreter processes:
+  - import_main_ms: time to `import main` (should not import crewai)
+  - first_task_ms: time from process start until the first Task is built
+  - crewai_loaded_on_import: whether `import main` pulled in crewai
+
+Usage:
+    python bench_startup.py [--runs 5] [--max-import-ms 300]
+
+Prints one JSON object; exits with status 1 when the median import time
+exceeds --max-import-ms or crewai is loaded by a plain import.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "crewai": "crewai" in sys.modules}))
+"""
+
+_FIRST_TASK_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import main
+from task import get_all_role_tasks
+get_all_role_tasks("startup benchmark", ["Writer"])
+print(json.dumps({"first_task_ms": (time.perf_counter() - t0) * 1000}))
+"""
+
+
+def _probe(code: str) -> dict | None:
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int = 5) -> dict:
+    import_ms: list[float] = []
+    first_task_ms: list[float] = []
+    crewai_loaded = False
+    for _ in range(runs):
+        result = _probe(_IMPORT_PROBE)
+        if result is not None:
+            import_ms.append(result["import_ms"])
+            crewai_loaded = crewai_loaded or result["crewai"]
+        result = _probe(_FIRST_TASK_PROBE)
+        if result is not None:
+            first_task_ms.append(result["first_task_ms"])
+    return {
+        "runs": runs,
+        "import_main_ms": round(statistics.median(import_ms), 2) if import_ms else None,
+        "first_task_ms": round(statistics.median(first_task_ms), 2) if first_task_ms else None,
+        "crewai_loaded_on_import": crewai_loaded,
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 5
+    max_import_ms = float(args[args.index("--max-import-ms") + 1]) if "--max-import-ms" in args else None
+
+    report = run(runs)
+    print(json.dumps(report, indent=2))
+
+    regressed = report["crewai_loaded_on_import"]
+    if max_import_ms is not None and report["import_main_ms"] is not None:
+        regressed = regressed or report["import_main_ms"] > max_import_ms
+    sys.exit(1 if regressed else 0)
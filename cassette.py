@@ -0,0 +1,478 @@
+"""Record LLM and SMTP traffic to a cassette file and replay it offline.
+
+Record: with CASSETTE_RECORD_PATH set, every LLM call made through the
+agents (request messages, response, start time and duration) and every SMTP
+transaction from send_email / the outbox (recipients, size, duration,
+error) is appended to that JSONL file, along with each finished run's mode,
+prompt and wall time. This works from the CLI, the HTTP server, the daemon
+and Streamlit:
+
+    CASSETTE_RECORD_PATH=slow.cassette.jsonl python main.py -- --orchestrate "..."
+
+Replay: the recorded runs go through main.py again with an LLM and an SMTP
+server that answer from the cassette. Nothing goes over the network, and
+the result, history and semantic caches are off:
+
+    python cassette.py show slow.cassette.jsonl
+    python cassette.py replay slow.cassette.jsonl                 # recorded speed, runs overlap as recorded
+    python cassette.py replay slow.cassette.jsonl --speed 0       # as fast as possible, one run after another
+    python cassette.py replay slow.cassette.jsonl --speed 0 --profile replay.prof --flamegraph replay.folded
+    python cassette.py replay slow.cassette.jsonl --output after.json --baseline before.json [--max-regression 0.2]
+
+A replayed call gets the recorded response for the same role and request.
+When the prompts have changed since recording, it gets the role's next
+unused response instead. Replay reports how many calls matched, fell back
+or found nothing. Recorded errors are raised again after their recorded
+duration.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VERSION = 1
+
+
+def _message_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) if isinstance(m, dict) else str(m) for m in messages)
+
+
+def request_key(role: str, messages) -> str:
+    """Stable key for an LLM request: role and message text."""
+    return hashlib.sha256(f"{role}\n{_message_text(messages)}".encode("utf-8")).hexdigest()[:24]
+
+
+def smtp_key(to_addrs) -> str:
+    # The MIME boundary changes on every send, so only the recipients identify a transaction
+    recipients = [to_addrs] if isinstance(to_addrs, str) else list(to_addrs)
+    return ",".join(sorted(a.strip().lower() for a in recipients))
+
+
+def _base_llm():
+    try:
+        from crewai import BaseLLM
+    except ImportError:
+        from crewai.llms.base_llm import BaseLLM
+    return BaseLLM
+
+
+class Cassette:
+    """Append-only cassette writer; safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._llm_class = None
+        self.write({"type": "meta", "version": VERSION, "created": time.time(), "pid": os.getpid()})
+
+    def offset(self) -> float:
+        """Seconds since recording started."""
+        return time.monotonic() - self._started
+
+    def write(self, entry: dict) -> None:
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def note_run(self, mode: str, prompt: str, roles: list[str], wall_s: float) -> None:
+        self.write({
+            "type": "run",
+            "mode": mode,
+            "prompt": prompt,
+            "roles": list(roles),
+            "start_s": round(self.offset() - wall_s, 4),
+            "wall_s": wall_s,
+        })
+
+    def llm_factory(self, role: str):
+        """agents.set_llm_factory() hook: the default LLM, recording every call."""
+        if self._llm_class is None:
+            self._llm_class = _recording_llm_class(self)
+        return self._llm_class(role)
+
+
+def _recording_llm_class(cassette: Cassette):
+    from crewai import LLM
+
+    from ratelimit import describe_error
+
+    class RecordingLLM(_base_llm()):
+        def __init__(self, role: str):
+            inner = LLM(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini"))
+            super().__init__(model=inner.model)
+            self._inner = inner
+            self._role = role
+
+        def call(self, messages, *args, **kwargs):
+            start, response, error = cassette.offset(), None, None
+            try:
+                response = self._inner.call(messages, *args, **kwargs)
+                return response
+            except Exception as exc:
+                error = describe_error(exc)
+                raise
+            finally:
+                cassette.write({
+                    "type": "llm",
+                    "role": self._role,
+                    "key": request_key(self._role, messages),
+                    "messages": messages,
+                    "response": response,
+                    "error": error,
+                    "start_s": round(start, 4),
+                    "duration_s": round(cassette.offset() - start, 4),
+                })
+
+        def supports_function_calling(self) -> bool:
+            return self._inner.supports_function_calling()
+
+        def supports_stop_words(self) -> bool:
+            return self._inner.supports_stop_words()
+
+        def get_context_window_size(self) -> int:
+            return self._inner.get_context_window_size()
+
+    return RecordingLLM
+
+
+class RecordingTransport:
+    """email_agent transport that records each transaction sent through inner."""
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def sendmail(self, from_addr: str, to_addrs, message: str):
+        start, error = self.cassette.offset(), None
+        try:
+            return self.inner.sendmail(from_addr, to_addrs, message)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            self.cassette.write({
+                "type": "smtp",
+                "key": smtp_key(to_addrs),
+                "to": to_addrs,
+                "size": len(message),
+                "error": error,
+                "start_s": round(start, 4),
+                "duration_s": round(self.cassette.offset() - start, 4),
+            })
+
+
+_recorder: Cassette | None = None
+_recorder_lock = threading.Lock()
+
+
+def start_recording(path: str) -> Cassette:
+    """Record this process's LLM and SMTP traffic to path from now on (idempotent)."""
+    global _recorder
+    import agents
+    import email_agent
+    from smtp_pool import get_smtp_pool
+
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = Cassette(path)
+            agents.set_llm_factory(_recorder.llm_factory)
+            email_agent.set_smtp_transport(RecordingTransport(get_smtp_pool(), _recorder))
+        return _recorder
+
+
+def get_recorder() -> Cassette | None:
+    return _recorder
+
+
+class Tape:
+    """A cassette loaded for replay; hands out recorded responses in order."""
+
+    def __init__(self, path: str):
+        self.meta: dict = {}
+        self.runs: list[dict] = []
+        self.llm_calls: list[dict] = []
+        self.smtp_calls: list[dict] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                kind = entry.get("type")
+                if kind == "meta" and not self.meta:
+                    self.meta = entry
+                elif kind == "run":
+                    self.runs.append(entry)
+                elif kind == "llm":
+                    self.llm_calls.append(entry)
+                elif kind == "smtp":
+                    self.smtp_calls.append(entry)
+        self._lock = threading.Lock()
+        self._used: set[int] = set()
+        self._by_key: dict[tuple, deque] = {}
+        self._by_group: dict[tuple, deque] = {}
+        for group, entries in (("llm", self.llm_calls), ("smtp", self.smtp_calls)):
+            for entry in entries:
+                scope = entry.get("role", "") if group == "llm" else ""
+                self._by_key.setdefault((group, scope, entry.get("key")), deque()).append(entry)
+                self._by_group.setdefault((group, scope), deque()).append(entry)
+        self.counts = {group: {"matched": 0, "fallback": 0, "missing": 0} for group in ("llm", "smtp")}
+
+    def _take(self, queue_: deque | None) -> dict | None:
+        while queue_:
+            entry = queue_.popleft()
+            if id(entry) not in self._used:
+                self._used.add(id(entry))
+                return entry
+        return None
+
+    def next(self, group: str, scope: str, key: str) -> dict | None:
+        """The recorded entry for key, else the next unused one of the group, else None."""
+        with self._lock:
+            entry = self._take(self._by_key.get((group, scope, key)))
+            outcome = "matched"
+            if entry is None:
+                entry = self._take(self._by_group.get((group, scope)))
+                outcome = "fallback" if entry is not None else "missing"
+            self.counts[group][outcome] += 1
+            return entry
+
+    def summary(self) -> dict:
+        return {
+            "runs": len(self.runs),
+            "recorded_wall_s": round(sum(r.get("wall_s", 0.0) for r in self.runs), 3),
+            "llm_calls": len(self.llm_calls),
+            "llm_s": round(sum(c.get("duration_s", 0.0) for c in self.llm_calls), 3),
+            "llm_errors": sum(1 for c in self.llm_calls if c.get("error")),
+            "smtp_calls": len(self.smtp_calls),
+            "smtp_s": round(sum(c.get("duration_s", 0.0) for c in self.smtp_calls), 3),
+        }
+
+
+def _pause(entry: dict, speed: float) -> None:
+    if speed > 0:
+        time.sleep(entry.get("duration_s", 0.0) / speed)
+
+
+def _replay_llm_factory(tape: Tape, speed: float):
+    class ReplayLLM(_base_llm()):
+        def __init__(self, role: str):
+            super().__init__(model=os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini"))
+            self._role = role
+
+        def call(self, messages, *args, **kwargs):
+            entry = tape.next("llm", self._role, request_key(self._role, messages))
+            if entry is None:
+                raise RuntimeError(f"No recorded LLM response left for {self._role}")
+            _pause(entry, speed)
+            if entry.get("error"):
+                raise RuntimeError(entry["error"])
+            return entry["response"]
+
+        def supports_function_calling(self) -> bool:
+            return False
+
+        def supports_stop_words(self) -> bool:
+            return False
+
+        def get_context_window_size(self) -> int:
+            return 128_000
+
+    return ReplayLLM
+
+
+class ReplayTransport:
+    def __init__(self, tape: Tape, speed: float):
+        self.tape = tape
+        self.speed = speed
+
+    def sendmail(self, from_addr: str, to_addrs, message: str) -> dict:
+        import smtplib
+
+        entry = self.tape.next("smtp", "", smtp_key(to_addrs))
+        if entry is None:
+            return {}
+        _pause(entry, self.speed)
+        if entry.get("error"):
+            raise smtplib.SMTPException(entry["error"])
+        return {}
+
+
+def _configure_environment(workdir: str) -> None:
+    # Must run before config.py is imported: offline, no caches, nothing recorded again
+    os.environ.update({
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY") or "sk-cassette-replay",
+        "SMTP_HOST": "replay.invalid",
+        "SMTP_PORT": "25",
+        "SMTP_USERNAME": "replay",
+        "SMTP_PASSWORD": "replay",
+        "SMTP_FROM": os.environ.get("SMTP_FROM") or "replay@example.com",
+        "RESULT_CACHE_DISABLED": "true",
+        "SEMANTIC_CACHE_DISABLED": "true",
+        "HISTORY_PATH": "",
+        "METRICS_JSONL_PATH": "",
+        "CASSETTE_RECORD_PATH": "",
+        # Extra LLM calls would take responses meant for later requests
+        "SPECULATION_ENABLED": "false",
+        "HEDGE_ENABLED": "false",
+        # The cassette already carries the provider's rate limiting in its timings
+        "LLM_RATE_LIMIT_DISABLED": "true",
+        "OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite3"),
+        "DAEMON_SOCKET_PATH": "",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+
+def replay(path: str, speed: float = 1.0, stats_path: str | None = None, folded_path: str | None = None) -> dict:
+    """Run the cassette's runs again offline; returns per-run and total timings."""
+    tape = Tape(path)
+    if not tape.runs:
+        raise SystemExit(f"{path} has no recorded runs")
+    _configure_environment(tempfile.mkdtemp(prefix="cassette_"))
+    sys.path.insert(0, ROOT)
+    try:
+        import crewai  # noqa: F401
+    except ImportError:
+        raise SystemExit("crewai is not installed; install the project requirements first.")
+
+    import agents
+    import email_agent
+    import main
+    from deadline import is_incomplete
+    from outbox import get_outbox
+    from profiling import profiled
+
+    runners = {
+        "all": lambda run: main.run_all_agents(run["prompt"], use_cache=False),
+        "agent": lambda run: main.run_specific_agent(run["prompt"], run["roles"][0], use_cache=False),
+        "orchestrate": lambda run: main.run_with_orchestrator_multi(run["prompt"], 5, use_cache=False),
+    }
+    agents.set_llm_factory(_replay_llm_factory(tape, speed))
+    email_agent.set_smtp_transport(ReplayTransport(tape, speed))
+    # Build the agents first so crewai's import and setup stay out of the timings
+    for role in agents.AGENT_SPECS:
+        agents.get_agent(role)
+
+    results: list[dict] = [{} for _ in tape.runs]
+
+    def one(index: int, run: dict) -> None:
+        started = time.perf_counter()
+        try:
+            outputs = runners[run["mode"]](run)
+            failed = [role for role, text in outputs.items() if is_incomplete(text)]
+        except Exception as exc:
+            failed = [f"{type(exc).__name__}: {exc}"]
+        results[index] = {
+            "mode": run["mode"],
+            "prompt": run["prompt"][:80],
+            "recorded_s": run.get("wall_s"),
+            "replayed_s": round(time.perf_counter() - started, 4),
+            "failed": failed,
+        }
+
+    first_start = min(run.get("start_s", 0.0) for run in tape.runs)
+    try:
+        with profiled(stats_path, folded_path):
+            started = time.perf_counter()
+            if speed > 0:
+                # Start each run at its recorded offset, so runs overlap as they did
+                threads = []
+                for index, run in sorted(enumerate(tape.runs), key=lambda item: item[1].get("start_s", 0.0)):
+                    delay = (run.get("start_s", 0.0) - first_start) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                    thread = threading.Thread(target=one, args=(index, run), name="replay-run")
+                    thread.start()
+                    threads.append(thread)
+                for thread in threads:
+                    thread.join()
+            else:
+                for index, run in enumerate(tape.runs):
+                    one(index, run)
+            get_outbox().drain(30)
+            wall = time.perf_counter() - started
+    finally:
+        agents.set_llm_factory(None)
+        email_agent.set_smtp_transport(None)
+
+    return {
+        "cassette": path,
+        "speed": speed,
+        "wall_s": round(wall, 3),
+        "recorded": tape.summary(),
+        "calls": tape.counts,
+        "runs": results,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Runs that took more than max_regression longer than in baseline (matched by position)."""
+    regressions = []
+    for index, (run, base) in enumerate(zip(report["runs"], baseline.get("runs", []))):
+        if base.get("replayed_s") and run["replayed_s"] / base["replayed_s"] - 1 > max_regression:
+            regressions.append(f"run {index} [{run['mode']}]: {base['replayed_s']}s -> {run['replayed_s']}s")
+    if baseline.get("wall_s") and report["wall_s"] / baseline["wall_s"] - 1 > max_regression:
+        regressions.append(f"total: {baseline['wall_s']}s -> {report['wall_s']}s")
+    return regressions
+
+
+def _arg(args: list[str], name: str, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ("show", "replay"):
+        print(__doc__)
+        sys.exit(1)
+    command, path = args[0], args[1]
+
+    if command == "show":
+        tape = Tape(path)
+        print(json.dumps(tape.summary(), indent=2))
+        for run in tape.runs:
+            print(f"{run.get('start_s', 0):>9.2f}s  {run.get('wall_s', 0):>7.2f}s  [{run['mode']}] {run['prompt'][:70]}")
+        sys.exit(0)
+
+    report = replay(path, float(_arg(args, "--speed", 1.0)), _arg(args, "--profile"), _arg(args, "--flamegraph"))
+    output_path = _arg(args, "--output")
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if "--json" in args:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'#':>3} {'mode':<12} {'recorded s':>10} {'replayed s':>10}  prompt")
+        for index, run in enumerate(report["runs"]):
+            failed = f"  (failed: {', '.join(run['failed'])})" if run["failed"] else ""
+            print(f"{index:>3} {run['mode']:<12} {run['recorded_s'] or 0:>10.3f} {run['replayed_s']:>10.3f}  {run['prompt']}{failed}")
+        llm, smtp = report["calls"]["llm"], report["calls"]["smtp"]
+        print(
+            f"\nReplayed {len(report['runs'])} run(s) in {report['wall_s']}s at speed {report['speed']:g}; "
+            f"LLM calls: {llm['matched']} matched, {llm['fallback']} fallback, {llm['missing']} missing; "
+            f"SMTP: {smtp['matched']} matched, {smtp['fallback']} fallback, {smtp['missing']} missing"
+        )
+        for flag, hint in (("--profile", "python -m pstats"), ("--flamegraph", "flamegraph.pl / speedscope")):
+            if _arg(args, flag):
+                print(f"{flag[2:].capitalize()}: {_arg(args, flag)} (open with {hint})")
+
+    baseline_path = _arg(args, "--baseline")
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), float(_arg(args, "--max-regression", 0.2)))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
@@ -4,6 +4,17 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+
+def parse_role_values(spec: str) -> dict[str, float]:
+    """Parse per-role overrides such as "Emailer=0.97, Writer=0.93" into {"Emailer": 0.97, "Writer": 0.93}."""
+    values = {}
+    for item in spec.split(","):
+        role, _, value = item.partition("=")
+        if role.strip() and value.strip():
+            values[role.strip()] = float(value)
+    return values
+
+
 # OpenAI API key (from your .env file)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -11,4 +22,136 @@ SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USERNAME or "")
\ No newline at end of file
+SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USERNAME or "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+# Authenticated SMTP sessions kept open and reused between emails
+SMTP_POOL_MAX_CONNECTIONS = int(os.getenv("SMTP_POOL_MAX_CONNECTIONS", "2"))
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))
+
+# Upper bound on roles whose LLM calls run at the same time (1 = sequential)
+MAX_PARALLEL_ROLES = int(os.getenv("MAX_PARALLEL_ROLES", "5"))
+
+# Deadlines (deadline.py): seconds per role run and for a whole request; 0 = no limit.
+# Roles that miss theirs are reported as timed out and the request goes on with the rest.
+ROLE_TIMEOUT_SECONDS = float(os.getenv("ROLE_TIMEOUT_SECONDS", "0"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "0"))
+
+# Hedged LLM calls (hedge.py): a duplicate call once a role's call runs past its usual latency
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_ROLE_PERCENTILES = os.getenv("HEDGE_ROLE_PERCENTILES", "")
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# Record every LLM call and SMTP transaction of the process to this cassette file (cassette.py); empty = off
+CASSETTE_RECORD_PATH = os.getenv("CASSETTE_RECORD_PATH", "")
+
+# Role result cache (in-memory LRU backed by SQLite); set RESULT_CACHE_PATH empty for memory only
+RESULT_CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_cache", "results.sqlite3"),
+)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+# Rows kept in the SQLite file; the oldest are deleted beyond this
+RESULT_CACHE_MAX_ROWS = int(os.getenv("RESULT_CACHE_MAX_ROWS", "10000"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_DISABLED = os.getenv("RESULT_CACHE_DISABLED", "false").lower() in ("1", "true", "yes")
+
+# Minimum local router confidence (0-1) to skip the Orchestrator LLM call
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.7"))
+
+# Near-duplicate prompt cache (semantic_cache.py): reuse a role's output for a paraphrased prompt.
+# Off by default until the thresholds have been checked against labelled prompt pairs.
+SEMANTIC_CACHE_DISABLED = os.getenv("SEMANTIC_CACHE_DISABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Per-role overrides, e.g. "Writer=0.93,Reviewer=0.95"
+SEMANTIC_CACHE_ROLE_THRESHOLDS = os.getenv("SEMANTIC_CACHE_ROLE_THRESHOLDS", "")
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+# Identical role runs already in flight are shared instead of started again (singleflight.py)
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Speculative role execution (speculation.py): start the likeliest roles while the Orchestrator decides
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() in ("1", "true", "yes")
+SPECULATION_MAX_ROLES = int(os.getenv("SPECULATION_MAX_ROLES", "2"))
+SPECULATION_MAX_TOKENS = int(os.getenv("SPECULATION_MAX_TOKENS", "6000"))
+
+# Settings keys whose "KEY = value" lines are removed from emailed output ("*" = any letters/underscores)
+SANITIZE_SECRET_KEYS = os.getenv("SANITIZE_SECRET_KEYS", "smtp_*,imap_*,openai_api_key")
+
+# Email outbox: formatted emails are queued in SQLite and sent in the background with retries
+OUTBOX_PATH = os.getenv(
+    "OUTBOX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_cache", "outbox.sqlite3"),
+)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+# Send inline during the request instead (the previous behaviour)
+OUTBOX_DISABLED = os.getenv("OUTBOX_DISABLED", "false").lower() in ("1", "true", "yes")
+# How long the CLI waits for queued emails to go out before exiting
+OUTBOX_DRAIN_SECONDS = float(os.getenv("OUTBOX_DRAIN_SECONDS", "60"))
+
+# Run history (history.py): past prompts and outputs, searchable; set HISTORY_PATH empty to turn it off
+HISTORY_PATH = os.getenv(
+    "HISTORY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_cache", "history.sqlite3"),
+)
+HISTORY_MAX_RUNS = int(os.getenv("HISTORY_MAX_RUNS", "5000"))
+
+# Prompts run at the same time in `main.py --batch` (each may run several roles in parallel)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+
+# Orchestrated roles run as a dependency graph (Researcher -> Writer -> Reviewer, Researcher -> Summarizer)
+PIPELINE_ENABLED = os.getenv("PIPELINE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Token budget for upstream output passed to each downstream role
+PIPELINE_CONTEXT_TOKENS = int(os.getenv("PIPELINE_CONTEXT_TOKENS", "1500"))
+
+# Per-role timing/token/cost records (metrics.py), kept in memory; set METRICS_JSONL_PATH to also append them
+# to a file, which is rotated to <path>.1 once it reaches METRICS_JSONL_MAX_BYTES
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", "")
+METRICS_JSONL_MAX_BYTES = int(os.getenv("METRICS_JSONL_MAX_BYTES", str(50 * 1024 * 1024)))
+METRICS_MAX_RECORDS = int(os.getenv("METRICS_MAX_RECORDS", "10000"))
+# Optional USD prices per 1M tokens, overriding the built-in table for the model in use
+LLM_PRICE_PROMPT_PER_1M = float(os.getenv("LLM_PRICE_PROMPT_PER_1M")) if os.getenv("LLM_PRICE_PROMPT_PER_1M") else None
+LLM_PRICE_COMPLETION_PER_1M = (
+    float(os.getenv("LLM_PRICE_COMPLETION_PER_1M")) if os.getenv("LLM_PRICE_COMPLETION_PER_1M") else None
+)
+
+# Streamlit background jobs (jobs.py): runs at once across all sessions, and how long results are kept
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# HTTP API (server.py)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# Requests running at once; up to SERVER_MAX_QUEUE more wait, beyond that clients get 429
+SERVER_MAX_CONCURRENT = int(os.getenv("SERVER_MAX_CONCURRENT", "4"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "16"))
+SERVER_REQUEST_TIMEOUT_SECONDS = float(os.getenv("SERVER_REQUEST_TIMEOUT_SECONDS", "300"))
+
+# Warm local daemon (daemon.py); the CLI forwards to it over this Unix socket while it runs (empty = never)
+DAEMON_SOCKET_PATH = os.getenv(
+    "DAEMON_SOCKET_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agent_cache", "daemon.sock"),
+)
+
+# Role prompts (prompts.py): token budget per task description; longer input is compacted, then trimmed
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "8000"))
+# Smallest prefix the provider caches (1024 tokens for OpenAI); prompts.py reports which roles reach it
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+# Client-side LLM limiter (ratelimit.py), shared by every agent in the process
+LLM_RATE_LIMIT_DISABLED = os.getenv("LLM_RATE_LIMIT_DISABLED", "false").lower() in ("1", "true", "yes")
+LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "200000"))
+# Adaptive (AIMD) bounds on concurrent LLM calls
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Retries of rate-limited (429) calls, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "60"))
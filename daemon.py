@@ -0,0 +1,132 @@
+"""Long-lived local daemon that keeps agents, LLM clients and caches warm.
+
+Every `python main.py ...` otherwise imports crewai and builds the agents
+before doing any work. The daemon does that once and serves the server.py
+API on a Unix socket (DAEMON_SOCKET_PATH, mode 0600, so only the owner can
+connect); while it runs, the CLI forwards --all / --agent / --orchestrate
+and --send-formatted to it (see daemon_client.py) and falls back to running
+in-process when it is not running.
+
+    python daemon.py                # serve in the foreground until Ctrl+C or --stop
+    python daemon.py --status       # health of the running daemon
+    python daemon.py --stop
+    python daemon.py --socket /tmp/agents.sock
+
+Besides /run, /stream, /healthz and /metrics it answers
+    POST /send      {"subject": "...", "body": "...", "to": "a@example.com"} -> {"status": "..."}
+    POST /shutdown  -> stops the daemon
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import uuid
+
+from config import DAEMON_SOCKET_PATH, SERVER_MAX_CONCURRENT, SERVER_MAX_QUEUE
+from daemon_client import call_daemon, daemon_running
+from email_agent import send_email
+from server import AgentServer, HTTPError, _send_json
+
+
+def parse_send_request(body: bytes) -> dict:
+    """Validate a /send body; raises HTTPError(400) on bad input."""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Body must be JSON") from None
+    if not isinstance(data, dict) or not isinstance(data.get("to"), str) or not data["to"].strip():
+        raise HTTPError(400, '"to" is required')
+    return {"subject": str(data.get("subject", "")), "body": str(data.get("body", "")), "to": data["to"]}
+
+
+class DaemonServer(AgentServer):
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16):
+        super().__init__(max_concurrent, max_queue)
+        self.stopping = asyncio.Event()
+
+    def warm(self) -> None:
+        """Build the agents, then load the caches and tokenizer the first request would otherwise load."""
+        super().warm()
+        from history import get_history
+        from prompts import count_tokens
+        from ratelimit import get_rate_limiter
+        from result_cache import get_result_cache
+        from semantic_cache import get_semantic_cache
+
+        get_result_cache()
+        get_semantic_cache()
+        get_history()
+        get_rate_limiter()
+        count_tokens("warm")
+
+    async def dispatch(self, writer, method: str, path: str, headers: dict, body: bytes, keep_alive: bool) -> bool:
+        if path not in ("/send", "/shutdown"):
+            return await super().dispatch(writer, method, path, headers, body, keep_alive)
+        request_id = headers.get("x-request-id") or uuid.uuid4().hex[:12]
+        try:
+            if method != "POST":
+                raise HTTPError(405, "Use POST", {"Allow": "POST"})
+            if path == "/shutdown":
+                await _send_json(writer, 200, {"status": "stopping"}, keep_alive=False)
+                self.stopping.set()
+                return True
+            req = parse_send_request(body)
+            future = self._submit(lambda: send_email(req["subject"], req["body"], req["to"]), request_id)
+            status = await asyncio.wrap_future(future)
+            await _send_json(writer, 200, {"status": status, "request_id": request_id}, {"X-Request-Id": request_id}, keep_alive)
+        except HTTPError as exc:
+            await _send_json(
+                writer,
+                exc.status,
+                {"error": str(exc), "request_id": request_id},
+                {"X-Request-Id": request_id, **exc.headers},
+                keep_alive,
+            )
+        return False
+
+
+def _claim_socket(path: str) -> None:
+    if daemon_running(path):
+        raise SystemExit(f"A daemon is already running on {path}")
+    if os.path.exists(path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.unlink(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+
+async def serve_daemon(path: str = DAEMON_SOCKET_PATH, app: DaemonServer | None = None) -> None:
+    if not hasattr(asyncio, "start_unix_server"):
+        raise SystemExit("Unix sockets are not available on this platform; use server.py instead.")
+    app = app or DaemonServer(SERVER_MAX_CONCURRENT, SERVER_MAX_QUEUE)
+    _claim_socket(path)
+    # Accept connections straight away; requests before warm-up finishes build what they need
+    threading.Thread(target=app.warm, name="warm-agents", daemon=True).start()
+    server = await asyncio.start_unix_server(app.handle, path=path)
+    os.chmod(path, 0o600)
+    print(f"Daemon listening on {path} (max {app.max_concurrent} running, {app.max_queue} queued)")
+    try:
+        async with server:
+            await app.stopping.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    path = args[args.index("--socket") + 1] if "--socket" in args else DAEMON_SOCKET_PATH
+    if "--status" in args or "--stop" in args:
+        if not daemon_running(path):
+            print(f"No daemon running on {path}")
+            sys.exit(1)
+        if "--stop" in args:
+            status, data = call_daemon("POST", "/shutdown", timeout=10, path=path)
+        else:
+            status, data = call_daemon("GET", "/healthz", timeout=10, path=path)
+        print(json.dumps(data, indent=2))
+        sys.exit(0 if status == 200 else 1)
+    try:
+        asyncio.run(serve_daemon(path))
+    except KeyboardInterrupt:
+        pass
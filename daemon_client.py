@@ -0,0 +1,99 @@
+"""Thin client for the warm daemon (daemon.py), used by the main.py CLI.
+
+Speaks the server.py HTTP API over the daemon's Unix socket with the
+standard library only, so forwarding a run costs an interpreter start and
+one local request instead of importing crewai and building every agent.
+When nothing listens on DAEMON_SOCKET_PATH the forward_* helpers return
+None and the caller runs in-process as before.
+"""
+import http.client
+import json
+import socket
+
+from config import DAEMON_SOCKET_PATH, SERVER_REQUEST_TIMEOUT_SECONDS
+
+# Extra time on top of the daemon's own request timeout before the client gives up
+CLIENT_TIMEOUT_MARGIN_SECONDS = 30
+
+
+class DaemonError(Exception):
+    """The daemon answered with an error (busy, timed out, bad request)."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{message} (HTTP {status})")
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def _usable(path: str) -> bool:
+    return bool(path) and hasattr(socket, "AF_UNIX")
+
+
+def daemon_running(path: str = DAEMON_SOCKET_PATH) -> bool:
+    """True when a daemon accepts connections on path."""
+    if not _usable(path):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(1.0)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def call_daemon(method: str, route: str, payload: dict | None = None, timeout: float | None = None,
+                path: str = DAEMON_SOCKET_PATH) -> tuple[int, dict]:
+    """One request to the daemon; returns (status, JSON body). Connection errors are raised as is."""
+    conn = UnixHTTPConnection(path, timeout)
+    try:
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        conn.request(method, route, body=body, headers={"Content-Type": "application/json", "Connection": "close"})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, (json.loads(data) if data else {})
+    finally:
+        conn.close()
+
+
+def _forward(route: str, payload: dict, path: str) -> dict | None:
+    if not _usable(path):
+        return None
+    try:
+        status, data = call_daemon("POST", route, payload, SERVER_REQUEST_TIMEOUT_SECONDS + CLIENT_TIMEOUT_MARGIN_SECONDS, path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # No daemon (or a stale socket file): the caller runs in-process.
+        # Errors after connecting are raised, so a run is never done twice.
+        return None
+    if status != 200:
+        raise DaemonError(status, data.get("error", "daemon error"))
+    return data
+
+
+def forward_run(mode: str, prompt: str, agent: str | None = None, num_roles: int = 5, use_cache: bool = True,
+                role_timeout: float | None = None, deadline: float | None = None,
+                path: str = DAEMON_SOCKET_PATH) -> dict | None:
+    """Outputs of the run from the daemon, or None when no daemon is running."""
+    payload = {"mode": mode, "prompt": prompt, "agent": agent, "num_roles": num_roles, "use_cache": use_cache}
+    # Unset limits are left out so the daemon applies its own .env defaults
+    payload.update({k: v for k, v in (("role_timeout", role_timeout), ("deadline", deadline)) if v is not None})
+    data = _forward("/run", payload, path)
+    return None if data is None else data["outputs"]
+
+
+def forward_send(subject: str, body: str, to_addresses: str, path: str = DAEMON_SOCKET_PATH) -> str | None:
+    """send_email() through the daemon's warm SMTP pool; None when no daemon is running."""
+    data = _forward("/send", {"subject": subject, "body": body, "to": to_addresses}, path)
+    return None if data is None else data["status"]
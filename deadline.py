@@ -0,0 +1,102 @@
+"""Per-role timeouts and an overall request deadline.
+
+A Budget is created when a request starts:
+
+    budget = Budget(role_timeout=60, total=120)   # None or 0 = no limit
+
+Each role must finish within role_timeout of its own start, and every role
+(and the Orchestrator decision) before the request deadline. A role that
+misses its deadline is reported as "Timed out: ..." and the request goes on
+with the roles that finished: roles not started by the deadline are skipped,
+and an LLM call already running finishes in the background with its result
+discarded.
+"""
+import contextvars
+import threading
+import time
+
+TIMEOUT_PREFIX = "Timed out:"
+FAILED_PREFIX = "Failed to run"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class RoleTimeout(DeadlineExceeded):
+    """A role missed its deadline; str(exc) is the "Timed out: ..." output reported for it."""
+
+
+def is_incomplete(text) -> bool:
+    """True for the placeholder of a role that failed or timed out."""
+    return str(text).startswith((TIMEOUT_PREFIX, FAILED_PREFIX))
+
+
+class Budget:
+    def __init__(self, role_timeout: float | None = None, total: float | None = None):
+        self.role_timeout = float(role_timeout) if role_timeout else None
+        self.total = float(total) if total else None
+        self.expires = time.monotonic() + self.total if self.total else None
+
+    def remaining(self) -> float | None:
+        """Seconds left until the request deadline (None without one)."""
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def role_deadline(self, started: float | None) -> float | None:
+        """Monotonic time by which a role started at `started` (None: not yet) must be done."""
+        limits = [] if self.expires is None else [self.expires]
+        if started is not None and self.role_timeout is not None:
+            limits.append(started + self.role_timeout)
+        return min(limits) if limits else None
+
+    def timeout_message(self, role: str, started: float | None = None) -> str:
+        role_expires = None if started is None or self.role_timeout is None else started + self.role_timeout
+        if role_expires is not None and (self.expires is None or role_expires <= self.expires):
+            return f"{TIMEOUT_PREFIX} {role} did not finish within the {self.role_timeout:g}s role timeout"
+        if started is None:
+            return f"{TIMEOUT_PREFIX} {role} was not started before the {self.total:g}s request deadline"
+        return f"{TIMEOUT_PREFIX} {role} did not finish before the {self.total:g}s request deadline"
+
+    def run(self, role: str, fn):
+        """fn() for one role within its deadline; raises RoleTimeout when it is missed."""
+        if self.expired():
+            raise RoleTimeout(self.timeout_message(role))
+        started = time.monotonic()
+        deadline = self.role_deadline(started)
+        try:
+            return call_with_deadline(fn, None if deadline is None else deadline - started)
+        except DeadlineExceeded:
+            raise RoleTimeout(self.timeout_message(role, started)) from None
+
+
+def call_with_deadline(fn, timeout: float | None):
+    """fn() limited to timeout seconds (None: no limit).
+
+    fn runs on a daemon thread in a copy of the caller's context (request
+    id and queue time carry over as they are); when the time is up
+    DeadlineExceeded is raised and fn keeps running in the background, its
+    result discarded.
+    """
+    if timeout is None:
+        return fn()
+    outcome: dict = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome["value"] = fn()
+        except BaseException as exc:
+            outcome["error"] = exc
+        finally:
+            done.set()
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(target,), name="deadline", daemon=True).start()
+    if not done.wait(timeout):
+        raise DeadlineExceeded(f"did not finish within {timeout:g}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
@@ -1,5 +1,3 @@
-from crewai import Agent
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Union
@@ -11,9 +9,11 @@ from config import (
     SMTP_PASSWORD,
     SMTP_FROM,
 )
+from smtp_pool import get_smtp_pool
+import metrics
 
 
-emailer = Agent(
+EMAILER_SPEC = dict(
     role="Emailer",
     goal="Compose and send concise emails with the provided content to specified recipients.",
     backstory="A professional assistant skilled at preparing and dispatching emails.",
@@ -21,36 +21,76 @@ emailer = Agent(
 )
 
 
+def __getattr__(name: str):
+    # The Emailer agent is built lazily by the registry in agents.py
+    if name == "emailer":
+        from agents import get_agent
+
+        return get_agent("Emailer")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+SMTP_NOT_CONFIGURED = (
+    "SMTP not configured. Please set SMTP_HOST, SMTP_PORT, SMTP_USERNAME, "
+    "SMTP_PASSWORD, and SMTP_FROM in your .env"
+)
+
+
+def smtp_configured() -> bool:
+    return bool(SMTP_HOST and SMTP_PORT and SMTP_USERNAME and SMTP_PASSWORD and SMTP_FROM)
+
+
+_transport = None
+
+
+def set_smtp_transport(transport) -> None:
+    """Send through transport.sendmail(from_addr, to_addrs, message) from now on; None restores the SMTP pool.
+
+    Used by cassette.py to record SMTP transactions and to replay them offline.
+    """
+    global _transport
+    _transport = transport
+
+
+def _recipient_list(to_addresses: Union[str, List[str]]) -> List[str]:
+    if isinstance(to_addresses, str):
+        return [to_addresses]
+    return list(to_addresses)
+
+
+def deliver_message(subject: str, body: str, to_addresses: Union[str, List[str]]) -> None:
+    """Send one plain-text email; raises on any SMTP or network error.
+
+    Sessions are pooled (see smtp_pool.py), so consecutive emails reuse one
+    authenticated connection.
+    """
+    if not smtp_configured():
+        raise RuntimeError(SMTP_NOT_CONFIGURED)
+    recipients = _recipient_list(to_addresses)
+    msg = MIMEMultipart()
+    msg["From"] = SMTP_FROM
+    msg["To"] = ", ".join(recipients)
+    msg["Subject"] = subject or ""
+
+    msg.attach(MIMEText(body or "", "plain"))
+
+    with metrics.measure("SMTP", kind="smtp"):
+        (_transport or get_smtp_pool()).sendmail(SMTP_FROM, recipients, msg.as_string())
+
+
 def send_email(subject: str, body: str, to_addresses: Union[str, List[str]]):
     """Send an email using SMTP settings from environment.
 
     Returns a string with success or error message and prints to terminal.
     """
-    if isinstance(to_addresses, str):
-        recipients = [to_addresses]
-    else:
-        recipients = list(to_addresses)
-
-    if not SMTP_HOST or not SMTP_PORT or not SMTP_USERNAME or not SMTP_PASSWORD or not SMTP_FROM:
-        msg = (
-            "SMTP not configured. Please set SMTP_HOST, SMTP_PORT, SMTP_USERNAME, "
-            "SMTP_PASSWORD, and SMTP_FROM in your .env"
-        )
-        print(msg)
-        return msg
+    recipients = _recipient_list(to_addresses)
 
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = SMTP_FROM
-        msg["To"] = ", ".join(recipients)
-        msg["Subject"] = subject or ""
-
-        msg.attach(MIMEText(body or "", "plain"))
+    if not smtp_configured():
+        print(SMTP_NOT_CONFIGURED)
+        return SMTP_NOT_CONFIGURED
 
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(SMTP_FROM, recipients, msg.as_string())
+    try:
+        deliver_message(subject, body, recipients)
 
         success_msg = f"Email sent to: {', '.join(recipients)}"
         print(success_msg)
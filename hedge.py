@@ -0,0 +1,239 @@
+"""Hedged LLM calls: a duplicate request when the first one is unusually slow.
+
+A few calls per hundred take several times the median, mostly from queueing
+at the provider, so a second request sent once the first has run past the
+role's usual latency tends to come back first:
+
+    hedger = get_hedger()      # None unless HEDGE_ENABLED
+    result, hedge = hedger.call("Writer", primary, backup)
+
+primary() runs at once. If it has not finished after the role's
+HEDGE_PERCENTILE latency (from its last HEDGE_WINDOW calls, once there are
+HEDGE_MIN_SAMPLES), backup() starts as well and the first to succeed wins.
+A running LLM call cannot be stopped, so the other one finishes in the
+background and its result is discarded. Each call earns HEDGE_MAX_RATE of a
+hedge and each hedge spends one, so at most that share of calls is
+duplicated over time.
+
+    python hedge.py [--calls 2000] [--slow-rate 0.03] [--slow-factor 8]
+
+simulates a backend with a slow tail and prints latency with and without
+hedging.
+"""
+import math
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+import metrics
+from config import (
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_ROLE_PERCENTILES,
+    HEDGE_MAX_RATE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_WINDOW,
+    parse_role_values,
+)
+
+# Unused hedges carried over at most, so a quiet spell cannot build up a burst
+MAX_CREDIT = 5.0
+
+
+def _percentile(values: list[float], q: float) -> float:
+    # Nearest-rank, as in metrics.py
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q * len(ordered)))) - 1]
+
+
+class Hedger:
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_rate: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200,
+        role_percentiles: dict[str, float] | None = None,
+    ):
+        self.percentile = float(percentile)
+        self.max_rate = max(0.0, float(max_rate))
+        self.min_samples = max(1, int(min_samples))
+        self.window = max(self.min_samples, int(window))
+        self.role_percentiles = dict(role_percentiles or {})
+        self._latencies: dict[str, deque] = {}
+        self._credit = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+
+    def delay(self, key: str) -> float | None:
+        """Seconds after which a call for key gets a hedge; None until enough calls are seen."""
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return _percentile(samples, self.role_percentiles.get(key, self.percentile))
+
+    def _observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def _take_credit(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            self.fired += 1
+            return True
+
+    def _start(self, key: str, fn, name: str, results: queue.Queue) -> None:
+        def attempt():
+            started = time.perf_counter()
+            try:
+                value, ok = fn(), True
+            except BaseException as exc:
+                value, ok = exc, False
+            if ok:
+                self._observe(key, time.perf_counter() - started)
+            results.put((name, ok, value))
+
+        threading.Thread(target=metrics.bind(attempt), name=f"hedge-{name}", daemon=True).start()
+
+    def call(self, key: str, primary, backup=None):
+        """Run primary(), hedged with backup() when it is slow; returns (result, hedge).
+
+        hedge is None when no hedge was sent, "won" when backup's result is
+        returned and "lost" when primary finished first anyway. An error is
+        only raised when every attempt failed (the first error).
+        """
+        with self._lock:
+            self.calls += 1
+            self._credit = min(MAX_CREDIT, self._credit + self.max_rate)
+        delay = None if backup is None else self.delay(key)
+        if delay is None:
+            started = time.perf_counter()
+            result = primary()
+            self._observe(key, time.perf_counter() - started)
+            return result, None
+
+        results: queue.Queue = queue.Queue()
+        self._start(key, primary, "primary", results)
+        hedge = None
+        try:
+            name, ok, value = results.get(timeout=delay)
+        except queue.Empty:
+            if self._take_credit():
+                self._start(key, backup, "hedge", results)
+                hedge = "lost"
+            name, ok, value = results.get()
+            if not ok and hedge is not None:
+                # The other attempt may still succeed
+                error = value
+                name, ok, value = results.get()
+                if not ok:
+                    raise error
+        if not ok:
+            raise value
+        if name == "hedge":
+            hedge = "won"
+            with self._lock:
+                self.won += 1
+        return value, hedge
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.fired,
+                "won": self.won,
+                "hedge_rate": round(self.fired / self.calls, 4) if self.calls else 0.0,
+                "win_rate": round(self.won / self.fired, 4) if self.fired else 0.0,
+                "delays_s": {
+                    key: round(_percentile(list(samples), self.role_percentiles.get(key, self.percentile)), 3)
+                    for key, samples in self._latencies.items()
+                    if len(samples) >= self.min_samples
+                },
+            }
+
+    def gauges(self) -> dict:
+        """Counters for metrics.prometheus_text()."""
+        with self._lock:
+            return {
+                "agents_hedge_calls_total": ("LLM calls eligible for hedging", self.calls),
+                "agents_hedges_fired_total": ("Duplicate LLM calls sent for slow calls", self.fired),
+                "agents_hedges_won_total": ("Hedged calls answered by the duplicate first", self.won),
+            }
+
+
+_default_hedger: Hedger | None = None
+_default_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger | None:
+    """Process-wide hedger configured in .env, or None when HEDGE_ENABLED is off."""
+    global _default_hedger
+    if not HEDGE_ENABLED:
+        return None
+    with _default_lock:
+        if _default_hedger is None:
+            _default_hedger = Hedger(
+                HEDGE_PERCENTILE,
+                HEDGE_MAX_RATE,
+                HEDGE_MIN_SAMPLES,
+                HEDGE_WINDOW,
+                parse_role_values(HEDGE_ROLE_PERCENTILES),
+            )
+            metrics.add_gauges(_default_hedger.gauges)
+        return _default_hedger
+
+
+def simulate(calls: int = 2000, slow_rate: float = 0.03, slow_factor: float = 8.0,
+             latency_ms: float = 20.0, concurrency: int = 16, seed: int = 1) -> dict:
+    """Latency percentiles of a simulated slow-tail backend, plain and hedged."""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    def backend():
+        with rng_lock:
+            seconds = latency_ms / 1000 * rng.uniform(0.8, 1.2)
+            if rng.random() < slow_rate:
+                seconds *= slow_factor
+        time.sleep(seconds)
+        return seconds
+
+    def measure(run) -> list[float]:
+        from concurrent.futures import ThreadPoolExecutor
+
+        def one(_):
+            started = time.perf_counter()
+            run()
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(one, range(calls)))
+
+    hedger = Hedger(HEDGE_PERCENTILE, HEDGE_MAX_RATE, HEDGE_MIN_SAMPLES, HEDGE_WINDOW)
+    report = {}
+    for name, run in (("plain", backend), ("hedged", lambda: hedger.call("sim", backend, backend))):
+        latencies = measure(run)
+        report[name] = {f"p{int(q * 100)}_ms": round(_percentile(latencies, q) * 1000, 1) for q in metrics.QUANTILES}
+    report["hedges"] = hedger.stats()
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    args = sys.argv[1:]
+
+    def _arg(name, default):
+        return type(default)(args[args.index(name) + 1]) if name in args else default
+
+    print(json.dumps(
+        simulate(_arg("--calls", 2000), _arg("--slow-rate", 0.03), _arg("--slow-factor", 8.0), _arg("--latency-ms", 20.0)),
+        indent=2,
+    ))
@@ -0,0 +1,242 @@
+"""Searchable history of past runs (SQLite, full-text index, compressed outputs).
+
+Every finished run from main.py (CLI, Streamlit, HTTP server, batch) is
+stored with its prompt, roles, per-role output and wall time, and the email
+delivery status, so an old answer can be looked up without another LLM call:
+
+    store = get_history()
+    store.search("solid state batt", limit=20)   # full-text, every word matched as a prefix
+    store.recent(limit=20, offset=20)            # newest first, page 2
+    store.get(42)                                # one run with its outputs
+
+    python main.py --history "solid state"       # same from the CLI
+
+Output bodies are stored zlib-compressed; the FTS5 index is contentless, so
+the text is not kept a second time. Without FTS5 in the local SQLite build,
+search falls back to LIKE on the prompt. Only the newest HISTORY_MAX_RUNS
+runs are kept.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import HISTORY_PATH, HISTORY_MAX_RUNS
+from deadline import is_incomplete
+
+# Runs per page in the CLI listing and the Streamlit panel
+PAGE_SIZE = 20
+# Prompt matches rank above output matches (bm25 column weights)
+PROMPT_WEIGHT = 2.0
+OUTPUT_WEIGHT = 1.0
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix ("batt" finds "battery")."""
+    return " ".join(f'"{term}"*' for term in _TERM_RE.findall(text.lower()))
+
+
+class HistoryStore:
+    """Run history in one SQLite file; safe to share between threads."""
+
+    def __init__(self, path: str, max_runs: int = 5000):
+        self.path = path
+        self.max_runs = max(1, int(max_runs))
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, mode TEXT NOT NULL,"
+            " prompt TEXT NOT NULL, roles TEXT NOT NULL, wall_s REAL, email_status TEXT, request_id TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS run_outputs ("
+            " run_id INTEGER NOT NULL, position INTEGER NOT NULL, role TEXT NOT NULL, body BLOB NOT NULL,"
+            " size INTEGER NOT NULL, wall_s REAL, failed INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (run_id, position))"
+        )
+        try:
+            # Prefix indexes make 2-3 letter prefix queries as fast as whole words
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(prompt, outputs, content='', prefix='2 3')"
+            )
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        mode: str,
+        prompt: str,
+        roles: list[str],
+        outputs: dict[str, str],
+        timings: dict[str, float] | None = None,
+        wall_s: float | None = None,
+        email_status: str | None = None,
+        request_id: str | None = None,
+    ) -> int:
+        """Store a finished run and return its id; outputs maps role -> output text."""
+        timings = timings or {}
+        bodies = [(role, str(text)) for role, text in outputs.items()]
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO runs (created, mode, prompt, roles, wall_s, email_status, request_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), mode, prompt, json.dumps(list(roles)), wall_s, email_status, request_id),
+            )
+            run_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO run_outputs (run_id, position, role, body, size, wall_s, failed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, i, role, compress(text), len(text), timings.get(role), int(is_incomplete(text)))
+                    for i, (role, text) in enumerate(bodies)
+                ],
+            )
+            if self.full_text:
+                self._db.execute(
+                    "INSERT INTO runs_fts (rowid, prompt, outputs) VALUES (?, ?, ?)",
+                    (run_id, prompt, "\n".join(text for _, text in bodies)),
+                )
+            self._prune()
+            self._db.commit()
+        return run_id
+
+    def _prune(self) -> None:
+        newest = self._db.execute("SELECT MAX(id) FROM runs").fetchone()[0] or 0
+        stale = [row[0] for row in self._db.execute(
+            "SELECT id FROM runs WHERE id <= ? ORDER BY id", (newest - self.max_runs,)
+        )]
+        for run_id in stale:
+            if self.full_text:
+                # A contentless index needs the original text to remove a row
+                prompt = self._db.execute("SELECT prompt FROM runs WHERE id = ?", (run_id,)).fetchone()[0]
+                text = "\n".join(decompress(row[0]) for row in self._db.execute(
+                    "SELECT body FROM run_outputs WHERE run_id = ? ORDER BY position", (run_id,)
+                ))
+                self._db.execute(
+                    "INSERT INTO runs_fts (runs_fts, rowid, prompt, outputs) VALUES ('delete', ?, ?, ?)",
+                    (run_id, prompt, text),
+                )
+            self._db.execute("DELETE FROM run_outputs WHERE run_id = ?", (run_id,))
+            self._db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    @staticmethod
+    def _summary(row) -> dict:
+        return {
+            "id": row[0],
+            "created": row[1],
+            "mode": row[2],
+            "prompt": row[3],
+            "roles": json.loads(row[4]),
+            "wall_s": row[5],
+            "email_status": row[6],
+        }
+
+    def recent(self, limit: int = 20, offset: int = 0) -> list[dict]:
+        """Runs newest first, without their outputs."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created, mode, prompt, roles, wall_s, email_status FROM runs"
+                " ORDER BY id DESC LIMIT ? OFFSET ?",
+                (int(limit), int(offset)),
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def search(self, text: str, limit: int = 20, offset: int = 0) -> list[dict]:
+        """Runs whose prompt or outputs contain every word of text (as a prefix), best match first."""
+        query = fts_query(text)
+        if not query:
+            return self.recent(limit, offset)
+        with self._lock:
+            if self.full_text:
+                rows = self._db.execute(
+                    "SELECT r.id, r.created, r.mode, r.prompt, r.roles, r.wall_s, r.email_status"
+                    " FROM runs_fts JOIN runs r ON r.id = runs_fts.rowid WHERE runs_fts MATCH ?"
+                    f" ORDER BY bm25(runs_fts, {PROMPT_WEIGHT}, {OUTPUT_WEIGHT}), r.id DESC LIMIT ? OFFSET ?",
+                    (query, int(limit), int(offset)),
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT id, created, mode, prompt, roles, wall_s, email_status FROM runs"
+                    " WHERE prompt LIKE ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                    (f"%{text.strip()}%", int(limit), int(offset)),
+                ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def count(self, text: str = "") -> int:
+        """Number of runs search(text) pages through (all runs for empty text)."""
+        query = fts_query(text)
+        with self._lock:
+            if not query:
+                return self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            if self.full_text:
+                return self._db.execute("SELECT COUNT(*) FROM runs_fts WHERE runs_fts MATCH ?", (query,)).fetchone()[0]
+            return self._db.execute(
+                "SELECT COUNT(*) FROM runs WHERE prompt LIKE ?", (f"%{text.strip()}%",)
+            ).fetchone()[0]
+
+    def get(self, run_id: int) -> dict | None:
+        """One run with its outputs (role -> text) and per-role wall times, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, created, mode, prompt, roles, wall_s, email_status, request_id FROM runs WHERE id = ?",
+                (int(run_id),),
+            ).fetchone()
+            if row is None:
+                return None
+            outputs = self._db.execute(
+                "SELECT role, body, wall_s, failed FROM run_outputs WHERE run_id = ? ORDER BY position",
+                (int(run_id),),
+            ).fetchall()
+        run = self._summary(row)
+        run["request_id"] = row[7]
+        run["outputs"] = {role: decompress(body) for role, body, _, _ in outputs}
+        run["timings"] = {role: wall for role, _, wall, _ in outputs if wall is not None}
+        run["failed"] = [role for role, _, _, failed in outputs if failed]
+        return run
+
+    def stats(self) -> dict:
+        with self._lock:
+            runs = self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            stored, raw = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(body)), 0), COALESCE(SUM(size), 0) FROM run_outputs"
+            ).fetchone()
+        return {
+            "runs": runs,
+            "output_bytes": raw,
+            "stored_bytes": stored,
+            "compression_ratio": round(raw / stored, 2) if stored else 0.0,
+            "full_text": self.full_text,
+        }
+
+
+_default_store: HistoryStore | None = None
+_default_lock = threading.Lock()
+
+
+def get_history() -> HistoryStore | None:
+    """Process-wide history store configured in .env, or None when HISTORY_PATH is empty."""
+    global _default_store
+    if not HISTORY_PATH:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = HistoryStore(HISTORY_PATH, HISTORY_MAX_RUNS)
+        return _default_store
@@ -0,0 +1,188 @@
+"""Background jobs for the Streamlit app.
+
+A job runs one of the streaming entry points from main.py on a worker pool
+shared by every session of the server, so a Streamlit rerun (any widget
+interaction) or a second browser tab never starts the LLM work again. The
+UI submits a job, keeps its id in the session and polls snapshot() for
+progress:
+
+    manager = JobManager(JOB_MAX_WORKERS, JOB_RETENTION_SECONDS)   # one per server (st.cache_resource)
+    job_id = manager.submit("orchestrate", prompt, num_roles=4)
+    manager.snapshot(job_id)   # {"status": "running", "outputs": {...}, "partial": {...}, ...}
+    manager.cancel(job_id)
+
+Status: queued -> running -> done | error | cancelled. Cancelling a running
+job stops it at the next event and drops roles that have not started; LLM
+calls already in progress finish in the background and are discarded.
+Finished jobs are kept for JOB_RETENTION_SECONDS.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import ROLE_NAMES
+from plain_text import PlainTextConverter
+
+MODES = ("all", "agent", "orchestrate")
+FINISHED = ("done", "error", "cancelled")
+
+
+class Job:
+    def __init__(
+        self,
+        mode: str,
+        prompt: str,
+        role: str | None = None,
+        num_roles: int = 4,
+        role_timeout: float | None = None,
+        deadline: float | None = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.prompt = prompt
+        self.role = role
+        self.num_roles = num_roles
+        # Seconds per role and for the whole job; None takes the .env defaults
+        self.role_timeout = role_timeout
+        self.deadline = deadline
+        self.status = "queued"
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        # Roles taking part; for "orchestrate" known once the Orchestrator has chosen
+        self.selected: list[str] = [] if mode == "orchestrate" else ([role] if mode == "agent" else list(ROLE_NAMES))
+        self.outputs: dict[str, str] = {}
+        self.errors: dict[str, str] = {}
+        self.error: str | None = None
+        self._partial: dict[str, PlainTextConverter] = {}
+        self._cancel = threading.Event()
+        self._future = None
+
+    def events(self):
+        from main import stream_all_agents, stream_specific_agent, stream_with_orchestrator_multi
+
+        limits = {"role_timeout": self.role_timeout, "deadline": self.deadline}
+        if self.mode == "all":
+            return stream_all_agents(self.prompt, **limits)
+        if self.mode == "agent":
+            return stream_specific_agent(self.prompt, self.role, **limits)
+        return stream_with_orchestrator_multi(self.prompt, self.num_roles, **limits)
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, retention_seconds: float = 3600):
+        self.max_workers = max(1, int(max_workers))
+        self.retention_seconds = float(retention_seconds)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        mode: str,
+        prompt: str,
+        role: str | None = None,
+        num_roles: int = 4,
+        role_timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> str:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+        if mode == "agent" and role not in ROLE_NAMES:
+            raise ValueError(f"Unknown agent '{role}'. Choose one of: {', '.join(ROLE_NAMES)}.")
+        job = Job(mode, prompt, role, num_roles, role_timeout, deadline)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            # Under the lock, so cancel() never sees a queued job without its future
+            job._future = self._pool.submit(self._run, job)
+        return job.id
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if job._cancel.is_set():
+                return
+            job.status, job.started = "running", time.time()
+        events = None
+        try:
+            events = job.events()
+            for event in events:
+                if job._cancel.is_set():
+                    break
+                self._apply(job, event)
+        except Exception as exc:
+            with self._lock:
+                job.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            if events is not None:
+                # Stops the run's role pool; roles not yet started are dropped
+                events.close()
+            with self._lock:
+                if not job._cancel.is_set():
+                    job.status = "error" if job.error else "done"
+                    job.finished = time.time()
+                job._partial.clear()
+
+    def _apply(self, job: Job, event) -> None:
+        with self._lock:
+            if job._cancel.is_set():
+                return
+            if event.kind == "selected":
+                job.selected = [r.strip() for r in event.text.split(",") if r.strip()]
+            elif event.kind == "chunk":
+                job._partial.setdefault(event.role, PlainTextConverter()).feed(event.text)
+            elif event.role in ROLE_NAMES or event.role == "Email Delivery":
+                job._partial.pop(event.role, None)
+                job.outputs[event.role] = event.text
+                if event.kind == "error":
+                    job.errors[event.role] = event.text
+            elif event.kind == "error":
+                # Not tied to a role, e.g. the Orchestrator could not decide
+                job.error = event.text
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it is unknown or already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job._cancel.set()
+            if job.status == "queued":
+                job._future.cancel()
+            # A running job's thread notices at its next event; report it cancelled now
+            job.status, job.finished = "cancelled", time.time()
+        return True
+
+    def snapshot(self, job_id: str) -> dict | None:
+        """A consistent copy of the job's state, safe to render from another thread."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            end = job.finished or time.time()
+            return {
+                "id": job.id,
+                "mode": job.mode,
+                "prompt": job.prompt,
+                "role": job.role,
+                "status": job.status,
+                "selected": list(job.selected),
+                "outputs": dict(job.outputs),
+                "errors": dict(job.errors),
+                "partial": {role: converter.text() for role, converter in job._partial.items()},
+                "error": job.error,
+                "created": job.created,
+                "elapsed_s": round(end - (job.started or end), 1),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", *FINISHED)}
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+            del self._jobs[job_id]
+
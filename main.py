@@ -1,164 +1,628 @@
 import sys, os
-import re
-from crewai import Crew
+import copy
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Ensure project root is in sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import agents
-from agents import researcher, writer, summarizer, reviewer, emailer
+# Agents are built on first use; crewai is only imported on LLM paths
+from agents import ROLE_NAMES, new_agent
 
 # Import task builder
 from task import (
     get_all_role_tasks,
+    build_role_task,
     decide_role_with_orchestrator,
     decide_roles_with_orchestrator,
     detect_roles_from_text,
     extract_email_addresses,
 )
 
-from email_agent import send_email, format_email
-from config import SMTP_FROM
-
-# Removed keyword routing (run_task)
-def to_plain_text(value) -> str:
-    """Convert likely-Markdown content to readable plain text for email/UI."""
-    text = str(value or "")
-    # Remove fenced code blocks but keep inner text
-    text = re.sub(r"```[\s\S]*?```", lambda m: re.sub(r"^```.*\n|```$", "", m.group(0), flags=re.MULTILINE), text)
-    # Inline code
-    text = text.replace("`", "")
-    # Images ![alt](url) -> alt (url)
-    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", r"\1 (\2)", text)
-    # Links [text](url) -> text (url)
-    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r"\1 (\2)", text)
-    # Bold/italic markers
-    text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-    text = re.sub(r"\*(.*?)\*", r"\1", text)
-    text = re.sub(r"__(.*?)__", r"\1", text)
-    text = re.sub(r"_(.*?)_", r"\1", text)
-    # Headings
-    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.MULTILINE)
-    # Blockquotes
-    text = re.sub(r"^>\s?", "", text, flags=re.MULTILINE)
-    # List markers normalization
-    text = re.sub(r"^\s*[-*+]\s+", "- ", text, flags=re.MULTILINE)
-    # Horizontal rules
-    text = re.sub(r"^\s*([-*_]){3,}\s*$", "", text, flags=re.MULTILINE)
-    # Collapse excessive blank lines
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
-
-
-def run_all_agents(user_input: str):
-    role_to_agent = {
-        "Researcher": researcher,
-        "Writer": writer,
-        "Summarizer": summarizer,
-        "Reviewer": reviewer,
-        "Emailer": emailer,
+from email_agent import send_email, format_email, smtp_configured, SMTP_NOT_CONFIGURED
+from config import (
+    SMTP_FROM,
+    MAX_PARALLEL_ROLES,
+    OUTBOX_DISABLED,
+    OUTBOX_DRAIN_SECONDS,
+    BATCH_CONCURRENCY,
+    PIPELINE_ENABLED,
+    PIPELINE_CONTEXT_TOKENS,
+    SPECULATION_ENABLED,
+    ROLE_TIMEOUT_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+    CASSETTE_RECORD_PATH,
+)
+from cassette import get_recorder, start_recording
+from deadline import TIMEOUT_PREFIX, Budget, DeadlineExceeded, RoleTimeout, call_with_deadline, is_incomplete
+from hedge import get_hedger
+from history import get_history
+from outbox import get_outbox
+from result_cache import get_result_cache, make_cache_key
+from semantic_cache import SemanticResult, get_semantic_cache
+from singleflight import get_singleflight
+from speculation import Speculation, get_speculator
+from streaming import RoleEvent, bind_sink, capture_chunks
+from plain_text import to_plain_text
+from prompts import variable_text
+from sanitize import sanitize
+from pipeline import plan, run_pipeline
+from ratelimit import describe_error, estimate_call_tokens, limited_call, settle_usage
+import metrics
+
+if CASSETTE_RECORD_PATH:
+    # Every LLM call and SMTP transaction of this process goes to the cassette (see cassette.py)
+    start_recording(CASSETTE_RECORD_PATH)
+
+
+def _model_settings(agent) -> dict:
+    llm = getattr(agent, "llm", None)
+    return {
+        "model": getattr(llm, "model", None),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
     }
 
-    role_to_task = get_all_role_tasks(user_input)
 
+def execute_role(role: str, task, use_cache: bool = True):
+    """Run a single task with its agent in its own Crew and return the result.
+
+    Results are cached by role, task prompt and model settings (see
+    result_cache.py); pass use_cache=False to force a fresh LLM call.
+    Identical runs already in flight are joined rather than repeated (see
+    singleflight.py); those are recorded with cache "coalesced". A
+    paraphrase of an earlier prompt reuses its output (see semantic_cache.py)
+    as a SemanticResult carrying the matched prompt, recorded as "semantic".
+    With HEDGE_ENABLED, an unusually slow LLM call gets a duplicate and the
+    first answer is used (see hedge.py); recorded as hedge "won"/"lost".
+    """
+    from crewai import Crew
+
+    agent = task.agent
+    settings = _model_settings(agent)
+    with metrics.measure(role) as entry:
+        cache = get_result_cache() if use_cache else None
+        semantic = get_semantic_cache() if use_cache else None
+        entry["cache"] = "off" if cache is None and semantic is None else "miss"
+        key = make_cache_key(role, task.description, task.expected_output, settings)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                entry["cache"] = "hit"
+                return cached
+        if semantic is not None:
+            scope = make_cache_key(role, "", task.expected_output, settings)
+            prompt_text = variable_text(role, task.description)
+            hit = semantic.lookup(scope, role, prompt_text)
+            if hit is not None:
+                # The matched prompt is user text, so only the similarity is recorded
+                entry.update(cache="semantic", similarity=hit.similarity)
+                return SemanticResult(hit.output, hit.prompt, hit.similarity)
+
+        def kickoff():
+            if cache is not None:
+                # A run for this key may have finished between the lookup above and now;
+                # its miss was counted already
+                cached = cache.get(key, count=False)
+                if cached is not None:
+                    entry["cache"] = "hit"
+                    return cached
+            estimate = estimate_call_tokens(task.description + task.expected_output)
+
+            def attempt(attempt_task):
+                crew = Crew(agents=[attempt_task.agent], tasks=[attempt_task])
+                return limited_call(crew.kickoff, estimate, role), crew
+
+            hedger = get_hedger()
+            if hedger is None:
+                result, crew = attempt(task)
+            else:
+                (result, crew), hedge = hedger.call(
+                    role,
+                    bind_sink(lambda: attempt(task)),
+                    # Same prompt on its own Task and Agent; crewai fills both in as it runs
+                    bind_sink(lambda: attempt(_backup_task(role, task)), mute=True),
+                )
+                if hedge is not None:
+                    entry["hedge"] = hedge
+            metrics.add_usage(entry, result, settings["model"], crew)
+            settle_usage(estimate, entry["prompt_tokens"] + entry["completion_tokens"])
+            if cache is not None and result:
+                cache.set(key, str(result))
+            if semantic is not None and result:
+                semantic.add(scope, role, prompt_text, str(result))
+            return result
+
+        flights = get_singleflight()
+        if flights is None:
+            return kickoff()
+        result, shared = flights.do(key, kickoff)
+        if shared:
+            entry["cache"] = "coalesced"
+        return result
+
+
+def _backup_task(role: str, task):
+    """A copy of task for a hedged duplicate, with a fresh Agent of the same role."""
+    agent = new_agent(role)
+    if hasattr(task, "model_copy"):
+        return task.model_copy(update={"agent": agent})
+    backup = copy.copy(task)
+    backup.agent = agent
+    return backup
+
+
+def _run_role(role: str, task, use_cache: bool = True, speculation: Speculation | None = None, on_chunk=None):
+    """execute_role, or the result of the matching run started speculatively."""
+    started = speculation.claim(role, task, on_chunk) if speculation is not None else None
+    if started is not None:
+        return started.result()
+    return execute_role(role, task, use_cache)
+
+
+def request_budget(role_timeout: float | None = None, deadline: float | None = None) -> Budget:
+    """Deadlines for one request; None takes ROLE_TIMEOUT_SECONDS / REQUEST_DEADLINE_SECONDS, 0 is no limit."""
+    return Budget(
+        ROLE_TIMEOUT_SECONDS if role_timeout is None else role_timeout,
+        REQUEST_DEADLINE_SECONDS if deadline is None else deadline,
+    )
+
+
+def _execute_role_safely(
+    role: str,
+    task,
+    use_cache: bool = True,
+    speculation: Speculation | None = None,
+    budget: Budget | None = None,
+):
+    budget = budget or Budget()
+    try:
+        return budget.run(role, lambda: _run_role(role, task, use_cache, speculation))
+    except RoleTimeout as exc:
+        return str(exc)
+    except Exception as exc:
+        return f"Failed to run {role}: {describe_error(exc)}"
+
+
+def run_roles(
+    roles: list[str],
+    role_to_task: dict,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    speculation: Speculation | None = None,
+    budget: Budget | None = None,
+) -> dict:
+    """Run the given roles, up to max_workers LLM calls at a time.
+
+    Roles do not depend on each other, so each gets its own Crew. Results keep
+    the order of `roles`; a role that raises is reported as a "Failed to run"
+    message instead of discarding the outputs of the others, and one that
+    misses its budget (see deadline.py) as a "Timed out" message.
+    max_workers defaults to MAX_PARALLEL_ROLES; 1 runs the roles sequentially.
+    Roles already started by speculation (see speculation.py) are not run again.
+    """
+    selected = [r for r in roles if r in role_to_task]
+    workers = max(1, int(max_workers or MAX_PARALLEL_ROLES))
+    if workers == 1 or len(selected) <= 1:
+        return {r: _execute_role_safely(r, role_to_task[r], use_cache, speculation, budget) for r in selected}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(selected)), thread_name_prefix="role") as pool:
+        futures = {
+            r: pool.submit(metrics.bind(_execute_role_safely), r, role_to_task[r], use_cache, speculation, budget)
+            for r in selected
+        }
+        return {r: fut.result() for r, fut in futures.items()}
+
+
+def stream_roles(
+    roles: list[str],
+    role_to_task: dict,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    speculation: Speculation | None = None,
+    budget: Budget | None = None,
+):
+    """Run roles like run_roles, yielding RoleEvents as output arrives.
+
+    Each role yields "chunk" events while its LLM streams (when supported by
+    crewai) and then exactly one "done" or "error" event. Roles that finish
+    early are reported immediately instead of waiting for the slowest one.
+    """
+    selected = [r for r in roles if r in role_to_task]
+    if not selected:
+        return
+    events: queue.Queue = queue.Queue()
+    budget = budget or Budget()
+
+    def work(role: str, task):
+        on_chunk = lambda chunk: events.put(RoleEvent(role, "chunk", chunk))
+
+        def call():
+            # Chunks are captured per thread, so on the thread the deadline runs the role on
+            with capture_chunks(role, on_chunk, task.agent):
+                return _run_role(role, task, use_cache, speculation, on_chunk)
+
+        try:
+            events.put(RoleEvent(role, "done", str(budget.run(role, call))))
+        except RoleTimeout as exc:
+            events.put(RoleEvent(role, "error", str(exc)))
+        except Exception as exc:
+            events.put(RoleEvent(role, "error", f"Failed to run {role}: {describe_error(exc)}"))
+
+    workers = max(1, int(max_workers or MAX_PARALLEL_ROLES))
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(selected)), thread_name_prefix="role")
+    try:
+        for r in selected:
+            pool.submit(metrics.bind(work), r, role_to_task[r])
+        yield from _until_finished(events, len(set(selected)))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _until_finished(events: queue.Queue, count: int):
+    # Events up to the last role's "done"/"error"; chunks a timed-out role streams afterwards are dropped
+    finished = set()
+    while len(finished) < count:
+        event = events.get()
+        if event.role in finished:
+            continue
+        if event.kind != "chunk":
+            finished.add(event.role)
+        yield event
+
+
+def run_pipeline_roles(
+    user_input: str,
+    roles: list[str],
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    on_result=None,
+    speculation: Speculation | None = None,
+    budget: Budget | None = None,
+):
+    """Run roles as a dependency graph (see pipeline.py); returns (outputs, report)."""
+    selected = [r for r in roles if r in ROLE_NAMES]
+    workers = max(1, int(max_workers or MAX_PARALLEL_ROLES))
+    return run_pipeline(
+        user_input,
+        selected,
+        build_role_task,
+        lambda role, task: _run_role(role, task, use_cache, speculation),
+        workers,
+        PIPELINE_CONTEXT_TOKENS,
+        on_result,
+        budget,
+    )
+
+
+def stream_pipeline_roles(
+    user_input: str,
+    roles: list[str],
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    speculation: Speculation | None = None,
+    budget: Budget | None = None,
+):
+    """Streaming variant of run_pipeline_roles; yields RoleEvents like stream_roles."""
+    selected = [r for r in roles if r in ROLE_NAMES]
+    if not selected:
+        return
+    events: queue.Queue = queue.Queue()
+
+    def execute(role: str, task):
+        on_chunk = lambda chunk: events.put(RoleEvent(role, "chunk", chunk))
+        with capture_chunks(role, on_chunk, task.agent):
+            return _run_role(role, task, use_cache, speculation, on_chunk)
+
+    def on_result(role: str, text: str, ok: bool):
+        events.put(RoleEvent(role, "done" if ok else "error", text))
+
+    workers = max(1, int(max_workers or MAX_PARALLEL_ROLES))
+    threading.Thread(
+        target=metrics.bind(run_pipeline),
+        args=(user_input, selected, build_role_task, execute, workers, PIPELINE_CONTEXT_TOKENS, on_result, budget),
+        name="pipeline",
+        daemon=True,
+    ).start()
+    yield from _until_finished(events, len(set(selected)))
+
+
+def remember_run(mode: str, user_input: str, roles: list[str], outputs: dict, started: float) -> None:
+    """Store a finished run in the history (see history.py) and the cassette being recorded, if any.
+
+    Never fails the run itself.
+    """
+    recorder = get_recorder()
+    if recorder is not None and roles:
+        recorder.note_run(mode, user_input, roles, round(time.perf_counter() - started, 3))
+    store = get_history()
+    if store is None or not roles:
+        return
+    try:
+        store.record(
+            mode,
+            user_input,
+            roles,
+            {r: str(outputs[r]) for r in roles if r in outputs},
+            timings=metrics.role_timings(),
+            wall_s=round(time.perf_counter() - started, 3),
+            email_status=outputs.get("Email Delivery"),
+            request_id=metrics.current_request_id(),
+        )
+    except sqlite3.Error:
+        pass
+
+
+def _remembered(mode: str, user_input: str, roles: list[str], events):
+    # Passes the events through and stores the run once they are all out (not when closed early)
+    started = time.perf_counter()
     outputs = {}
-    for role, agent in role_to_agent.items():
-        crew = Crew(agents=[agent], tasks=[role_to_task[role]])
-        outputs[role] = crew.kickoff()
+    for event in events:
+        if event.kind != "chunk":
+            outputs[event.role] = event.text
+        yield event
+    remember_run(mode, user_input, roles, outputs, started)
+
+
+@metrics.per_request
+def run_all_agents(
+    user_input: str,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    started = time.perf_counter()
+    budget = request_budget(role_timeout, deadline)
+    role_to_task = get_all_role_tasks(user_input)
 
+    outputs = run_roles(ROLE_NAMES, role_to_task, max_workers, use_cache, budget=budget)
+    remember_run("all", user_input, ROLE_NAMES, outputs, started)
     return outputs
 
 
-def run_with_orchestrator(user_input: str):
-    role = decide_role_with_orchestrator(user_input)
+@metrics.per_request
+def stream_all_agents(
+    user_input: str,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    """Streaming variant of run_all_agents; yields RoleEvents."""
+    budget = request_budget(role_timeout, deadline)
+    role_to_task = get_all_role_tasks(user_input)
+    events = stream_roles(ROLE_NAMES, role_to_task, max_workers, use_cache, budget=budget)
+    yield from _remembered("all", user_input, ROLE_NAMES, events)
+
+
+@metrics.per_request
+def stream_specific_agent(
+    user_input: str,
+    role: str,
+    use_cache: bool = True,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    """Streaming variant of run_specific_agent; yields RoleEvents."""
+    if role not in ROLE_NAMES:
+        yield RoleEvent("Error", "error", f"Unknown agent '{role}'. Choose one of: Researcher, Writer, Summarizer, Reviewer, Emailer.")
+        return
+    budget = request_budget(role_timeout, deadline)
+    events = stream_roles([role], get_all_role_tasks(user_input, [role]), 1, use_cache, budget=budget)
+    yield from _remembered("agent", user_input, [role], events)
+
+
+@metrics.per_request
+def run_with_orchestrator(
+    user_input: str,
+    use_cache: bool = True,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    budget = request_budget(role_timeout, deadline)
+    role = _decide_within(budget, lambda: decide_role_with_orchestrator(user_input))
     if role is None:
-        return {"Error": "Orchestrator could not decide a role."}
+        return {"Error": _undecided_message(budget, "a role")}
 
-    return run_specific_agent(user_input, role)
+    # What is left of the deadline carries over (0 would mean no limit, hence the floor)
+    remaining = budget.remaining()
+    return run_specific_agent(
+        user_input, role, use_cache, budget.role_timeout or 0, 0 if remaining is None else max(remaining, 0.001)
+    )
 
 
-def run_with_orchestrator_multi(user_input: str, num_roles: int):
-    explicit_roles = detect_roles_from_text(user_input)
-    roles = explicit_roles if explicit_roles else decide_roles_with_orchestrator(user_input, num_roles)
+def _decide_within(budget: Budget, decide):
+    """The Orchestrator's decision, or None when the request deadline passes first."""
+    try:
+        return call_with_deadline(decide, budget.remaining())
+    except DeadlineExceeded:
+        return None
 
-    recipients = extract_email_addresses(user_input)
-    if not roles:
-        return {"Error": "Orchestrator could not decide roles."}
-
-    role_to_agent = {
-        "Researcher": researcher,
-        "Writer": writer,
-        "Summarizer": summarizer,
-        "Reviewer": reviewer,
-        "Emailer": emailer,
-    }
 
-    role_to_task = get_all_role_tasks(user_input)
-    outputs = {}
-    for role in roles:
-        if role not in role_to_agent:
-            continue
-        agent = role_to_agent[role]
-        task = role_to_task[role]
-        crew = Crew(agents=[agent], tasks=[task])
-        outputs[role] = crew.kickoff()
+def _undecided_message(budget: Budget, what: str) -> str:
+    if budget.expired():
+        return f"Orchestrator could not decide {what} before the {budget.total:g}s request deadline."
+    return f"Orchestrator could not decide {what}."
+
 
+def resolve_roles(user_input: str, num_roles: int, budget: Budget | None = None) -> list[str]:
+    """Roles requested explicitly in the prompt, else the Orchestrator's choice (none if it runs out of time)."""
+    explicit_roles = detect_roles_from_text(user_input)
+    if explicit_roles:
+        return explicit_roles
+    return _decide_within(budget or Budget(), lambda: decide_roles_with_orchestrator(user_input, num_roles)) or []
+
+
+def resolve_roles_speculatively(
+    user_input: str,
+    num_roles: int,
+    use_cache: bool = True,
+    stream: bool = False,
+    budget: Budget | None = None,
+) -> tuple[list[str], Speculation | None]:
+    """resolve_roles, starting the likeliest roles while the Orchestrator decides.
+
+    Returns the roles and the Speculation whose kept runs the role runners
+    should claim (None when nothing was started); close() it when done.
+    """
+    explicit_roles = detect_roles_from_text(user_input)
+    if explicit_roles:
+        return explicit_roles, None
+    speculation = get_speculator().start(
+        user_input,
+        num_roles,
+        build_role_task,
+        lambda role, task: execute_role(role, task, use_cache),
+        stream,
+    )
+    try:
+        roles = _decide_within(budget or Budget(), lambda: decide_roles_with_orchestrator(user_input, num_roles)) or []
+    except BaseException:
+        if speculation is not None:
+            speculation.close()
+        raise
+    if speculation is not None:
+        # Pipeline roles with upstream roles get context, so only roots can reuse a speculative run
+        keep = [r for r, deps in plan(roles).items() if not deps] if PIPELINE_ENABLED else roles
+        speculation.resolve(roles, keep)
+    return roles, speculation
+
+
+@metrics.per_request
+def run_with_orchestrator_multi(
+    user_input: str,
+    num_roles: int,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    on_report=None,
+    speculate: bool | None = None,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    """Run the roles chosen for the prompt and email the results if asked.
+
+    With PIPELINE_ENABLED, dependent roles receive upstream output (see
+    pipeline.py) and on_report(report) gets the per-role/per-edge timings.
+    With speculate (default SPECULATION_ENABLED), likely roles start while
+    the Orchestrator decides (see speculation.py).
+    Each role gets role_timeout seconds and the whole request deadline
+    seconds (defaults from .env, 0 = no limit); the email goes out with
+    the roles that finished in time (see deadline.py).
+    """
+    started = time.perf_counter()
+    budget = request_budget(role_timeout, deadline)
+    speculation = None
+    if (SPECULATION_ENABLED if speculate is None else speculate):
+        roles, speculation = resolve_roles_speculatively(user_input, num_roles, use_cache, budget=budget)
+    else:
+        roles = resolve_roles(user_input, num_roles, budget)
+    try:
+        if not roles:
+            return {"Error": _undecided_message(budget, "roles")}
+
+        if PIPELINE_ENABLED:
+            outputs, report = run_pipeline_roles(
+                user_input, roles, max_workers, use_cache, speculation=speculation, budget=budget
+            )
+            if on_report is not None:
+                on_report(report)
+        else:
+            role_to_task = get_all_role_tasks(user_input, roles)
+            outputs = run_roles(roles, role_to_task, max_workers, use_cache, speculation, budget)
+    finally:
+        if speculation is not None:
+            speculation.close()
+
+    delivery = deliver_email(user_input, roles, outputs)
+    if delivery is not None:
+        outputs["Email Delivery"] = delivery
+    remember_run("orchestrate", user_input, roles, outputs, started)
+    return outputs
+
+
+@metrics.per_request
+def stream_with_orchestrator_multi(
+    user_input: str,
+    num_roles: int,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+    speculate: bool | None = None,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    """Streaming variant of run_with_orchestrator_multi; yields RoleEvents.
+
+    The first event has kind "selected" and lists the chosen roles; the email
+    step runs after all roles are done and is reported as "Email Delivery".
+    A role started speculatively replays the chunks it produced before the
+    decision.
+    """
+    started = time.perf_counter()
+    budget = request_budget(role_timeout, deadline)
+    speculation = None
+    if (SPECULATION_ENABLED if speculate is None else speculate):
+        roles, speculation = resolve_roles_speculatively(user_input, num_roles, use_cache, stream=True, budget=budget)
+    else:
+        roles = resolve_roles(user_input, num_roles, budget)
+    try:
+        if not roles:
+            yield RoleEvent("Error", "error", _undecided_message(budget, "roles"))
+            return
+        yield RoleEvent("Orchestrator", "selected", ", ".join(roles))
+
+        outputs = {}
+        if PIPELINE_ENABLED:
+            events = stream_pipeline_roles(user_input, roles, max_workers, use_cache, speculation, budget)
+        else:
+            role_to_task = get_all_role_tasks(user_input, roles)
+            events = stream_roles(roles, role_to_task, max_workers, use_cache, speculation, budget)
+        for event in events:
+            if event.kind != "chunk":
+                outputs[event.role] = event.text
+            yield event
+    finally:
+        if speculation is not None:
+            speculation.close()
+
+    delivery = deliver_email(user_input, roles, outputs)
+    if delivery is not None:
+        outputs["Email Delivery"] = delivery
+        yield RoleEvent("Email Delivery", "done", delivery)
+    remember_run("orchestrate", user_input, roles, outputs, started)
+
+
+def deliver_email(user_input: str, roles: list[str], outputs: dict) -> str | None:
+    """Format role outputs into one email for the addresses in the prompt.
+
+    Only roles that finished are included; selected roles that failed or
+    timed out are listed in a closing section instead.
+    The email is queued in the outbox (outbox.py) and sent in the background,
+    unless OUTBOX_DISABLED is set. Returns the delivery status message, or
+    None when no email was requested.
+    """
+    recipients = extract_email_addresses(user_input)
     if "Emailer" in roles or recipients:
         if recipients:
             # Build formatted email using sections
             sections = []
-            # Sanitizer to drop unwanted boilerplate/headers/credentials from agent outputs
-            def _sanitize(text: str) -> str:
-                import re as _re
-                unwanted_exact = {
-                    "this concludes the structured research brief.",
-                }
-                patterns = [
-                    r"^subject\s*:.*$",
-                    r"^to\s*:.*$",
-                    r"^body\s*:.*$",
-                    r"^dear\s+.+,$",
-                    r"^best\s+regards,?\s*$",
-                    r"^email content\s*:.*$",
-                    r"^contact\s*$",
-                    r"^to\s+send\s+this\s+.*email.*$",
-                    r"smtp_[a-z_]+\s*=.*",
-                    r"imap_[a-z_]+\s*=.*",
-                    r"openai_api_key\s*=.*",
-                ]
-                compiled = [_re.compile(pat, flags=_re.IGNORECASE) for pat in patterns]
-                lines = [ln for ln in str(text).split("\n")]
-                filtered: list[str] = []
-                skip_until_blank = False
-                trigger_block = _re.compile(r"^to\s+send\s+this\s+.*email.*$", _re.IGNORECASE)
-                for ln in lines:
-                    raw = ln.rstrip("\r")
-                    if skip_until_blank:
-                        if not raw.strip():
-                            skip_until_blank = False
-                        continue
-                    if not raw.strip():
-                        continue
-                    if raw.strip().lower() in unwanted_exact:
-                        continue
-                    if trigger_block.search(raw):
-                        skip_until_blank = True
-                        continue
-                    if any(rx.search(raw) for rx in compiled):
-                        continue
-                    # remove placeholder-only lines like [Your Name]
-                    if _re.fullmatch(r"\[[^\]]+\]", raw.strip()):
-                        continue
-                    filtered.append(raw)
-                # collapse extra whitespace
-                return "\n".join(filtered).strip()
+            missing = []
             for r in ["Researcher", "Writer", "Summarizer", "Reviewer"]:
-                if r in outputs:
-                    plain = to_plain_text(_sanitize(outputs[r]))
+                if r in outputs and not is_incomplete(outputs[r]):
+                    plain = to_plain_text(sanitize(outputs[r]))
                     sections.append((f"=== {r} ===", plain))
+                elif r in roles:
+                    reason = "did not finish in time" if str(outputs.get(r, "")).startswith(TIMEOUT_PREFIX) else "failed"
+                    missing.append(f"- {r}: {reason}")
+            if missing:
+                sections.append(("=== Not included ===", "\n".join(missing)))
 
             draft_subject = "Requested topic results"
-            email_draft = str(outputs.get("Emailer", ""))
+            email_draft = "" if is_incomplete(outputs.get("Emailer", "")) else str(outputs.get("Emailer", ""))
             for line in email_draft.splitlines():
                 if line.lower().startswith("subject:"):
                     draft_subject = line.split(":", 1)[1].strip() or draft_subject
@@ -191,42 +655,106 @@ def run_with_orchestrator_multi(user_input: str, num_roles: int):
                 signature_lines=[sender_name, SMTP_FROM],
             )
 
-            outputs["Email Delivery"] = send_email(subject=subject, body=body, to_addresses=recipients)
+            if OUTBOX_DISABLED:
+                return send_email(subject=subject, body=body, to_addresses=recipients)
+            if not smtp_configured():
+                return SMTP_NOT_CONFIGURED
+            entry = get_outbox().enqueue(subject, body, recipients, scope=metrics.current_request_id())
+            return _outbox_message(entry)
         else:
-            outputs["Email Delivery"] = "No valid email addresses found in the prompt."
-    return outputs
-
-
-def run_specific_agent(user_input: str, role: str):
-    role_to_agent = {
-        "Researcher": researcher,
-        "Writer": writer,
-        "Summarizer": summarizer,
-        "Reviewer": reviewer,
-        "Emailer": emailer,
-    }
-
-    if role not in role_to_agent:
+            return "No valid email addresses found in the prompt."
+    return None
+
+
+def _outbox_message(entry: dict) -> str:
+    """Delivery status line for an outbox entry; a repeated email keeps its first outcome."""
+    recipients, key = ", ".join(entry["recipients"]), entry["id"]
+    if entry["status"] == "sent":
+        return f"Email already sent to: {recipients} (id {key})"
+    if entry["status"] == "dead":
+        return f"Email to {recipients} was not delivered (id {key}): {entry['last_error']}"
+    return f"Email queued for: {recipients} (id {key})"
+
+
+@metrics.per_request
+def run_specific_agent(
+    user_input: str,
+    role: str,
+    use_cache: bool = True,
+    role_timeout: float | None = None,
+    deadline: float | None = None,
+):
+    if role not in ROLE_NAMES:
         return {"Error": f"Unknown agent '{role}'. Choose one of: Researcher, Writer, Summarizer, Reviewer, Emailer."}
 
-    role_to_task = get_all_role_tasks(user_input)
-    agent = role_to_agent[role]
-    task = role_to_task[role]
+    started = time.perf_counter()
+    budget = request_budget(role_timeout, deadline)
+    task = get_all_role_tasks(user_input, [role])[role]
 
-    crew = Crew(agents=[agent], tasks=[task])
-    result = crew.kickoff()
+    try:
+        result = budget.run(role, lambda: execute_role(role, task, use_cache))
+    except RoleTimeout as exc:
+        result = str(exc)
+    remember_run("agent", user_input, [role], {role: result}, started)
 
     # Match single-agent output format (all roles with placeholders)
-    outputs = {r: (result if r == role else "Not related to this agent") for r in role_to_agent.keys()}
+    outputs = {r: (result if r == role else "Not related to this agent") for r in ROLE_NAMES}
     return outputs
 
 
+def print_history(query: str | None, run_id: str | None, page: int = 1) -> int:
+    """CLI view of history.py: one run with its outputs, or a page of matching runs. Returns the exit code."""
+    from history import PAGE_SIZE
+
+    store = get_history()
+    if store is None:
+        print("Run history is off (HISTORY_PATH is empty).")
+        return 1
+    if run_id is not None:
+        run = store.get(int(run_id)) if run_id.isdigit() else None
+        if run is None:
+            print(f"No run with id {run_id}")
+            return 1
+        print(f"#{run['id']} {time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created']))} [{run['mode']}] {run['prompt']}")
+        for role, text in run["outputs"].items():
+            timing = f" ({run['timings'][role]:.1f}s)" if role in run["timings"] else ""
+            print(f"\n=== {role}{timing} ===\n{to_plain_text(text)}")
+        if run["email_status"]:
+            print(f"\nEmail Delivery: {run['email_status']}")
+        return 0
+    page = max(1, page)
+    runs = store.search(query or "", PAGE_SIZE, (page - 1) * PAGE_SIZE)
+    total = store.count(query or "")
+    pages = max(1, -(-total // PAGE_SIZE))
+    print(f"{total} run(s){f' matching {query!r}' if query else ''}, page {page} of {pages}")
+    for run in runs:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["created"]))
+        prompt = run["prompt"] if len(run["prompt"]) <= 70 else run["prompt"][:67] + "..."
+        print(f"#{run['id']:<6} {when}  {','.join(run['roles']):<30} {prompt}")
+    if runs:
+        print("\nShow a run with --history-show <id>.")
+    return 0
+
+
 if __name__ == "__main__":
     # Simple CLI when no input files are provided
     args = sys.argv[1:]
     run_all = False
     force_agent = None
-    use_orchestrator = True
+    use_orchestrator = False
+    max_workers = None
+    use_cache = True
+    batch_path = None
+    batch_output = None
+    batch_concurrency = BATCH_CONCURRENCY
+    show_timings = False
+    speculate = None
+    history_query = None
+    history_run = None
+    history_page = 1
+    no_daemon = False
+    role_timeout = None
+    deadline = None
 
     # Simple manual args parsing
     i = 0
@@ -241,19 +769,116 @@ if __name__ == "__main__":
         elif args[i] == "--orchestrate":
             use_orchestrator = True
             i += 1
+        elif args[i] == "--max-parallel" and i + 1 < len(args):
+            max_workers = int(args[i + 1])
+            i += 2
+        elif args[i] == "--no-cache":
+            use_cache = False
+            i += 1
+        elif args[i] == "--no-daemon":
+            no_daemon = True
+            i += 1
+        elif args[i] == "--timings":
+            show_timings = True
+            i += 1
+        elif args[i] == "--speculate":
+            speculate = True
+            i += 1
+        elif args[i] == "--role-timeout" and i + 1 < len(args):
+            # Seconds each role may take; 0 = no limit
+            role_timeout = float(args[i + 1])
+            i += 2
+        elif args[i] == "--deadline" and i + 1 < len(args):
+            # Seconds for the whole run; roles still running then are reported as timed out
+            deadline = float(args[i + 1])
+            i += 2
+        elif args[i] == "--history":
+            # Usage: --history ["search words"] [--page N]; no words lists the newest runs
+            if i + 1 < len(args) and not args[i + 1].startswith("--"):
+                history_query = args[i + 1]
+                i += 2
+            else:
+                history_query = ""
+                i += 1
+        elif args[i] == "--history-show" and i + 1 < len(args):
+            history_run = args[i + 1]
+            i += 2
+        elif args[i] == "--page" and i + 1 < len(args):
+            history_page = int(args[i + 1])
+            i += 2
+        elif args[i] == "--batch" and i + 1 < len(args):
+            batch_path = args[i + 1]
+            i += 2
+        elif args[i] == "--batch-output" and i + 1 < len(args):
+            batch_output = args[i + 1]
+            i += 2
+        elif args[i] == "--batch-concurrency" and i + 1 < len(args):
+            batch_concurrency = int(args[i + 1])
+            i += 2
+        elif args[i] == "--email-status" and i + 1 < len(args):
+            # Usage: --email-status <id printed when the email was queued>
+            status = get_outbox().status(args[i + 1])
+            print(json.dumps(status, indent=2) if status else f"No queued email with id {args[i + 1]}")
+            sys.exit(0 if status else 1)
         else:
             collected.append(args[i])
             i += 1
 
+    if history_query is not None or history_run is not None:
+        # Local lookup only: no LLM call, and crewai is never imported
+        sys.exit(print_history(history_query, history_run, history_page))
+
     if sum([1 if run_all else 0, 1 if force_agent else 0, 1 if use_orchestrator else 0]) > 1:
         print("Choose only one mode: --all OR --agent <Role> OR --orchestrate.")
         sys.exit(1)
+    if force_agent and force_agent.capitalize() not in ROLE_NAMES:
+        print(f"Unknown agent '{force_agent}'. Choose one of: {', '.join(ROLE_NAMES)}.")
+        sys.exit(1)
 
+    # No mode flag means --orchestrate
     if run_all:
-        output = run_all_agents(user_input)
-        print("\n=== Final Outputs (All Agents) ===")
-        for role, response in output.items():
-            print(f"{role}: {response}")
+        runner = lambda text: run_all_agents(text, max_workers, use_cache, role_timeout, deadline)
+    elif force_agent:
+        runner = lambda text: run_specific_agent(text, force_agent.capitalize(), use_cache, role_timeout, deadline)
+    else:
+        on_report = (lambda report: print(report.summary())) if show_timings else None
+        runner = lambda text: run_with_orchestrator_multi(
+            text, 5, max_workers, use_cache, on_report, speculate, role_timeout, deadline
+        )
+
+    # A running daemon (daemon.py) has crewai, the agents and the caches loaded already.
+    # Options it does not take (--max-parallel, --timings, --speculate) and recording a cassette
+    # keep the run in-process.
+    from daemon_client import DaemonError, daemon_running, forward_run, forward_send
+
+    daemon_up = not no_daemon and daemon_running()
+    use_daemon = daemon_up and max_workers is None and not show_timings and speculate is None and not CASSETTE_RECORD_PATH
+    if use_daemon:
+        local_runner = runner
+        daemon_mode = "all" if run_all else ("agent" if force_agent else "orchestrate")
+        daemon_agent = force_agent.capitalize() if force_agent else None
+
+        def runner(text):
+            outputs = forward_run(daemon_mode, text, daemon_agent, 5, use_cache, role_timeout, deadline)
+            # None: the daemon stopped since the check above
+            return local_runner(text) if outputs is None else outputs
+
+    if batch_path:
+        # Usage: --batch prompts.jsonl [--batch-output results.jsonl] [--batch-concurrency N]
+        from batch import run_batch
+
+        output_path = batch_output or os.path.splitext(batch_path)[0] + ".out.jsonl"
+
+        def report(record):
+            status = "ok" if record["ok"] else f"failed: {record['error']}"
+            print(f"[{record['id']}] {status} ({record['elapsed_s']}s)")
+
+        summary = run_batch(batch_path, output_path, runner, batch_concurrency, on_result=report)
+        print(
+            f"\n=== Batch done: {summary['completed']} completed, {summary['failed']} failed, "
+            f"{summary['skipped']} skipped (already done) in {summary['elapsed_s']}s "
+            f"({summary['prompts_per_min']} prompts/min) -> {summary['output']} ==="
+        )
     else:
         # Prepare input
         if collected:
@@ -267,13 +892,24 @@ if __name__ == "__main__":
             to_addr = collected[1]
             subj = collected[2]
             body = " ".join(collected[3:]) if len(collected) > 3 else ""
-            print(send_email(subj, body, to_addr))
-        elif use_orchestrator:
-            output = run_with_orchestrator_multi(user_input, 5)
-        elif force_agent:
-            output = run_specific_agent(user_input, force_agent.capitalize())
-        else:
-            output = run_with_orchestrator_multi(user_input, 5)
-        print("\n=== Final Outputs ===")
+            status = forward_send(subj, body, to_addr) if daemon_up else None
+            print(send_email(subj, body, to_addr) if status is None else status)
+            # SMTP-only path: nothing else to run, and crewai is never imported
+            sys.exit(0)
+
+        try:
+            output = runner(user_input)
+        except DaemonError as exc:
+            print(f"Daemon error: {exc}")
+            sys.exit(1)
+        print("\n=== Final Outputs (All Agents) ===" if run_all else "\n=== Final Outputs ===")
         for role, response in output.items():
+            if isinstance(response, SemanticResult):
+                print(f"[{role}: reused from a similar earlier prompt ({response.similarity:.2f}): {response.matched_prompt[:200]!r}]")
             print(f"{role}: {response}")
+
+    if not OUTBOX_DISABLED and not use_daemon:
+        # Queued emails go out on a background thread; let it finish before exiting
+        remaining = get_outbox().drain(OUTBOX_DRAIN_SECONDS)
+        if remaining:
+            print(f"{remaining} email(s) still queued; they will be retried on the next run.")
@@ -0,0 +1,321 @@
+"""Per-request, per-role timing, token, cost and error metrics.
+
+Every LLM role run, local router decision, Orchestrator LLM decision and
+SMTP delivery is recorded as one dict (no prompt or output text):
+
+    {"ts": ..., "request_id": "...", "kind": "role|router|orchestrator|smtp",
+     "role": "Writer", "wall_s": 4.2, "queue_s": 0.0, "prompt_tokens": 812,
+     "completion_tokens": 655, "cost_usd": 0.0005, "cache": "miss|hit|semantic|off|coalesced",
+     "source": null, "error": null}
+
+Role runs that sent a duplicate LLM call (hedge.py) also carry
+"hedge": "won" or "lost".
+
+Records are kept in memory (the last METRICS_MAX_RECORDS, for the
+Streamlit summary and Prometheus export). With METRICS_JSONL_PATH set they
+are also appended to that file for later analysis; it is rotated to
+<path>.1 at METRICS_JSONL_MAX_BYTES, so at most twice that is kept:
+
+    python metrics.py                      # p50/p95/p99 by role from the JSONL file
+    python metrics.py --prometheus         # same data in Prometheus text format
+
+Request ids and queue times follow work into thread pools through bind().
+"""
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from config import (
+    METRICS_JSONL_PATH,
+    METRICS_JSONL_MAX_BYTES,
+    METRICS_MAX_RECORDS,
+    LLM_PRICE_PROMPT_PER_1M,
+    LLM_PRICE_COMPLETION_PER_1M,
+)
+
+# Served without an LLM call; left out of the latency percentiles
+CACHED = ("hit", "semantic", "coalesced")
+
+# USD per 1M (prompt, completion) tokens; LLM_PRICE_* in .env override these
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+QUANTILES = (0.5, 0.95, 0.99)
+
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+_queue_wait: contextvars.ContextVar[float] = contextvars.ContextVar("queue_wait", default=0.0)
+_records: deque = deque(maxlen=max(1, METRICS_MAX_RECORDS))
+_lock = threading.Lock()
+_gauge_sources: list = []
+
+
+@contextmanager
+def request(request_id: str | None = None):
+    """Tag everything recorded inside the block (and in bound workers) with one id."""
+    token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+def per_request(fn):
+    """Decorator: run fn (or iterate its generator) in a new request unless one is active."""
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            if _request_id.get() is not None:
+                return (yield from fn(*args, **kwargs))
+            with request():
+                return (yield from fn(*args, **kwargs))
+
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _request_id.get() is not None:
+            return fn(*args, **kwargs)
+        with request():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def bind(fn):
+    """Wrap fn for a worker thread: keeps the request id and measures queue time."""
+    context = contextvars.copy_context()
+    queued = time.perf_counter()
+
+    def run_queued(*args, **kwargs):
+        _queue_wait.set(time.perf_counter() - queued)
+        return fn(*args, **kwargs)
+
+    def bound(*args, **kwargs):
+        return context.copy().run(run_queued, *args, **kwargs)
+
+    return bound
+
+
+def estimate_cost(model: str | None, prompt_tokens: int, completion_tokens: int) -> float:
+    name = str(model or DEFAULT_MODEL).split("/")[-1]
+    # Longest matching prefix, so "gpt-4o-mini-2024-07-18" uses the gpt-4o-mini price
+    match = max((m for m in MODEL_PRICES if name.startswith(m)), key=len, default=None)
+    prompt_price, completion_price = MODEL_PRICES.get(match, (0.0, 0.0))
+    if LLM_PRICE_PROMPT_PER_1M is not None:
+        prompt_price = LLM_PRICE_PROMPT_PER_1M
+    if LLM_PRICE_COMPLETION_PER_1M is not None:
+        completion_price = LLM_PRICE_COMPLETION_PER_1M
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def add_usage(record: dict, result, model: str | None = None, crew=None) -> None:
+    """Copy token usage from a crewai result (or crew) into record."""
+    usage = getattr(result, "token_usage", None) or getattr(crew, "usage_metrics", None)
+    if usage is None:
+        return
+    if isinstance(usage, dict):
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    else:
+        prompt, completion = getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0)
+    record["prompt_tokens"] = int(prompt or 0)
+    record["completion_tokens"] = int(completion or 0)
+    record["cost_usd"] = round(estimate_cost(model, record["prompt_tokens"], record["completion_tokens"]), 6)
+
+
+def record(entry: dict) -> None:
+    entry.setdefault("ts", time.time())
+    with _lock:
+        _records.append(entry)
+        if METRICS_JSONL_PATH:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(METRICS_JSONL_PATH)), exist_ok=True)
+                with open(METRICS_JSONL_PATH, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+                    size = f.tell()
+                if size >= METRICS_JSONL_MAX_BYTES > 0:
+                    os.replace(METRICS_JSONL_PATH, METRICS_JSONL_PATH + ".1")
+            except OSError:
+                pass
+
+
+@contextmanager
+def measure(role: str, kind: str = "role", **fields):
+    """Time the block and record it; the yielded dict can be filled in.
+
+    Exceptions are recorded in "error" and re-raised.
+    """
+    entry = {
+        "request_id": _request_id.get(),
+        "kind": kind,
+        "role": role,
+        "wall_s": 0.0,
+        "queue_s": round(_queue_wait.get(), 4),
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cost_usd": 0.0,
+        "cache": None,
+        "source": None,
+        "error": None,
+        **fields,
+    }
+    started = time.perf_counter()
+    try:
+        yield entry
+    except BaseException as exc:
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        entry["wall_s"] = round(time.perf_counter() - started, 4)
+        record(entry)
+
+
+def add_gauges(source) -> None:
+    """Export source() -> {name: (help, value)} from prometheus_text() (e.g. limiter state)."""
+    with _lock:
+        if source not in _gauge_sources:
+            _gauge_sources.append(source)
+
+
+def records() -> list[dict]:
+    with _lock:
+        return list(_records)
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+def role_timings(request_id: str | None = None) -> dict[str, float]:
+    """Wall time per role run recorded for a request (the current one by default)."""
+    request_id = request_id or _request_id.get()
+    return {
+        entry["role"]: entry["wall_s"]
+        for entry in records()
+        if request_id is not None and entry.get("request_id") == request_id and entry.get("kind") == "role"
+    }
+
+
+def _quantile(sorted_values: list[float], q: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values), max(1, math.ceil(q * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def summarize(entries: list[dict] | None = None) -> list[dict]:
+    """One row per (kind, role): count, errors, cache hits, p50/p95/p99, tokens, cost.
+
+    The percentiles (and "timed", their sample count) only cover runs that
+    were not served from a cache, so they describe real LLM calls.
+    """
+    entries = records() if entries is None else entries
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for entry in entries:
+        groups.setdefault((entry.get("kind", "role"), entry.get("role", "")), []).append(entry)
+    rows = []
+    for (kind, role), items in sorted(groups.items()):
+        walls = sorted(e.get("wall_s", 0.0) for e in items if e.get("cache") not in CACHED)
+        row = {
+            "kind": kind,
+            "role": role,
+            "count": len(items),
+            "timed": len(walls),
+            "errors": sum(1 for e in items if e.get("error")),
+            "cache_hits": sum(1 for e in items if e.get("cache") == "hit"),
+            "coalesced": sum(1 for e in items if e.get("cache") == "coalesced"),
+            "semantic_hits": sum(1 for e in items if e.get("cache") == "semantic"),
+            "prompt_tokens": sum(e.get("prompt_tokens", 0) for e in items),
+            "completion_tokens": sum(e.get("completion_tokens", 0) for e in items),
+            "cost_usd": round(sum(e.get("cost_usd", 0.0) for e in items), 6),
+            "queue_p95_s": _quantile(sorted(e.get("queue_s", 0.0) for e in items), 0.95),
+        }
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}_s"] = _quantile(walls, q)
+        rows.append(row)
+    return rows
+
+
+def prometheus_text(entries: list[dict] | None = None) -> str:
+    """Summaries and counters in the Prometheus text exposition format."""
+    rows = summarize(entries)
+    lines = [
+        "# HELP agents_duration_seconds Wall time per run not served from a cache",
+        "# TYPE agents_duration_seconds summary",
+    ]
+    for row in rows:
+        labels = f'kind="{row["kind"]}",role="{row["role"]}"'
+        for q in QUANTILES:
+            lines.append(f'agents_duration_seconds{{{labels},quantile="{q}"}} {row[f"p{int(q * 100)}_s"]}')
+        lines.append(f"agents_duration_seconds_count{{{labels}}} {row['timed']}")
+    counters = [
+        ("agents_errors_total", "Runs that raised", "errors"),
+        ("agents_cache_hits_total", "Role results served from the cache", "cache_hits"),
+        ("agents_coalesced_total", "Role runs that joined an identical run in flight", "coalesced"),
+        ("agents_semantic_hits_total", "Role results reused from a similar earlier prompt", "semantic_hits"),
+        ("agents_prompt_tokens_total", "Prompt tokens sent to the LLM", "prompt_tokens"),
+        ("agents_completion_tokens_total", "Completion tokens returned by the LLM", "completion_tokens"),
+        ("agents_cost_usd_total", "Estimated LLM cost in USD", "cost_usd"),
+    ]
+    for name, help_text, key in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for row in rows:
+            lines.append(f'{name}{{kind="{row["kind"]}",role="{row["role"]}"}} {row[key]}')
+    with _lock:
+        sources = list(_gauge_sources)
+    for source in sources:
+        for name, (help_text, value) in source().items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def load_jsonl(path: str) -> list[dict]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    paths = [a for a in args if not a.startswith("--")]
+    path = paths[0] if paths else METRICS_JSONL_PATH
+    if not path or not os.path.exists(path):
+        print(f"No metrics file at {path!r}")
+        sys.exit(1)
+    data = load_jsonl(path)
+    if "--prometheus" in args:
+        print(prometheus_text(data), end="")
+    elif "--json" in args:
+        print(json.dumps(summarize(data), indent=2))
+    else:
+        print(f"{'kind':<13} {'role':<13} {'count':>6} {'err':>4} {'hits':>5} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'tokens':>9} {'cost $':>9}")
+        for row in summarize(data):
+            tokens = row["prompt_tokens"] + row["completion_tokens"]
+            print(
+                f"{row['kind']:<13} {row['role']:<13} {row['count']:>6} {row['errors']:>4} {row['cache_hits']:>5} "
+                f"{row['p50_s']:>8.2f} {row['p95_s']:>8.2f} {row['p99_s']:>8.2f} {tokens:>9} {row['cost_usd']:>9.4f}"
+            )
@@ -0,0 +1,276 @@
+"""Durable email outbox: queue formatted emails, deliver them in the background.
+
+deliver_email() only writes the message to a SQLite table and returns; a
+daemon thread sends due messages through email_agent.deliver_message().
+A failed attempt is retried with exponential backoff (with jitter) until
+OUTBOX_MAX_ATTEMPTS, after which the message is parked as "dead".
+Permanent SMTP rejections (5xx other than authentication) go to "dead"
+straight away.
+
+Each message has an idempotency key (by default a hash of the request it
+belongs to, recipients, subject and body); enqueueing the same key again
+does not send twice and reports the existing message's status instead.
+The same content from another request gets a new key and is sent again.
+Message status: queued -> sending -> sent | queued (retry) | dead.
+"""
+import hashlib
+import json
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+
+from config import (
+    OUTBOX_PATH,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_BACKOFF_SECONDS,
+    OUTBOX_MAX_BACKOFF_SECONDS,
+)
+from email_agent import deliver_message
+
+# A message left in "sending" this long (e.g. the process died mid-send)
+# is picked up again
+SENDING_LEASE_SECONDS = 300
+# Upper bound on how long the worker sleeps between checks
+WORKER_POLL_SECONDS = 5.0
+
+
+def make_email_key(subject: str, body: str, recipients: list[str], scope: str | None = None) -> str:
+    """Idempotency key; scope (e.g. the request id) keeps separate requests apart."""
+    payload = json.dumps([scope, sorted(recipients), subject, body])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        # Usually a credentials change that will be fixed; keep retrying
+        return False
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+
+class Outbox:
+    """SQLite-backed email queue with one background delivery thread.
+
+    sender(subject, body, recipients) must raise on failure; it defaults to
+    email_agent.deliver_message.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sender=None,
+        max_attempts: int = 6,
+        backoff_seconds: float = 30,
+        max_backoff_seconds: float = 3600,
+    ):
+        self.path = path
+        self.sender = sender or deliver_message
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_seconds = float(backoff_seconds)
+        self.max_backoff_seconds = float(max_backoff_seconds)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id TEXT PRIMARY KEY, subject TEXT NOT NULL, body TEXT NOT NULL, recipients TEXT NOT NULL,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL,"
+            " last_error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    def enqueue(
+        self, subject: str, body: str, recipients: list[str], key: str | None = None, scope: str | None = None
+    ) -> dict:
+        """Queue a message and return its status() entry.
+
+        A known key is not queued again; the entry returned is then the
+        existing message's, which may already be "sent" or "dead".
+        """
+        recipients = list(recipients)
+        key = key or make_email_key(subject, body, recipients, scope)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (id, subject, body, recipients, status, next_attempt, created, updated)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (key, subject or "", body or "", json.dumps(recipients), now, now, now),
+            )
+            self._db.commit()
+        self.start()
+        self._wake.set()
+        return self.status(key)
+
+    def status(self, key: str) -> dict | None:
+        """Current state of a queued message, or None for an unknown key."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, attempts, next_attempt, last_error, recipients, created, updated"
+                " FROM outbox WHERE id = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "attempts": row[2],
+            "next_attempt": row[3] if row[1] == "queued" else None,
+            "last_error": row[4],
+            "recipients": json.loads(row[5]),
+            "created": row[6],
+            "updated": row[7],
+        }
+
+    def requeue(self, key: str) -> bool:
+        """Move a dead message back to the queue with a fresh attempt count."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, next_attempt = ?, updated = ?"
+                " WHERE id = ? AND status = 'dead'",
+                (now, now, key),
+            )
+            self._db.commit()
+        if cursor.rowcount:
+            self._wake.set()
+        return bool(cursor.rowcount)
+
+    def pending(self) -> int:
+        """Number of messages not yet sent or dead."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('queued', 'sending')"
+            ).fetchone()[0]
+
+    def _claim_due(self, now: float) -> list[tuple]:
+        due = "((status = 'queued' AND next_attempt <= ?) OR (status = 'sending' AND updated < ?))"
+        params = (now, now - SENDING_LEASE_SECONDS)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, subject, body, recipients, attempts FROM outbox WHERE {due} ORDER BY next_attempt",
+                params,
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                # Another process sharing the file may have claimed it first
+                cursor = self._db.execute(
+                    f"UPDATE outbox SET status = 'sending', updated = ? WHERE id = ? AND {due}",
+                    (now, row[0]) + params,
+                )
+                if cursor.rowcount:
+                    claimed.append(row)
+            self._db.commit()
+        return claimed
+
+    def _finish(self, key: str, attempts: int, error: Exception | None) -> None:
+        now = time.time()
+        if error is None:
+            status, next_attempt, message = "sent", now, None
+        else:
+            message = f"{type(error).__name__}: {error}"
+            if attempts >= self.max_attempts or _permanent(error):
+                status, next_attempt = "dead", now
+            else:
+                delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+                status, next_attempt = "queued", now + delay * random.uniform(0.5, 1.0)
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ?"
+                " WHERE id = ?",
+                (status, attempts, next_attempt, message, now, key),
+            )
+            self._db.commit()
+
+    def process_due(self) -> int:
+        """Try every message that is due now; returns how many were attempted."""
+        claimed = self._claim_due(time.time())
+        for key, subject, body, recipients, attempts in claimed:
+            try:
+                self.sender(subject, body, json.loads(recipients))
+            except Exception as exc:
+                self._finish(key, attempts + 1, exc)
+            else:
+                self._finish(key, attempts + 1, None)
+        return len(claimed)
+
+    def _next_due(self) -> float | None:
+        with self._lock:
+            return self._db.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status = 'queued'"
+            ).fetchone()[0]
+
+    def _seconds_until_due(self) -> float:
+        next_due = self._next_due()
+        if next_due is None:
+            return WORKER_POLL_SECONDS
+        return min(WORKER_POLL_SECONDS, max(0.0, next_due - time.time()))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.process_due()
+                wait = self._seconds_until_due()
+            except sqlite3.Error:
+                wait = WORKER_POLL_SECONDS
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the background delivery thread (once)."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self._worker.start()
+
+    def drain(self, timeout: float) -> int:
+        """Deliver queued messages, including retries, for up to timeout seconds.
+
+        Used before a short-lived process (the CLI) exits. Messages whose
+        next retry is after the timeout stay queued for the next process.
+        Returns the number of messages still pending.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process_due():
+                continue
+            if self._sending():
+                # The background thread is still delivering
+                time.sleep(0.05)
+                continue
+            next_due = self._next_due()
+            if next_due is None or next_due > deadline:
+                break
+            time.sleep(max(0.0, next_due - time.time()))
+        return self.pending()
+
+    def _sending(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'sending'").fetchone()[0]
+
+
+_default_outbox: Outbox | None = None
+_default_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """Return the process-wide outbox configured in .env."""
+    global _default_outbox
+    with _default_lock:
+        if _default_outbox is None:
+            _default_outbox = Outbox(
+                OUTBOX_PATH,
+                max_attempts=OUTBOX_MAX_ATTEMPTS,
+                backoff_seconds=OUTBOX_BACKOFF_SECONDS,
+                max_backoff_seconds=OUTBOX_MAX_BACKOFF_SECONDS,
+            )
+        return _default_outbox
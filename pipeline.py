@@ -0,0 +1,183 @@
+"""Run selected roles as a dependency graph, feeding upstream output downstream.
+
+    Researcher -> Writer -> Reviewer
+    Researcher -> Summarizer
+
+Only the selected roles take part: a role depends on its nearest selected
+upstream roles (Reviewer falls back to Researcher when Writer is not
+selected) and starts as soon as those are done, so independent branches run
+in parallel and the run takes as long as its critical path. Upstream output
+is passed to the downstream task as context, trimmed to a token budget. A
+role whose upstream failed or timed out still runs, from the prompt alone.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import metrics
+from deadline import Budget, RoleTimeout
+from ratelimit import describe_error
+
+ROLE_DEPENDENCIES = {
+    "Researcher": [],
+    "Writer": ["Researcher"],
+    "Summarizer": ["Researcher"],
+    "Reviewer": ["Writer"],
+    "Emailer": [],
+}
+
+# Rough size of a token in characters, for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the start of text within max_tokens, cut at a line break if possible."""
+    limit = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    return text[:cut].rstrip() + "\n[... truncated]"
+
+
+def plan(roles: list[str], dependencies: dict | None = None) -> dict[str, list[str]]:
+    """Map each selected role to the selected roles it waits for."""
+    dependencies = ROLE_DEPENDENCIES if dependencies is None else dependencies
+    selected = set(roles)
+
+    def upstream(role: str, seen: set) -> list[str]:
+        found = []
+        for dep in dependencies.get(role, []):
+            if dep in seen:
+                continue
+            seen.add(dep)
+            if dep in selected:
+                found.append(dep)
+            else:
+                found.extend(upstream(dep, seen))
+        return found
+
+    return {role: upstream(role, {role}) for role in roles}
+
+
+@dataclass
+class EdgeTiming:
+    """Hand-off from one role to the next, in seconds since the run started."""
+    upstream: str
+    downstream: str
+    upstream_done_s: float
+    downstream_start_s: float
+    context_tokens: int
+
+    @property
+    def handoff_ms(self) -> float:
+        return (self.downstream_start_s - self.upstream_done_s) * 1000
+
+
+@dataclass
+class PipelineReport:
+    roles: dict[str, tuple[float, float]] = field(default_factory=dict)
+    edges: list[EdgeTiming] = field(default_factory=list)
+    dependencies: dict[str, list[str]] = field(default_factory=dict)
+    wall_s: float = 0.0
+
+    def critical_path(self) -> list[str]:
+        """Chain of roles that determined the total run time."""
+        if not self.roles:
+            return []
+        role = max(self.roles, key=lambda r: self.roles[r][1])
+        path = [role]
+        while True:
+            deps = [d for d in self.dependencies.get(role, []) if d in self.roles]
+            if not deps:
+                break
+            role = max(deps, key=lambda r: self.roles[r][1])
+            path.append(role)
+        return path[::-1]
+
+    def summary(self) -> str:
+        lines = [f"Pipeline wall time: {self.wall_s:.2f}s, critical path: {' -> '.join(self.critical_path())}"]
+        for role, (start, end) in sorted(self.roles.items(), key=lambda item: item[1]):
+            lines.append(f"  {role}: {start:.2f}s -> {end:.2f}s ({end - start:.2f}s)")
+        for edge in self.edges:
+            lines.append(
+                f"  {edge.upstream} -> {edge.downstream}: hand-off {edge.handoff_ms:.1f} ms, "
+                f"{edge.context_tokens} context tokens"
+            )
+        return "\n".join(lines)
+
+
+def run_pipeline(
+    user_input: str,
+    roles: list[str],
+    build_task,
+    execute,
+    max_workers: int = 5,
+    context_tokens: int = 1500,
+    on_result=None,
+    budget: Budget | None = None,
+) -> tuple[dict, PipelineReport]:
+    """Run roles in dependency order; returns (outputs, report).
+
+    build_task(role, user_input, context) builds the task, where context maps
+    upstream role -> trimmed output; execute(role, task) runs it and raises on
+    failure. on_result(role, text, ok) is called as each role finishes.
+    Outputs keep the order of `roles`; failures are reported as
+    "Failed to run <role>: ..." and missed deadlines as "Timed out: ..."
+    like run_roles.
+    """
+    budget = budget or Budget()
+    deps = plan(roles)
+    report = PipelineReport(dependencies=deps)
+    outputs: dict[str, str] = {}
+    succeeded: set[str] = set()
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run(role: str, context: dict[str, str]) -> None:
+        start = time.perf_counter() - started
+        with lock:
+            for upstream, text in context.items():
+                report.edges.append(
+                    EdgeTiming(upstream, role, report.roles[upstream][1], start, estimate_tokens(text))
+                )
+        call = lambda: execute(role, build_task(role, user_input, context or None))
+        try:
+            text, ok = str(budget.run(role, call)), True
+        except RoleTimeout as exc:
+            text, ok = str(exc), False
+        except Exception as exc:
+            text, ok = f"Failed to run {role}: {describe_error(exc)}", False
+        with lock:
+            report.roles[role] = (start, time.perf_counter() - started)
+            outputs[role] = text
+            if ok:
+                succeeded.add(role)
+        if on_result is not None:
+            on_result(role, text, ok)
+
+    pending = list(roles)
+    workers = max(1, min(int(max_workers), len(roles) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="role") as pool:
+        running = set()
+        while pending or running:
+            for role in [r for r in pending if all(d in outputs for d in deps[r])]:
+                pending.remove(role)
+                ok_deps = [d for d in deps[role] if d in succeeded]
+                share = context_tokens // len(ok_deps) if ok_deps else 0
+                context = {d: trim_to_tokens(outputs[d], share) for d in ok_deps}
+                running.add(pool.submit(metrics.bind(run), role, context))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+
+    report.wall_s = time.perf_counter() - started
+    return {role: outputs[role] for role in roles if role in outputs}, report
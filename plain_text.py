@@ -0,0 +1,324 @@
+"""Markdown to plain text for email bodies and the Streamlit UI.
+
+The conversion is a single pass over the lines of the input: every line
+goes once through a fixed chain of line stages (code fences, links and
+emphasis, headings, quotes, list markers, rules, blank-line collapsing).
+Stages that need to look ahead (an open code fence, blank lines before a
+list item) hold back only the lines they are waiting on, so the converter
+also accepts input in chunks:
+
+    converter = PlainTextConverter()
+    for chunk in chunks:
+        converter.feed(chunk)
+        partial = converter.text()
+    final = converter.close()
+
+The output matches the former chain of whole-text re.sub passes, with one
+difference: links and images must open and close on the same line.
+"""
+import re
+from functools import lru_cache
+
+_FENCE = "```"
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)]+)\)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+_BOLD_STAR_RE = re.compile(r"\*\*(.*?)\*\*")
+_ITALIC_STAR_RE = re.compile(r"\*(.*?)\*")
+_BOLD_UNDERSCORE_RE = re.compile(r"__(.*?)__")
+_ITALIC_UNDERSCORE_RE = re.compile(r"_(.*?)_")
+_HEADING_RE = re.compile(r"#{1,6}")
+_LIST_MARKERS = ("-", "*", "+")
+_RULE_CHARS = frozenset("-*_")
+# After inline markup is gone, a line starting with none of these (or with
+# whitespace) is plain content for every block stage
+_BLOCK_START = frozenset("#>-+*_")
+
+
+def _is_blank(line: str) -> bool:
+    return not line or line.isspace()
+
+
+def _strip_emphasis(line: str) -> str:
+    # Paired markers are removed left to right, "**" before "*" and "__"
+    # before "_". With an even count every marker goes, so the regexes are
+    # only needed to find the one marker left over from an odd count.
+    if "*" in line:
+        if line.count("*") % 2 == 0:
+            line = line.replace("*", "")
+        else:
+            line = _ITALIC_STAR_RE.sub(r"\1", _BOLD_STAR_RE.sub(r"\1", line))
+    if "_" in line:
+        if line.count("_") % 2 == 0:
+            line = line.replace("_", "")
+        else:
+            line = _ITALIC_UNDERSCORE_RE.sub(r"\1", _BOLD_UNDERSCORE_RE.sub(r"\1", line))
+    return line
+
+
+def _inline(line: str) -> str:
+    # Images ![alt](url) and links [text](url) -> "text (url)", then emphasis
+    if "](" in line:
+        if "![" in line:
+            line = _IMAGE_RE.sub(r"\1 (\2)", line)
+        line = _LINK_RE.sub(r"\1 (\2)", line)
+    return _strip_emphasis(line)
+
+
+class PlainTextConverter:
+    """Chunk-fed Markdown to plain text converter (see module docstring)."""
+
+    def __init__(self):
+        self._partial = ""
+        self._closed = False
+        # Open code fence: text before the opener, the opener's line tail and
+        # the raw lines seen since, kept until the closer shows up
+        self._fence_prefix: str | None = None
+        self._fence_tail = ""
+        self._fence_lines: list[str] = []
+        # A heading or list marker with nothing after it swallows the
+        # following blank lines and joins the next line
+        self._heading_join = False
+        self._quote_join = False
+        self._list_join = False
+        self._list_prefix = ""
+        # Marker line as received, kept in case the input ends right after it
+        self._list_marker: tuple[str, list[str], bool] | None = None
+        # Blank lines are dropped before list items and around rules, so
+        # those stages hold them until the next content line decides
+        self._list_blanks: list[str] = []
+        self._rule_blanks: list[str] = []
+        self._after_rule = False
+        self._last_empty = False
+        self._lines: list[str] = []
+
+    def feed(self, chunk: str) -> None:
+        """Add input; every completed line is converted right away."""
+        if not chunk or self._closed:
+            return
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        if self._fence_prefix is None and not any(_FENCE in line for line in lines):
+            after_fence = self._after_fence
+            for line in lines:
+                after_fence(line)
+        else:
+            for line in lines:
+                self._fence(line)
+
+    def text(self) -> str:
+        """Plain text of the lines converted so far."""
+        return "\n".join(self._lines).strip()
+
+    def close(self) -> str:
+        """Flush held-back input and return the complete plain text."""
+        if self._closed:
+            return self.text()
+        self._closed = True
+        self._fence(self._partial)
+        self._partial = ""
+        if self._fence_prefix is not None:
+            # An opener without a closer stays as text (backticks removed)
+            lines = [self._fence_prefix + self._fence_tail] + self._fence_lines
+            self._fence_prefix, self._fence_tail, self._fence_lines = None, "", []
+            for line in lines:
+                self._after_fence(line)
+        # A trailing bare heading or ">" leaves an empty last line
+        if self._heading_join:
+            self._heading_join = False
+            self._quote("")
+        if self._quote_join:
+            self._quote_join = False
+            self._list("")
+        if self._list_join:
+            self._list_join = False
+            line, blanks, swallowed = self._list_marker
+            if swallowed:
+                self._rule(self._list_prefix)
+            else:
+                # A marker at the very end of the input has no whitespace
+                # after it, so it is not a list item
+                self._list_blanks = blanks
+                self._list_item(line, self._list_prefix[:-2], final=True)
+        for blank in self._list_blanks:
+            self._rule(blank)
+        self._list_blanks = []
+        return self.text()
+
+    # Stages, in the order the former regex passes ran
+
+    def _fence(self, line: str) -> None:
+        if self._fence_prefix is None:
+            if _FENCE in line:
+                self._scan_fences("", line)
+            else:
+                self._after_fence(line)
+            return
+        close_at = line.find(_FENCE)
+        if close_at == -1:
+            self._fence_lines.append(line)
+            return
+        # The opener removes the rest of its own line and that line's newline
+        prefix, held = self._fence_prefix, self._fence_lines
+        self._fence_prefix, self._fence_tail, self._fence_lines = None, "", []
+        if held:
+            self._after_fence(prefix + held[0])
+            for inner in held[1:]:
+                self._after_fence(inner)
+            prefix = ""
+        self._scan_fences(prefix + line[:close_at], line[close_at + 3:])
+
+    def _scan_fences(self, head: str, line: str) -> None:
+        while True:
+            open_at = line.find(_FENCE)
+            if open_at == -1:
+                self._after_fence(head + line)
+                return
+            close_at = line.find(_FENCE, open_at + 3)
+            if close_at != -1:
+                # Opener and closer on one line: only the backticks go
+                head += line[:close_at + 3]
+                line = line[close_at + 3:]
+                continue
+            self._fence_prefix = head + line[:open_at]
+            self._fence_tail = line[open_at:]
+            return
+
+    def _after_fence(self, line: str) -> None:
+        if "`" in line:
+            line = line.replace("`", "")
+        if "](" in line or "*" in line or "_" in line:
+            line = _inline(line)
+        if self._heading_join or self._quote_join or self._list_join or self._after_rule:
+            self._heading(line)
+        elif not line or line.isspace():
+            # Same as the heading -> quote -> list path for a blank line
+            self._list_blanks.append(line)
+        elif line[0] == "#" or line[0] == ">":
+            self._heading(line)
+        elif line[0] in _BLOCK_START or line[0].isspace():
+            # Heading and quote stages only act on "#" and ">"
+            self._list_item(line, "")
+        else:
+            # Plain content: no block stage changes it, held blank lines stay
+            if self._list_blanks or self._rule_blanks:
+                held = self._rule_blanks + self._list_blanks
+                self._rule_blanks, self._list_blanks = [], []
+                for blank in held:
+                    self._emit(blank)
+            self._last_empty = False
+            self._lines.append(line)
+
+    def _heading(self, line: str) -> None:
+        if self._heading_join:
+            if _is_blank(line):
+                return
+            self._heading_join = False
+            stripped = line.lstrip()
+            if stripped != line:
+                # Leading whitespace was swallowed too: no longer at a line start
+                self._quote(stripped)
+                return
+        if line.startswith("#"):
+            line = line[_HEADING_RE.match(line).end():].lstrip()
+            if not line:
+                self._heading_join = True
+                return
+        self._quote(line)
+
+    def _quote(self, line: str) -> None:
+        self._quote_join = False
+        if line.startswith(">"):
+            line = line[1:]
+            if not line:
+                # A bare ">" also removes its newline, unless it is the last line
+                self._quote_join = True
+                return
+            if line[0].isspace():
+                line = line[1:]
+        self._list(line)
+
+    def _list(self, line: str) -> None:
+        if self._list_join:
+            self._list_marker = (self._list_marker[0], [], True)
+            if _is_blank(line):
+                return
+            self._list_join = False
+            stripped = line.lstrip()
+            if stripped != line:
+                self._rule(self._list_prefix + stripped)
+                return
+            self._list_item(line, self._list_prefix)
+            return
+        if _is_blank(line):
+            self._list_blanks.append(line)
+            return
+        self._list_item(line, "")
+
+    def _list_item(self, line: str, prefix: str, final: bool = False) -> None:
+        stripped = line.lstrip()
+        if stripped[:1] in _LIST_MARKERS and not (final and len(stripped) == 1):
+            rest = stripped[1:]
+            content = rest.lstrip()
+            if not content:
+                self._list_marker = (line, self._list_blanks, bool(rest))
+                self._list_blanks = []
+                self._list_join = True
+                self._list_prefix = prefix + "- "
+                return
+            if content != rest:
+                self._list_blanks = []
+                self._rule(prefix + "- " + content)
+                return
+        for blank in self._list_blanks:
+            self._rule(blank)
+        self._list_blanks = []
+        self._rule(prefix + line)
+
+    def _rule(self, line: str) -> None:
+        if _is_blank(line):
+            if not self._after_rule:
+                self._rule_blanks.append(line)
+            return
+        stripped = line.strip()
+        if len(stripped) >= 3 and _RULE_CHARS.issuperset(stripped):
+            # A rule and the blank lines around it become one empty line
+            self._rule_blanks = []
+            self._after_rule = True
+            self._emit("")
+            return
+        self._after_rule = False
+        for blank in self._rule_blanks:
+            self._emit(blank)
+        self._rule_blanks = []
+        self._emit(line)
+
+    def _emit(self, line: str) -> None:
+        # Runs of empty lines collapse to one ("\n{3,}" -> "\n\n")
+        if not line:
+            if self._last_empty:
+                return
+            self._last_empty = True
+        else:
+            self._last_empty = False
+        self._lines.append(line)
+
+
+def convert(text: str) -> str:
+    """Convert a complete Markdown string (uncached)."""
+    converter = PlainTextConverter()
+    converter.feed(text)
+    return converter.close()
+
+
+@lru_cache(maxsize=64)
+def _convert_cached(text: str) -> str:
+    return convert(text)
+
+
+def to_plain_text(value) -> str:
+    """Convert likely-Markdown content to readable plain text for email/UI.
+
+    Results are memoized, so re-rendering the same output (e.g. on a
+    Streamlit rerun) does not convert it again.
+    """
+    return _convert_cached(str(value or ""))
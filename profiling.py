@@ -0,0 +1,105 @@
+"""Profilers for a block of code that runs work on many threads.
+
+    with profiled("replay.prof", "replay.folded"):
+        ...
+
+stats_path gets cProfile data for the calling thread and every thread
+started inside the block, merged into one file (python -m pstats, snakeviz).
+folded_path gets wall-clock stack samples of all threads in the folded
+format that flamegraph.pl, inferno and speedscope read; time spent waiting
+(locks, sleeps, network) shows up there too, unlike in cProfile.
+"""
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Seconds between stack samples for the flamegraph
+SAMPLE_INTERVAL = 0.005
+
+_THREAD_NUMBER_RE = re.compile(r"[-_ ]?\d+(?:_\d+)?$")
+
+
+class StackSampler:
+    """Counts the stacks of all other threads every interval seconds."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Pool threads differ only by number; merge them into one root
+                root = _THREAD_NUMBER_RE.sub("", names.get(ident, "thread")) or "thread"
+                self.counts[";".join([root] + stack[::-1])] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(stats_path: str | None = None, folded_path: str | None = None, interval: float = SAMPLE_INTERVAL):
+    """Profile the block into stats_path (cProfile) and/or folded_path (flamegraph); None skips one."""
+    profiles: list[cProfile.Profile] = []
+    lock = threading.Lock()
+
+    def profile_new_thread(*_):
+        # Runs once at the start of each new thread and hands over to a profiler of its own
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with lock:
+            profiles.append(profile)
+        profile.enable()
+
+    # Started first, so the sampler thread stays out of the cProfile data
+    sampler = StackSampler(interval) if folded_path else None
+    if sampler is not None:
+        sampler.start()
+    if stats_path:
+        main_profile = cProfile.Profile()
+        threading.setprofile(profile_new_thread)
+        main_profile.enable()
+    try:
+        yield
+    finally:
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(folded_path)
+        if stats_path:
+            main_profile.disable()
+            threading.setprofile(None)
+            stats = pstats.Stats(main_profile)
+            with lock:
+                others = list(profiles)
+            for profile in others:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    # A thread that finished before running any profiled call
+                    pass
+            stats.dump_stats(stats_path)
@@ -0,0 +1,269 @@
+"""Role prompt templates, laid out for provider-side prompt caching.
+
+OpenAI-compatible providers reuse the longest prefix they have seen before
+(from PROMPT_CACHE_MIN_TOKENS on), so every task description is rendered as
+
+    role instructions          identical bytes for every call of the role
+    "<Label>: " + user input   variable, always last
+    upstream context           variable
+
+Nothing dynamic (dates, ids, counts) may go into the first part. There is no
+padding to reach PROMPT_CACHE_MIN_TOKENS: below it nothing is cached, and
+extra shared text would only add tokens to every call.
+Tokens are counted locally (tiktoken when installed, else ~4 characters per
+token) and variable input over PROMPT_MAX_INPUT_TOKENS is compacted, then
+trimmed, upstream context first.
+
+    python prompts.py ["sample topic"]    # stable prefix tokens per role
+"""
+import functools
+import re
+import sys
+from dataclasses import dataclass
+
+from agents import AGENT_SPECS
+from config import PROMPT_MAX_INPUT_TOKENS, PROMPT_CACHE_MIN_TOKENS
+from metrics import DEFAULT_MODEL
+from pipeline import CHARS_PER_TOKEN, estimate_tokens, trim_to_tokens
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    role: str
+    instructions: str
+    input_label: str
+    expected_output: str
+
+    @property
+    def prefix(self) -> str:
+        """The byte-stable part of the description, up to the user input."""
+        return f"{self.instructions}\n\n{self.input_label}: "
+
+
+TEMPLATES = {
+    "Researcher": PromptTemplate(
+        "Researcher",
+        "You are the Researcher. Conduct thorough, factual research on the topic below.\n"
+        "- Provide structured sections with bullet points.\n"
+        "- Cite key sources or references (titles/links if known).\n"
+        "- Avoid writing prose articles; focus on findings.",
+        "Topic",
+        "A structured research brief with key findings, evidence, and sources.",
+    ),
+    "Writer": PromptTemplate(
+        "Writer",
+        "You are the Writer. Create an engaging, well-structured article based on the topic below.\n"
+        "- Include a clear intro, body with subheadings, and a conclusion.\n"
+        "- Maintain a cohesive narrative; do not list bullets only.",
+        "Topic",
+        "A polished article (500-800 words) with headings and clear flow.",
+    ),
+    "Summarizer": PromptTemplate(
+        "Summarizer",
+        "You are the Summarizer. Produce a concise summary of the topic below.\n"
+        "- Capture only the most important points.\n"
+        "- Use short bullet points and keep it under 150 words.",
+        "Topic",
+        "A bullet-point summary under 150 words highlighting key takeaways.",
+    ),
+    "Reviewer": PromptTemplate(
+        "Reviewer",
+        "You are the Reviewer. Critically review the content/topic below.\n"
+        "- Identify strengths, weaknesses, and potential improvements.\n"
+        "- Provide 3-5 actionable suggestions.",
+        "Subject",
+        "A concise review with strengths, weaknesses, and 3-5 concrete improvements.",
+    ),
+    "Emailer": PromptTemplate(
+        "Emailer",
+        "You are the Emailer. Draft a concise, professional email based on the user's request and any prior content.\n"
+        "- Include a clear subject line.\n"
+        "- Keep the body brief with key points.\n"
+        "- Close with an appropriate sign-off.",
+        "Prompt",
+        "A subject line and short email body ready to be sent.",
+    ),
+    "Orchestrator": PromptTemplate(
+        "Orchestrator",
+        "You are the Orchestrator. Decide which single role should handle the user's request.\n"
+        "Valid roles: Researcher, Writer, Summarizer, Reviewer, Emailer.\n"
+        "Return only the role name with no extra words.",
+        "User request",
+        "One of: Researcher | Writer | Summarizer | Reviewer | Emailer",
+    ),
+    "Orchestrator (multi)": PromptTemplate(
+        "Orchestrator",
+        "You are the Orchestrator. Choose the top roles that should work on the user's request.\n"
+        "Valid roles: Researcher, Writer, Summarizer, Reviewer, Emailer.\n"
+        "Return only the role names, comma-separated, no extra words, "
+        "at most the number of roles given after the request.",
+        "User request",
+        "Comma-separated list of roles from: Researcher, Writer, Summarizer, Reviewer, Emailer",
+    ),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(DEFAULT_MODEL.split("/")[-1])
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    encoder = _encoder()
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep the start of text within max_tokens (cut at a line break if possible)."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    chars_per_token = len(text) / max(1, tokens)
+    budget = max_tokens
+    for _ in range(4):
+        # trim_to_tokens counts CHARS_PER_TOKEN characters per token; rescale to this text
+        trimmed = trim_to_tokens(text, int(budget * chars_per_token / CHARS_PER_TOKEN))
+        if count_tokens(trimmed) <= max_tokens:
+            return trimmed
+        budget = int(budget * 0.9)
+    return trimmed
+
+
+def compact(text: str) -> str:
+    """Drop trailing spaces, runs of blanks inside lines and repeated empty lines."""
+    lines = []
+    for line in text.splitlines():
+        stripped = line.lstrip(" \t")
+        lines.append(line[: len(line) - len(stripped)] + re.sub(r"[ \t]{2,}", " ", stripped.rstrip()))
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def context_section(context: dict[str, str] | None) -> str:
+    # Upstream output handed over by pipeline.py, so the role builds on it
+    if not context:
+        return ""
+    parts = ["\n\nBuild on the output of the earlier steps below instead of starting from scratch."]
+    for role, text in context.items():
+        parts.append(f"\n\n--- {role} output ---\n{text}")
+    return "".join(parts)
+
+
+def variable_text(name: str, description: str) -> str:
+    """The part of a rendered description after the template's stable prefix."""
+    template = TEMPLATES.get(name)
+    if template is not None and description.startswith(template.prefix):
+        return description[len(template.prefix):]
+    return description
+
+
+@dataclass
+class RenderedPrompt:
+    description: str
+    expected_output: str
+    prefix_tokens: int
+    input_tokens: int
+    compacted: bool = False
+    truncated: bool = False
+
+
+def render(
+    name: str,
+    user_input: str,
+    context: dict[str, str] | None = None,
+    suffix: str = "",
+    max_tokens: int | None = None,
+) -> RenderedPrompt:
+    """Render a template with the variable parts last, within max_tokens.
+
+    suffix is appended after the user input (e.g. the number of roles for
+    the Orchestrator). Over budget, input and context are compacted first;
+    then context is trimmed (an equal share per upstream role, unused
+    shares going to longer outputs), then the user input.
+    """
+    template = TEMPLATES[name]
+    max_tokens = PROMPT_MAX_INPUT_TOKENS if max_tokens is None else max_tokens
+    prefix_tokens = _prefix_tokens(name)
+    budget = max(0, max_tokens - prefix_tokens - count_tokens(suffix))
+    context = dict(context or {})
+    compacted = truncated = False
+
+    def variable() -> str:
+        return user_input + context_section(context)
+
+    if count_tokens(variable()) > budget:
+        compacted = True
+        user_input = compact(user_input)
+        context = {role: compact(text) for role, text in context.items()}
+    if context and count_tokens(variable()) > budget:
+        truncated = True
+        overhead = count_tokens(context_section({role: "" for role in context}))
+        left = max(0, budget - count_tokens(user_input) - overhead)
+        sizes = {role: count_tokens(text) for role, text in context.items()}
+        # Equal shares, with what short outputs do not use going to the longer ones
+        limits = {}
+        for i, role in enumerate(sorted(sizes, key=sizes.get)):
+            limits[role] = min(sizes[role], left // (len(sizes) - i))
+            left -= limits[role]
+        context = {role: truncate_tokens(text, limits[role]) for role, text in context.items()}
+    if count_tokens(variable()) > budget:
+        truncated = True
+        user_input = truncate_tokens(user_input, max(0, budget - count_tokens(context_section(context))))
+
+    text = variable() + suffix
+    return RenderedPrompt(
+        description=template.prefix + text,
+        expected_output=template.expected_output,
+        prefix_tokens=prefix_tokens,
+        input_tokens=count_tokens(text),
+        compacted=compacted,
+        truncated=truncated,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _prefix_tokens(name: str) -> int:
+    return count_tokens(TEMPLATES[name].prefix)
+
+
+def _agent_tokens(role: str) -> int:
+    # crewai puts the agent's role, goal and backstory in the system message, ahead of the task
+    spec = AGENT_SPECS.get(role, {})
+    return count_tokens(" ".join(str(spec.get(k, "")) for k in ("role", "goal", "backstory")))
+
+
+def prefix_report(sample_input: str = "Solid-state batteries for electric vehicles") -> list[dict]:
+    """Per template: reusable prefix tokens (agent system text + description prefix) vs variable tokens."""
+    rows = []
+    for name, template in TEMPLATES.items():
+        rendered = render(name, sample_input)
+        stable = _agent_tokens(template.role) + rendered.prefix_tokens
+        rows.append({
+            "template": name,
+            "prefix_tokens": rendered.prefix_tokens,
+            "stable_tokens": stable,
+            "input_tokens": rendered.input_tokens,
+            "reusable_pct": round(100 * stable / max(1, stable + rendered.input_tokens), 1),
+            "cacheable": stable >= PROMPT_CACHE_MIN_TOKENS,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    sample = " ".join(sys.argv[1:]) or "Solid-state batteries for electric vehicles"
+    counter = "tiktoken" if _encoder() is not None else f"~{CHARS_PER_TOKEN} chars/token"
+    print(f"Token counts: {counter}; provider cache minimum: {PROMPT_CACHE_MIN_TOKENS} tokens\n")
+    print(f"{'template':<22} {'prefix':>7} {'stable':>7} {'input':>6} {'reuse %':>8} cacheable")
+    for row in prefix_report(sample):
+        print(
+            f"{row['template']:<22} {row['prefix_tokens']:>7} "
+            f"{row['stable_tokens']:>7} {row['input_tokens']:>6} {row['reusable_pct']:>8} "
+            f"{'yes' if row['cacheable'] else 'no'}"
+        )
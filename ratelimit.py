@@ -0,0 +1,312 @@
+"""Process-wide client-side limiter for LLM calls.
+
+Every crew kickoff (role runs and Orchestrator decisions) goes through
+get_rate_limiter().call(), which
+
+- waits for a slot under an adaptive concurrency limit (AIMD): +1/limit
+  after each call that is not slow, x0.5 on a rate-limit error, x0.9 when
+  a call takes more than LATENCY_TOLERANCE times the fastest recent call
+  for the same key (a sign the backend is queueing);
+- takes one request and the estimated tokens from token buckets refilled
+  at LLM_RPM_LIMIT / LLM_TPM_LIMIT per minute (the token bucket is later
+  corrected with the actual usage);
+- retries rate-limit errors (HTTP 429) up to LLM_MAX_RETRIES times with
+  full-jitter exponential backoff, honouring "try again in Ns" hints, and
+  empties the request bucket so the other threads back off too instead
+  of adding to a 429 storm.
+
+State is exported as gauges in metrics.prometheus_text() and by stats().
+"""
+import math
+import random
+import re
+import threading
+import time
+
+import metrics
+from config import (
+    LLM_RATE_LIMIT_DISABLED,
+    LLM_RPM_LIMIT,
+    LLM_TPM_LIMIT,
+    LLM_MIN_CONCURRENCY,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+)
+
+# A call slower than this multiple of the fastest recent call for its key counts as congestion
+LATENCY_TOLERANCE = 2.0
+# The fastest-call baseline drifts up by this factor per call, so it follows slower periods
+BASELINE_DRIFT = 1.02
+# Decreases closer together than this are treated as one congestion event
+DECREASE_COOLDOWN_SECONDS = 2.0
+# Completion tokens assumed for a call before its real usage is known
+EXPECTED_COMPLETION_TOKENS = 800
+
+# A 429 status in error text ("Error code: 429", "HTTP 429", "429 Too Many Requests"),
+# not any message that happens to contain the digits
+_STATUS_429_RE = re.compile(
+    r"\b(?:status(?:[ _]code)?|http(?:/[\d.]+)?|error code)\W{0,3}429\b|\btoo many requests\b",
+    re.IGNORECASE,
+)
+_RETRY_HINT_RE = re.compile(r"(?:try again|retry after)\s+in\s+(\d+(?:\.\d+)?)\s*(ms|s)\b", re.IGNORECASE)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for HTTP 429 / RateLimitError, also when wrapped by crewai or litellm."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if type(exc).__name__ == "RateLimitError" or getattr(exc, "status_code", None) == 429:
+            return True
+        message = str(exc).lower()
+        if "rate limit" in message or "ratelimit" in message or _STATUS_429_RE.search(message):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def describe_error(exc: BaseException) -> str:
+    """Error text for a failed role; rate limits get a clearer message than the raw exception."""
+    if is_rate_limit_error(exc):
+        return f"the LLM provider's rate limit was reached and retries did not help; try again shortly ({exc})"
+    return str(exc)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Wait suggested by the provider ("Please try again in 1.5s"), if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        if value is not None:
+            return float(value)
+    except (TypeError, ValueError):
+        pass
+    match = _RETRY_HINT_RE.search(str(exc))
+    if match:
+        value = float(match.group(1))
+        return value / 1000 if match.group(2).lower() == "ms" else value
+    return None
+
+
+class TokenBucket:
+    """capacity units, refilled continuously at rate units per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, amount: float) -> float:
+        """Take amount (capped at capacity), sleeping until available; returns seconds waited."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                delay = (amount - self.level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def charge(self, amount: float) -> None:
+        """Adjust by amount without waiting; the level may go negative (later takes wait longer)."""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+    def drain(self) -> None:
+        with self._lock:
+            self._refill()
+            self.level = min(self.level, 0.0)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.level
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rpm: float = 500,
+        tpm: float = 200_000,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        max_retries: int = 4,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 60.0,
+        sleep=time.sleep,
+    ):
+        # Burst of up to 10 seconds' worth of requests / tokens
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 6))
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 6))
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base_seconds = float(retry_base_seconds)
+        self.retry_max_seconds = float(retry_max_seconds)
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._baselines: dict[str, float] = {}
+        self._last_decrease = 0.0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_s = 0.0
+
+    def _acquire_slot(self) -> float:
+        started = time.monotonic()
+        with self._cond:
+            while self._in_flight >= math.floor(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+        return time.monotonic() - started
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+                return
+            self._last_decrease = now
+            self.limit = max(float(self.min_concurrency), self.limit * factor)
+
+    def _observe(self, key: str, latency: float) -> None:
+        with self._cond:
+            baseline = min(self._baselines.get(key, latency) * BASELINE_DRIFT, latency)
+            self._baselines[key] = baseline
+            slow = latency > baseline * LATENCY_TOLERANCE
+            # Only grow while the limit is actually used (this call still holds its slot)
+            if not slow and self._in_flight >= self.limit - 1:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                self._cond.notify_all()
+        if slow:
+            self._decrease(0.9)
+
+    def call(self, fn, estimated_tokens: int = 0, key: str = ""):
+        """Run fn() under the limits, retrying rate-limit errors; other errors are raised as is."""
+        attempt = 0
+        while True:
+            waited = self._acquire_slot()
+            try:
+                waited += self.requests.take(1)
+                waited += self.tokens.take(estimated_tokens)
+                started = time.monotonic()
+                with self._cond:
+                    self.calls += 1
+                    self.throttled_s += waited
+                try:
+                    result = fn()
+                except Exception as exc:
+                    if not is_rate_limit_error(exc):
+                        raise
+                    with self._cond:
+                        self.rate_limited += 1
+                    self._decrease(0.5)
+                    # Everyone waits for the bucket to refill, not only this thread
+                    self.requests.drain()
+                    if attempt >= self.max_retries:
+                        raise
+                    error = exc
+                else:
+                    self._observe(key, time.monotonic() - started)
+                    return result
+            finally:
+                self._release_slot()
+            attempt += 1
+            with self._cond:
+                self.retries += 1
+            backoff = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+            self._sleep(max(backoff, retry_after_seconds(error) or 0.0))
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once a call's real usage is known."""
+        if actual_tokens:
+            self.tokens.charge(actual_tokens - estimated_tokens)
+
+    def stats(self) -> dict:
+        with self._cond:
+            state = {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "throttled_s": round(self.throttled_s, 3),
+            }
+        state["requests_available"] = round(self.requests.available(), 1)
+        state["tokens_available"] = round(self.tokens.available())
+        return state
+
+    def gauges(self) -> dict:
+        stats = self.stats()
+        return {
+            "llm_concurrency_limit": ("Adaptive limit on concurrent LLM calls", stats["concurrency_limit"]),
+            "llm_in_flight": ("LLM calls running now", stats["in_flight"]),
+            "llm_calls_total": ("LLM calls started through the limiter", stats["calls"]),
+            "llm_retries_total": ("LLM calls retried after a rate-limit error", stats["retries"]),
+            "llm_rate_limited_total": ("Rate-limit errors returned by the LLM backend", stats["rate_limited"]),
+            "llm_throttled_seconds_total": ("Time spent waiting for the limiter", stats["throttled_s"]),
+            "llm_request_bucket_available": ("Requests available in the RPM bucket", stats["requests_available"]),
+            "llm_token_bucket_available": ("Tokens available in the TPM bucket", stats["tokens_available"]),
+        }
+
+
+_default_limiter: RateLimiter | None = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """Process-wide limiter configured in .env, or None when LLM_RATE_LIMIT_DISABLED is set."""
+    global _default_limiter
+    if LLM_RATE_LIMIT_DISABLED:
+        return None
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter(
+                LLM_RPM_LIMIT,
+                LLM_TPM_LIMIT,
+                LLM_MIN_CONCURRENCY,
+                LLM_MAX_CONCURRENCY,
+                LLM_MAX_RETRIES,
+                LLM_RETRY_BASE_SECONDS,
+                LLM_RETRY_MAX_SECONDS,
+            )
+            metrics.add_gauges(_default_limiter.gauges)
+        return _default_limiter
+
+
+def limited_call(fn, estimated_tokens: int = 0, key: str = ""):
+    """fn() through the process-wide limiter (or directly when it is disabled)."""
+    limiter = get_rate_limiter()
+    return fn() if limiter is None else limiter.call(fn, estimated_tokens, key)
+
+
+def estimate_call_tokens(prompt: str) -> int:
+    # Imported here: prompts -> pipeline -> ratelimit
+    from prompts import count_tokens
+
+    return count_tokens(prompt) + EXPECTED_COMPLETION_TOKENS
+
+
+def settle_usage(estimated_tokens: int, actual_tokens: int) -> None:
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        limiter.settle(estimated_tokens, actual_tokens)
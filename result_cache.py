@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_ROWS,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_DISABLED,
+)
+
+
+def make_cache_key(role: str, description: str, expected_output: str, model_settings: dict | None = None) -> str:
+    """Build a stable key from everything that determines a role's LLM output."""
+    payload = json.dumps(
+        {
+            "role": role,
+            "description": description,
+            "expected_output": expected_output,
+            "model": model_settings or {},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """In-memory LRU of role outputs backed by a SQLite file.
+
+    Entries older than ttl_seconds are treated as misses and removed; the
+    file keeps at most max_rows entries, oldest deleted first.
+    path=None keeps the cache in memory only.
+    """
+
+    def __init__(self, path: str | None, max_entries: int = 256, ttl_seconds: float = 86400, max_rows: int = 10000):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.max_rows = max(self.max_entries, int(max_rows))
+        self.ttl_seconds = float(ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+            self._prune()
+            self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str, count: bool = True) -> str | None:
+        """Return the cached value for key, or None on a miss.
+
+        count=False leaves hits and misses alone, for a second look at a key
+        whose miss was already counted.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+            if entry is not None and self._expired(entry[1]):
+                self._forget(key)
+                entry = None
+            if entry is None:
+                self.misses += count
+                return None
+            self._memory.move_to_end(key)
+            self.hits += count
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        entry = (str(value), time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                    (key, entry[0], entry[1]),
+                )
+                self._prune()
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+    def _remember(self, key: str, entry: tuple[str, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self) -> None:
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def _forget(self, key: str) -> None:
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+
+
+_default_cache: ResultCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """Return the process-wide cache configured in .env, or None if disabled."""
+    global _default_cache
+    if RESULT_CACHE_DISABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(
+                RESULT_CACHE_PATH or None, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ROWS
+            )
+        return _default_cache
@@ -0,0 +1,143 @@
+"""Local keyword router used before falling back to the Orchestrator LLM.
+
+Prompts are split into whole words, so "mail" no longer matches inside
+"gmail". Each word is compared against per-role keywords allowing common
+inflections ("reviewing", "emails") and one-edit typos for longer keywords
+("reaearch", "summerize"). The result carries a confidence score so callers
+can decide whether the Orchestrator is still needed.
+"""
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+ROLE_ORDER = ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer"]
+
+# Keywords per role; multi-word phrases are matched as consecutive words
+ROLE_KEYWORDS = {
+    "Researcher": ["research", "researcher", "investigate", "explore", "look into", "find out"],
+    "Writer": ["write", "writer", "written", "article", "blog", "draft", "compose", "essay"],
+    "Summarizer": ["summarize", "summarise", "summary", "summaries", "summarizer", "summerize", "tldr", "recap"],
+    "Reviewer": ["review", "reviewer", "critique", "evaluate", "proofread", "feedback"],
+    "Emailer": ["email", "e-mail", "mail", "emailer", "send to", "mail to"],
+}
+
+_SUFFIXES = ("s", "es", "d", "ed", "ing", "er", "ers", "r")
+
+# Evidence weights: exact keyword, inflected form, one-edit typo
+EXACT_WEIGHT = 1.0
+INFLECTED_WEIGHT = 0.9
+FUZZY_WEIGHT = 0.6
+# A role is selected once its score reaches this value
+ROLE_MIN_SCORE = 0.5
+# Keywords shorter than this are never matched fuzzily ("write" vs "white")
+FUZZY_MIN_LENGTH = 6
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+\-]+@[a-zA-Z0-9\-]+\.[a-zA-Z0-9\-.]+")
+
+
+@dataclass
+class RouteDecision:
+    roles: list[str]
+    confidence: float
+    scores: dict[str, float] = field(default_factory=dict)
+    evidence: dict[str, list[str]] = field(default_factory=dict)
+
+
+def _single_edit_apart(a: str, b: str) -> bool:
+    """True when a and b differ by one insertion, deletion, substitution or swap."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(shorter) and shorter[i] == longer[i]:
+        i += 1
+    return shorter[i:] == longer[i + 1:]
+
+
+def _inflected(word: str, keyword: str) -> bool:
+    for stem in {keyword, keyword[:-1] if keyword.endswith("e") else keyword}:
+        if word.startswith(stem) and word[len(stem):] in _SUFFIXES:
+            return True
+    return False
+
+
+_SINGLE_KEYWORDS = [(role, kw) for role, kws in ROLE_KEYWORDS.items() for kw in kws if " " not in kw]
+_PHRASE_KEYWORDS = [(role, kw) for role, kws in ROLE_KEYWORDS.items() for kw in kws if " " in kw]
+
+
+@lru_cache(maxsize=4096)
+def _match_word(word: str) -> tuple[tuple[str, float], ...]:
+    """Return (role, weight) pairs for a single lower-cased word."""
+    best: dict[str, float] = {}
+    for role, kw in _SINGLE_KEYWORDS:
+        if word == kw:
+            weight = EXACT_WEIGHT
+        elif _inflected(word, kw):
+            weight = INFLECTED_WEIGHT
+        elif len(kw) >= FUZZY_MIN_LENGTH and _single_edit_apart(word, kw):
+            weight = FUZZY_WEIGHT
+        else:
+            continue
+        if weight > best.get(role, 0.0):
+            best[role] = weight
+    return tuple(best.items())
+
+
+def is_role_keyword(word: str) -> bool:
+    """True for a lower-cased word that counts towards some role ("emailing", "reaearch")."""
+    return bool(_match_word(word))
+
+
+def route(text: str, max_roles: int = 5) -> RouteDecision:
+    """Pick roles for a prompt from whole-word keyword matches.
+
+    confidence is the lowest score among the selected roles (capped at 1.0),
+    or 0.0 when nothing matched, so a single fuzzy match keeps it low.
+    """
+    original = text or ""
+    scores = {role: 0.0 for role in ROLE_ORDER}
+    evidence: dict[str, list[str]] = {}
+
+    words = _WORD_RE.findall(_EMAIL_RE.sub(" ", original.lower()))
+    for word in words:
+        for role, weight in _match_word(word):
+            scores[role] += weight
+            evidence.setdefault(role, []).append(word)
+    joined = " " + " ".join(words) + " "
+    for role, phrase in _PHRASE_KEYWORDS:
+        if f" {phrase} " in joined:
+            scores[role] += EXACT_WEIGHT
+            evidence.setdefault(role, []).append(phrase)
+    for address in _EMAIL_RE.findall(original):
+        scores["Emailer"] += EXACT_WEIGHT
+        evidence.setdefault("Emailer", []).append(address)
+
+    ranked = sorted(
+        (role for role in ROLE_ORDER if scores[role] >= ROLE_MIN_SCORE),
+        key=lambda role: -scores[role],
+    )[: max(1, int(max_roles))]
+    roles = [role for role in ROLE_ORDER if role in ranked]
+    confidence = min(min(scores[role], 1.0) for role in roles) if roles else 0.0
+    return RouteDecision(
+        roles=roles,
+        confidence=round(confidence, 3),
+        scores={role: round(score, 3) for role, score in scores.items() if score},
+        evidence=evidence,
+    )
+
+
+def route_batch(texts: list[str], max_roles: int = 5) -> list[RouteDecision]:
+    """Route many prompts at once; repeated prompts are only scored once."""
+    seen: dict[str, RouteDecision] = {}
+    decisions = []
+    for text in texts:
+        if text not in seen:
+            seen[text] = route(text, max_roles)
+        decisions.append(seen[text])
+    return decisions
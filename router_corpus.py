@@ -0,0 +1,123 @@
+"""Labelled prompts for checking the local router against the Orchestrator.
+
+Each entry pairs a prompt with the roles the Orchestrator LLM is expected to
+pick. Run offline to see how often the router answers on its own and how
+often it agrees with the labels:
+
+    python router_corpus.py
+
+Add --llm to also ask the live Orchestrator (needs OPENAI_API_KEY) and
+report router/LLM agreement on the prompts the router would have answered.
+"""
+import sys
+
+from router import route_batch
+
+LABELLED_PROMPTS: list[tuple[str, list[str]]] = [
+    ("Research the latest advances in solid-state batteries", ["Researcher"]),
+    ("Investigate how remote work affects team productivity", ["Researcher"]),
+    ("reaearch the history of the printing press", ["Researcher"]),
+    ("Can you look into supply chain risks for semiconductor makers?", ["Researcher"]),
+    ("Find out which cloud providers offer GPU spot instances", ["Researcher"]),
+    ("Explore the pros and cons of nuclear energy", ["Researcher"]),
+    ("Write an article about renewable energy policy", ["Writer"]),
+    ("Draft a blog post introducing our new product", ["Writer"]),
+    ("Compose a short essay on the ethics of AI", ["Writer"]),
+    ("Write a LinkedIn post about our hiring drive", ["Writer"]),
+    ("Summarize the key points of the Paris climate agreement", ["Summarizer"]),
+    ("Give me a summary of the French revolution", ["Summarizer"]),
+    ("summerize the main causes of inflation", ["Summarizer"]),
+    ("tldr of the GDPR for small businesses", ["Summarizer"]),
+    ("Quick recap of this week's AI news", ["Summarizer"]),
+    ("Review this paragraph for clarity: our product is the best in the market", ["Reviewer"]),
+    ("Critique my startup pitch about food delivery drones", ["Reviewer"]),
+    ("Evaluate the arguments for a four-day work week", ["Reviewer"]),
+    ("Proofread this sentence: their going to the store tomorrow", ["Reviewer"]),
+    ("Email the team that the meeting is moved to Friday", ["Emailer"]),
+    ("Send an e-mail to alex@example.com about the quarterly report", ["Emailer"]),
+    ("Research electric vehicle adoption and email results to sam@example.com", ["Researcher", "Emailer"]),
+    ("Research and summarize topic X and email results to name@example.com", ["Researcher", "Summarizer", "Emailer"]),
+    ("Write an article on quantum computing and have it reviewed", ["Writer", "Reviewer"]),
+    ("Research microplastics, then write a blog post about it", ["Researcher", "Writer"]),
+    ("Summarize the report and mail it to ops@example.org", ["Summarizer", "Emailer"]),
+    ("Investigate vaccine rollout strategies and summarise the findings", ["Researcher", "Summarizer"]),
+    ("Draft an essay on climate migration and review it for accuracy", ["Writer", "Reviewer"]),
+    ("Research, write, summarize and review a piece on urban farming", ["Researcher", "Writer", "Summarizer", "Reviewer"]),
+    ("Check my gmail settings guide for mistakes", ["Reviewer"]),
+    ("What are the main differences between TCP and UDP?", ["Researcher"]),
+    ("Tell me about the Roman empire", ["Researcher"]),
+    ("I need something catchy for our newsletter intro", ["Writer"]),
+    ("Make this long text shorter please", ["Summarizer"]),
+    ("Is this argument logically sound?", ["Reviewer"]),
+    ("Let my manager know the deploy finished", ["Emailer"]),
+]
+
+
+def evaluate_router(threshold: float | None = None) -> dict:
+    """Score router decisions against the labels without any network calls.
+
+    coverage: share of prompts the router answers without the Orchestrator.
+    precision: share of those answered prompts whose roles match the label.
+    """
+    if threshold is None:
+        from config import ROUTER_CONFIDENCE_THRESHOLD as threshold
+    decisions = route_batch([prompt for prompt, _ in LABELLED_PROMPTS])
+    answered = agreed = 0
+    misses = []
+    for (prompt, expected), decision in zip(LABELLED_PROMPTS, decisions):
+        if not decision.roles or decision.confidence < threshold:
+            continue
+        answered += 1
+        if decision.roles == expected:
+            agreed += 1
+        else:
+            misses.append((prompt, expected, decision.roles))
+    total = len(LABELLED_PROMPTS)
+    return {
+        "prompts": total,
+        "answered_locally": answered,
+        "coverage": round(answered / total, 3) if total else 0.0,
+        "precision": round(agreed / answered, 3) if answered else 0.0,
+        "misses": misses,
+    }
+
+
+def evaluate_against_llm(threshold: float | None = None) -> dict:
+    """Ask the live Orchestrator for every prompt and compare with the router."""
+    from task import decide_roles_with_orchestrator
+
+    if threshold is None:
+        from config import ROUTER_CONFIDENCE_THRESHOLD as threshold
+    decisions = route_batch([prompt for prompt, _ in LABELLED_PROMPTS])
+    answered = agreed = 0
+    disagreements = []
+    for (prompt, _), decision in zip(LABELLED_PROMPTS, decisions):
+        if not decision.roles or decision.confidence < threshold:
+            continue
+        answered += 1
+        llm_roles = decide_roles_with_orchestrator(prompt, 5, use_router=False)
+        if sorted(llm_roles) == sorted(decision.roles):
+            agreed += 1
+        else:
+            disagreements.append((prompt, llm_roles, decision.roles))
+    return {
+        "answered_locally": answered,
+        "agreement": round(agreed / answered, 3) if answered else 0.0,
+        "disagreements": disagreements,
+    }
+
+
+if __name__ == "__main__":
+    report = evaluate_router()
+    print(
+        f"Router answered {report['answered_locally']}/{report['prompts']} prompts locally "
+        f"(coverage {report['coverage']:.0%}), label agreement {report['precision']:.0%}"
+    )
+    for prompt, expected, got in report["misses"]:
+        print(f"  mismatch: {prompt!r} expected={expected} router={got}")
+
+    if "--llm" in sys.argv[1:]:
+        llm_report = evaluate_against_llm()
+        print(f"Router/Orchestrator agreement: {llm_report['agreement']:.0%}")
+        for prompt, llm_roles, router_roles in llm_report["disagreements"]:
+            print(f"  disagreement: {prompt!r} llm={llm_roles} router={router_roles}")
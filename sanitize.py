@@ -0,0 +1,173 @@
+"""Remove email boilerplate, placeholders and credentials from agent output.
+
+Rules are compiled once per Sanitizer:
+  - rules starting with "^" are merged into one alternation (a named group
+    per rule) that is matched, case-insensitively, at the start of each
+    line, so a line costs a single regex call;
+  - other rules (the "KEY = value" secret patterns) are searched anywhere
+    in the lowercased text. Each has a literal prefix, so the regex engine
+    scans for it like str.find; only lines a hit starts on or spans are
+    then checked on their own.
+The matching group tells which rule fired; hits are counted per rule in
+Sanitizer.hits. A "block" rule drops its line and every following line up
+to the next blank one.
+
+    sanitizer = get_sanitizer()
+    clean = sanitizer.sanitize(text)          # whole text
+    for line in sanitizer.filter_lines(it):   # streaming, line by line
+        ...
+"""
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from config import SANITIZE_SECRET_KEYS
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A named, case-insensitive line pattern (see module docstring).
+
+    Patterns not starting with "^" are searched in the lowercased line and
+    must be written in lower case. action is "drop" (remove the line) or
+    "block" (remove the line and the lines after it up to the next blank
+    line).
+    """
+    name: str
+    pattern: str
+    action: str = "drop"
+
+
+BOILERPLATE_RULES = [
+    Rule("send_instructions", r"^to\s+send\s+this\s+.*email.*$", "block"),
+    Rule("closing_note", r"^\s*this concludes the structured research brief\.\s*$"),
+    Rule("subject_header", r"^subject\s*:.*$"),
+    Rule("to_header", r"^to\s*:.*$"),
+    Rule("body_header", r"^body\s*:.*$"),
+    Rule("greeting", r"^dear\s+.+,$"),
+    Rule("sign_off", r"^best\s+regards,?\s*$"),
+    Rule("email_content_header", r"^email content\s*:.*$"),
+    Rule("contact_header", r"^contact\s*$"),
+    # Placeholder-only lines like [Your Name]
+    Rule("placeholder", r"^\s*\[[^\]]+\]\s*$"),
+]
+
+
+def secret_rules(keys: Iterable[str]) -> list[Rule]:
+    """One rule per settings key; "*" matches any run of letters/underscores.
+
+    "smtp_*" drops lines such as "SMTP_PASSWORD = hunter2".
+    """
+    rules = []
+    for key in keys:
+        key = key.strip()
+        if not key:
+            continue
+        pattern = "[a-z_]+".join(re.escape(part) for part in key.lower().split("*"))
+        rules.append(Rule(f"secret:{key}", pattern + r"[ \t]*=.*"))
+    return rules
+
+
+def default_rules(secret_keys: Iterable[str] | None = None) -> list[Rule]:
+    if secret_keys is None:
+        secret_keys = SANITIZE_SECRET_KEYS.split(",")
+    return BOILERPLATE_RULES + secret_rules(secret_keys)
+
+
+class Sanitizer:
+    """Line filter built from a list of Rules (see module docstring)."""
+
+    def __init__(self, rules: list[Rule] | None = None):
+        self.rules = list(default_rules() if rules is None else rules)
+        anchored = [rule for rule in self.rules if rule.pattern.startswith("^")]
+        anywhere = [rule for rule in self.rules if not rule.pattern.startswith("^")]
+        self._match_start = _alternation(anchored, "a", re.IGNORECASE).match
+        self._search_anywhere = _alternation(anywhere, "u", 0).search
+        self._prefilters = [re.compile(rule.pattern).finditer for rule in anywhere]
+        self._group_rule = {f"a{i}": rule for i, rule in enumerate(anchored)}
+        self._group_rule.update({f"u{i}": rule for i, rule in enumerate(anywhere)})
+        self.hits: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.hits[name] += 1
+
+    def _candidate_lines(self, text: str) -> set[int] | None:
+        """Indexes of lines where an unanchored rule may match (None = all)."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Some characters lowercase to several; offsets no longer line up
+            return None
+        # A hit that runs over a newline hides any hit starting inside it
+        # (finditer does not overlap), so every line it spans is a candidate
+        spans = sorted(match.span() for prefilter in self._prefilters for match in prefilter(lowered))
+        found, line, offset = set(), 0, 0
+        for start, end in spans:
+            line += lowered.count("\n", offset, start)
+            offset = start
+            found.update(range(line, line + lowered.count("\n", start, end) + 1))
+        return found
+
+    def filter_lines(self, lines: Iterable[str], candidates: set[int] | None = None) -> Iterator[str]:
+        """Yield the lines to keep; blank lines are dropped as well.
+
+        candidates limits the unanchored rules to those line indexes.
+        """
+        match_start = self._match_start
+        search_anywhere = self._search_anywhere if self._prefilters else None
+        group_rule = self._group_rule
+        skip_until_blank = False
+        for index, line in enumerate(lines):
+            line = line.rstrip("\r")
+            if not line or line.isspace():
+                skip_until_blank = False
+                continue
+            if skip_until_blank:
+                continue
+            match = match_start(line)
+            if match is None and search_anywhere is not None and (candidates is None or index in candidates):
+                match = search_anywhere(line.lower())
+            if match is None:
+                yield line
+                continue
+            rule = group_rule[match.lastgroup]
+            self._count(rule.name)
+            if rule.action == "block":
+                skip_until_blank = True
+
+    def sanitize(self, text) -> str:
+        """Return text without matching lines and without blank lines."""
+        text = str(text or "")
+        lines = self.filter_lines(text.split("\n"), self._candidate_lines(text))
+        return "\n".join(lines).strip()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.hits)
+
+
+def _alternation(rules: list[Rule], prefix: str, flags: int):
+    if not rules:
+        # Never matches
+        return re.compile(r"(?!)")
+    return re.compile("|".join(f"(?P<{prefix}{i}>{rule.pattern})" for i, rule in enumerate(rules)), flags)
+
+
+_sanitizer: Sanitizer | None = None
+_sanitizer_lock = threading.Lock()
+
+
+def get_sanitizer() -> Sanitizer:
+    """Process-wide Sanitizer built from the default rules."""
+    global _sanitizer
+    with _sanitizer_lock:
+        if _sanitizer is None:
+            _sanitizer = Sanitizer()
+        return _sanitizer
+
+
+def sanitize(text) -> str:
+    return get_sanitizer().sanitize(text)
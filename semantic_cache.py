@@ -0,0 +1,261 @@
+"""Near-duplicate prompt cache: reuse a role's output for a paraphrased prompt.
+
+"research X and email me" and "please research X, mail the results" are
+different strings, so result_cache.py misses. Here each prompt becomes a
+local hashed feature vector: topic words (role keywords, e-mail addresses
+and filler words are dropped, so the request framing does not count;
+format nouns such as "essay" or "blog" and all-caps acronyms such as "US"
+or "IT" always count), word bigrams and
+character trigrams, with sublinear term weights. Lookups go
+through a SimHash LSH index, and candidates are compared by cosine
+similarity against a per-role threshold. Prompts whose numbers differ
+("in 100 words" vs "in 500 words") never match.
+
+Emailer output is never stored or reused: a draft is written for its
+recipients, whose addresses are not part of the vector.
+
+Entries are scoped by role, expected output and model settings, kept in
+memory only, limited to SEMANTIC_CACHE_MAX_ENTRIES (least recently used
+evicted first) and expire after RESULT_CACHE_TTL_SECONDS. A hit carries
+the prompt it matched, for auditing. Pure Python, no network or GPU.
+"""
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from config import (
+    RESULT_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_DISABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_ROLE_THRESHOLDS,
+    parse_role_values,
+)
+from router import is_role_keyword
+
+SIGNATURE_BITS = 64
+# 16 bands of 4 bits: pairs above ~0.8 cosine share a band with near certainty
+BANDS = 16
+BAND_BITS = SIGNATURE_BITS // BANDS
+# Feature weights: topic words, word bigrams, character trigrams (spelling variants)
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.7
+TRIGRAM_WEIGHT = 0.25
+
+# Filler dropped from the vector; "us" and "it" are not here, as they may be the topic ("the US", "IT")
+STOPWORDS = frozenset(
+    "a an and are as at be about by can could do for from give i in into is its make me my of on or our "
+    "please results result some that the their them this to up we with would you your".split()
+)
+# Role keywords that name the output format rather than pick the role;
+# "an essay on X" and "a blog post on X" must not share a result
+FORMAT_WORDS = frozenset({"article", "blog", "draft", "essay"})
+# Roles whose output depends on more than the vectorized topic
+UNCACHED_ROLES = frozenset({"Emailer"})
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+\-]+@[a-zA-Z0-9\-]+\.[a-zA-Z0-9\-.]+")
+
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(_NUMBER_RE.findall(_EMAIL_RE.sub(" ", text)))
+
+
+def _hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def vectorize(text: str) -> dict[int, float]:
+    """L2-normalised hashed features of the topic words in text."""
+    words = []
+    for word in _WORD_RE.findall(_EMAIL_RE.sub(" ", text)):
+        lowered = word.lower()
+        if lowered.endswith("s") and lowered[:-1] in FORMAT_WORDS:
+            lowered = lowered[:-1]
+        if (
+            (len(word) > 1 and word.isupper())
+            or lowered in FORMAT_WORDS
+            or (lowered not in STOPWORDS and not is_role_keyword(lowered))
+        ):
+            words.append(lowered)
+    counts: Counter = Counter()
+    for word in words:
+        counts[f"w {word}"] += WORD_WEIGHT
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            counts[f"c {padded[i:i + 3]}"] += TRIGRAM_WEIGHT
+    for first, second in zip(words, words[1:]):
+        counts[f"b {first} {second}"] += BIGRAM_WEIGHT
+    vector: dict[int, float] = {}
+    for feature, weight in counts.items():
+        key = _hash(feature)
+        # Sublinear weighting so a repeated word does not dominate
+        vector[key] = vector.get(key, 0.0) + (1 + math.log(weight) if weight >= 1 else weight)
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def simhash(vector: dict[int, float]) -> int:
+    totals = [0.0] * SIGNATURE_BITS
+    for key, weight in vector.items():
+        for bit in range(SIGNATURE_BITS):
+            totals[bit] += weight if key >> bit & 1 else -weight
+    return sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+
+
+def _bands(signature: int) -> list[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [signature >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+@dataclass
+class SemanticHit:
+    role: str
+    output: str
+    prompt: str
+    similarity: float
+
+
+class SemanticResult(str):
+    """A role output reused from a similar earlier prompt; str() is the plain output."""
+
+    def __new__(cls, output: str, matched_prompt: str, similarity: float):
+        result = super().__new__(cls, output)
+        result.matched_prompt = matched_prompt
+        result.similarity = similarity
+        return result
+
+
+@dataclass
+class _Entry:
+    scope: str
+    role: str
+    prompt: str
+    output: str
+    vector: dict[int, float]
+    numbers: frozenset
+    bands: list[int]
+    created: float
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        threshold: float = 0.9,
+        role_thresholds: dict[str, float] | None = None,
+        ttl_seconds: float = 86400,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.threshold = float(threshold)
+        self.role_thresholds = dict(role_thresholds or {})
+        self.ttl_seconds = float(ttl_seconds)
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def threshold_for(self, role: str) -> float:
+        return self.role_thresholds.get(role, self.threshold)
+
+    def lookup(self, scope: str, role: str, prompt: str) -> SemanticHit | None:
+        """Best stored output for a prompt at least threshold_for(role) similar, or None."""
+        if role in UNCACHED_ROLES:
+            return None
+        vector = vectorize(prompt)
+        numbers = _numbers(prompt)
+        bands = _bands(simhash(vector))
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for i, band in enumerate(bands):
+                candidates |= self._buckets.get((scope, i, band), set())
+            best, best_score = None, self.threshold_for(role)
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                score = cosine(vector, entry.vector)
+                if score >= best_score:
+                    best, best_score = entry_id, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            entry = self._entries[best]
+            return SemanticHit(entry.role, entry.output, entry.prompt, round(min(best_score, 1.0), 4))
+
+    def add(self, scope: str, role: str, prompt: str, output: str) -> None:
+        if role in UNCACHED_ROLES:
+            return
+        vector = vectorize(prompt)
+        if not vector:
+            # Nothing but framing words; would match every other such prompt
+            return
+        entry = _Entry(
+            scope, role, prompt, output, vector,
+            _numbers(prompt), _bands(simhash(vector)), time.time(),
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for i, band in enumerate(entry.bands):
+                self._buckets.setdefault((scope, i, band), set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for i, band in enumerate(entry.bands):
+            bucket = self._buckets.get((entry.scope, i, band))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[(entry.scope, i, band)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_default_cache: SemanticCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache | None:
+    """Process-wide semantic cache configured in .env, or None when disabled."""
+    global _default_cache
+    if SEMANTIC_CACHE_DISABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SemanticCache(
+                SEMANTIC_CACHE_MAX_ENTRIES,
+                SEMANTIC_CACHE_THRESHOLD,
+                parse_role_values(SEMANTIC_CACHE_ROLE_THRESHOLDS),
+                RESULT_CACHE_TTL_SECONDS,
+            )
+        return _default_cache
@@ -0,0 +1,400 @@
+"""HTTP API for the run modes, served from one long-running asyncio process.
+
+    POST /run      {"mode": "all|agent|orchestrate", "prompt": "...", "agent": "Writer",
+                    "num_roles": 5, "use_cache": true, "timeout": 120,
+                    "role_timeout": 60, "deadline": 90}
+                   -> 200 {"request_id": "...", "mode": "...", "outputs": {...}, "elapsed_s": 12.3}
+    POST /stream   same body -> text/event-stream, one event per RoleEvent
+                   (selected/chunk/done/error) and a final "end" event
+    GET  /healthz  -> 200 {"status": "ok", "running": 1, "queued": 0} (503 while warming up)
+    GET  /metrics  -> metrics.prometheus_text()
+
+Runs execute on a pool of SERVER_MAX_CONCURRENT threads; up to
+SERVER_MAX_QUEUE more requests wait for a thread and any beyond that get
+429 with Retry-After. A request that exceeds its timeout gets 504 (or an
+"error" event when streaming). Its roles keep their thread until the LLM
+calls return, so the slot is only freed then. Agents are built once at
+startup and stay warm for every request.
+
+role_timeout and deadline (seconds, 0 = no limit, defaults from .env) bound
+each role and the whole run: roles that miss them are reported as
+"Timed out: ..." in the outputs and the rest are returned as usual.
+
+    python server.py [--host 127.0.0.1] [--port 8000]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import metrics
+from agents import ROLE_NAMES, get_agent
+from config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_MAX_CONCURRENT,
+    SERVER_MAX_QUEUE,
+    SERVER_REQUEST_TIMEOUT_SECONDS,
+)
+from main import (
+    run_all_agents,
+    run_specific_agent,
+    run_with_orchestrator_multi,
+    stream_all_agents,
+    stream_specific_agent,
+    stream_with_orchestrator_multi,
+)
+from streaming import RoleEvent
+
+MODES = ("all", "agent", "orchestrate")
+MAX_BODY_BYTES = 1 << 20
+# Idle keep-alive connections are closed after this long
+KEEP_ALIVE_SECONDS = 30
+# SSE comment sent when a stream has been quiet this long, so proxies keep it open
+SSE_HEARTBEAT_SECONDS = 15
+RETRY_AFTER_SECONDS = 5
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def parse_run_request(body: bytes) -> dict:
+    """Validate a /run or /stream body; raises HTTPError(400) on bad input."""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(400, "Body must be JSON") from None
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Body must be a JSON object")
+    prompt = data.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise HTTPError(400, '"prompt" is required')
+    mode = data.get("mode", "orchestrate")
+    if mode not in MODES:
+        raise HTTPError(400, f'"mode" must be one of: {", ".join(MODES)}')
+    agent = None
+    if mode == "agent":
+        agent = str(data.get("agent", "")).capitalize()
+        if agent not in ROLE_NAMES:
+            raise HTTPError(400, f"Unknown agent '{data.get('agent')}'. Choose one of: {', '.join(ROLE_NAMES)}.")
+    try:
+        num_roles = int(data.get("num_roles", 5))
+        timeout = float(data.get("timeout", SERVER_REQUEST_TIMEOUT_SECONDS))
+        role_timeout, deadline = (
+            None if data.get(key) is None else max(0.0, float(data[key])) for key in ("role_timeout", "deadline")
+        )
+    except (TypeError, ValueError):
+        raise HTTPError(400, '"num_roles", "timeout", "role_timeout" and "deadline" must be numbers') from None
+    return {
+        "mode": mode,
+        "prompt": prompt,
+        "agent": agent,
+        "num_roles": max(1, num_roles),
+        "use_cache": bool(data.get("use_cache", True)),
+        # Clients may ask for less time than the server allows, not more
+        "timeout": min(max(timeout, 1.0), SERVER_REQUEST_TIMEOUT_SECONDS),
+        "role_timeout": role_timeout,
+        "deadline": deadline,
+    }
+
+
+def run_mode(req: dict) -> dict:
+    limits = {"role_timeout": req.get("role_timeout"), "deadline": req.get("deadline")}
+    if req["mode"] == "all":
+        return run_all_agents(req["prompt"], use_cache=req["use_cache"], **limits)
+    if req["mode"] == "agent":
+        return run_specific_agent(req["prompt"], req["agent"], req["use_cache"], **limits)
+    return run_with_orchestrator_multi(req["prompt"], req["num_roles"], use_cache=req["use_cache"], **limits)
+
+
+def stream_mode(req: dict):
+    limits = {"role_timeout": req.get("role_timeout"), "deadline": req.get("deadline")}
+    if req["mode"] == "all":
+        return stream_all_agents(req["prompt"], use_cache=req["use_cache"], **limits)
+    if req["mode"] == "agent":
+        return stream_specific_agent(req["prompt"], req["agent"], req["use_cache"], **limits)
+    return stream_with_orchestrator_multi(req["prompt"], req["num_roles"], use_cache=req["use_cache"], **limits)
+
+
+def _call_soon(loop, callback, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        # Event loop already closed (server shutting down)
+        pass
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """Return (method, path, version, headers, body), or None when the client is gone."""
+    try:
+        line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+    except asyncio.TimeoutError:
+        return None
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method.upper(), target.split("?", 1)[0], version, headers, body
+
+
+def _head(status: int, headers: dict) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send(writer, status: int, body: bytes, content_type: str, headers: dict | None = None, keep_alive: bool = True):
+    head = {
+        "Content-Type": content_type,
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(headers or {}),
+    }
+    writer.write(_head(status, head) + body)
+    await writer.drain()
+
+
+async def _send_json(writer, status: int, payload: dict, headers: dict | None = None, keep_alive: bool = True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await _send(writer, status, body, "application/json; charset=utf-8", headers, keep_alive)
+
+
+def _sse(event: str, payload: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class AgentServer:
+    """Admission control and request handling; one instance per process."""
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="request")
+        # Requests holding or waiting for a pool thread; only changed on the event loop
+        self._admitted = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.status = "warming"
+        self.warm_error: str | None = None
+
+    def warm(self) -> None:
+        """Import crewai and build every agent so the first request does not pay for it."""
+        try:
+            for role in ROLE_NAMES:
+                get_agent(role)
+        except Exception as exc:
+            self.status, self.warm_error = "error", f"{type(exc).__name__}: {exc}"
+        else:
+            self.status = "ok"
+
+    def health(self) -> dict:
+        with self._lock:
+            running = self._running
+        health = {"status": self.status, "running": running, "queued": max(0, self._admitted - running)}
+        if self.warm_error:
+            health["error"] = self.warm_error
+        return health
+
+    def _release(self) -> None:
+        self._admitted -= 1
+
+    def _call(self, fn, request_id: str):
+        with self._lock:
+            self._running += 1
+        try:
+            with metrics.request(request_id):
+                return fn()
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _submit(self, fn, request_id: str):
+        if self._admitted >= self.max_concurrent + self.max_queue:
+            raise HTTPError(429, "Server busy, retry later", {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        self._admitted += 1
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(self._call, fn, request_id)
+        # Freed when the work really ends (or is cancelled while still queued), not on timeout
+        future.add_done_callback(lambda _: _call_soon(loop, self._release))
+        return future
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as exc:
+                    await _send_json(writer, exc.status, {"error": str(exc)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                streamed = await self.dispatch(writer, method, path, headers, body, keep_alive)
+                if streamed or not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, writer, method: str, path: str, headers: dict, body: bytes, keep_alive: bool) -> bool:
+        """Answer one request; returns True when the response was streamed (connection must close)."""
+        request_id = headers.get("x-request-id") or uuid.uuid4().hex[:12]
+        try:
+            if path == "/healthz":
+                health = self.health()
+                await _send_json(writer, 200 if health["status"] == "ok" else 503, health, keep_alive=keep_alive)
+            elif path == "/metrics":
+                text = metrics.prometheus_text().encode("utf-8")
+                await _send(writer, 200, text, "text/plain; version=0.0.4; charset=utf-8", keep_alive=keep_alive)
+            elif path in ("/run", "/stream"):
+                if method != "POST":
+                    raise HTTPError(405, "Use POST", {"Allow": "POST"})
+                req = parse_run_request(body)
+                if path == "/stream":
+                    await self._stream(writer, req, request_id)
+                    return True
+                await self._run(writer, req, request_id, keep_alive)
+            else:
+                raise HTTPError(404, f"No route for {path}")
+        except HTTPError as exc:
+            await _send_json(
+                writer,
+                exc.status,
+                {"error": str(exc), "request_id": request_id},
+                {"X-Request-Id": request_id, **exc.headers},
+                keep_alive,
+            )
+        return False
+
+    async def _run(self, writer, req: dict, request_id: str, keep_alive: bool) -> None:
+        started = time.perf_counter()
+        future = self._submit(lambda: run_mode(req), request_id)
+        waiter = asyncio.wrap_future(future)
+        try:
+            outputs = await asyncio.wait_for(asyncio.shield(waiter), req["timeout"])
+        except asyncio.TimeoutError:
+            future.cancel()
+            # The run finishes (or fails) later with nobody waiting for it
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise HTTPError(504, f"Timed out after {req['timeout']:g}s") from None
+        except Exception as exc:
+            raise HTTPError(500, f"{type(exc).__name__}: {exc}") from None
+        await _send_json(
+            writer,
+            200,
+            {
+                "request_id": request_id,
+                "mode": req["mode"],
+                "outputs": {role: str(text) for role, text in outputs.items()},
+                "elapsed_s": round(time.perf_counter() - started, 3),
+            },
+            {"X-Request-Id": request_id},
+            keep_alive,
+        )
+
+    async def _stream(self, writer, req: dict, request_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce() -> None:
+            generator = stream_mode(req)
+            try:
+                for event in generator:
+                    _call_soon(loop, events.put_nowait, event)
+                    if stop.is_set():
+                        break
+            except Exception as exc:
+                _call_soon(loop, events.put_nowait, RoleEvent("Error", "error", f"{type(exc).__name__}: {exc}"))
+            finally:
+                generator.close()
+                _call_soon(loop, events.put_nowait, None)
+
+        started = time.perf_counter()
+        deadline = loop.time() + req["timeout"]
+        future = self._submit(produce, request_id)
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream; charset=utf-8",
+            "Cache-Control": "no-cache",
+            "Connection": "close",
+            "X-Request-Id": request_id,
+        }))
+        timed_out = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                try:
+                    event = await asyncio.wait_for(events.get(), min(remaining, SSE_HEARTBEAT_SECONDS))
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                if event is None:
+                    break
+                writer.write(_sse(event.kind, {"role": event.role, "text": event.text}))
+                await writer.drain()
+            if timed_out:
+                writer.write(_sse("error", {"role": "Server", "text": f"Timed out after {req['timeout']:g}s"}))
+            writer.write(_sse("end", {
+                "request_id": request_id,
+                "timed_out": timed_out,
+                "elapsed_s": round(time.perf_counter() - started, 3),
+            }))
+            await writer.drain()
+        finally:
+            # Client gone or timed out: stop forwarding and drop the run if it has not started
+            stop.set()
+            future.cancel()
+
+
+async def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, app: AgentServer | None = None) -> None:
+    app = app or AgentServer(SERVER_MAX_CONCURRENT, SERVER_MAX_QUEUE)
+    # Listen straight away; /healthz reports 503 until the agents are built
+    threading.Thread(target=app.warm, name="warm-agents", daemon=True).start()
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"Serving on http://{host}:{port} (max {app.max_concurrent} running, {app.max_queue} queued)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    host = args[args.index("--host") + 1] if "--host" in args else SERVER_HOST
+    port = int(args[args.index("--port") + 1]) if "--port" in args else SERVER_PORT
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
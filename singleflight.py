@@ -0,0 +1,99 @@
+"""Coalesce identical in-flight calls (singleflight).
+
+While a call for a key is running, further calls for the same key wait for
+it and get its result (or its exception) instead of starting their own.
+Only concurrent calls are merged: once the call ends the key is forgotten,
+so keeping finished results is left to result_cache.py.
+
+Cancellation: if the running call is interrupted by a BaseException that
+is not an Exception (KeyboardInterrupt, SystemExit, a cancelled task), the
+waiters are not handed that interruption; one of them runs the call again.
+A waiter that gives up after its timeout leaves the running call alone.
+"""
+import threading
+
+from config import SINGLEFLIGHT_ENABLED
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.interrupted = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn, timeout: float | None = None):
+        """Return (fn(), shared): shared is True when another caller's result was reused.
+
+        Raises TimeoutError if this caller waited longer than timeout for
+        another caller's run.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                    leader = True
+                else:
+                    call.waiters += 1
+                    self.coalesced += 1
+                    leader = False
+            if leader:
+                return self._lead(key, call, fn), False
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for the in-flight call for {key}")
+            if call.interrupted:
+                # Nobody produced a result; try again (possibly as the new leader)
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+    def _lead(self, key: str, call: _Call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        except BaseException:
+            call.interrupted = True
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+                "waiting": sum(c.waiters for c in self._calls.values()),
+            }
+
+
+_default: SingleFlight | None = None
+_default_lock = threading.Lock()
+
+
+def get_singleflight() -> SingleFlight | None:
+    """Process-wide SingleFlight for role runs, or None when SINGLEFLIGHT_ENABLED is off."""
+    global _default
+    if not SINGLEFLIGHT_ENABLED:
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = SingleFlight()
+        return _default
@@ -0,0 +1,193 @@
+"""Pool of authenticated SMTP sessions reused across send_email() calls.
+
+Opening a session costs a TCP connect, EHLO, STARTTLS and AUTH; a pooled
+session only costs a NOOP check before it is handed out again. Sessions
+idle for longer than max_idle_seconds are closed instead of checked (most
+servers drop idle clients after a few minutes anyway). If the server has
+dropped a session between the check and the send, the message is retried
+once on a fresh session.
+"""
+import atexit
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from config import (
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USERNAME,
+    SMTP_PASSWORD,
+    SMTP_STARTTLS,
+    SMTP_TIMEOUT_SECONDS,
+    SMTP_POOL_MAX_CONNECTIONS,
+    SMTP_POOL_IDLE_SECONDS,
+)
+
+
+class SMTPPool:
+    """At most max_connections SMTP sessions, shared by all threads.
+
+    smtp_factory(host, port, timeout) creates the client; it defaults to
+    smtplib.SMTP and can be replaced to point the pool at a local test
+    server. Without a username the pool skips AUTH.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        max_connections: int = 2,
+        max_idle_seconds: float = 60,
+        timeout: float = 30,
+        smtp_factory=smtplib.SMTP,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.max_connections = max(1, int(max_connections))
+        self.max_idle_seconds = float(max_idle_seconds)
+        self.timeout = timeout
+        self.smtp_factory = smtp_factory
+        self.opened = 0
+        self.reused = 0
+        self.reconnects = 0
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle: list[tuple[object, float]] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        server = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password or "")
+        except Exception:
+            _quit(server)
+            raise
+        with self._lock:
+            self.opened += 1
+        return server
+
+    def _checkout(self):
+        with self._lock:
+            while self._idle:
+                server, idle_since = self._idle.pop()
+                if time.monotonic() - idle_since > self.max_idle_seconds:
+                    _quit(server)
+                    continue
+                break
+            else:
+                server = None
+        if server is not None:
+            try:
+                if server.noop()[0] == 250:
+                    with self._lock:
+                        self.reused += 1
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            _quit(server)
+        return self._connect()
+
+    def _checkin(self, server) -> None:
+        with self._lock:
+            if not self._closed:
+                self._idle.append((server, time.monotonic()))
+                return
+        _quit(server)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a live session; it goes back to the pool unless it failed."""
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except smtplib.SMTPServerDisconnected:
+                _quit(server)
+                raise
+            except smtplib.SMTPException:
+                # An SMTP reply (refused recipient, rejected data) leaves the
+                # session usable. These subclass OSError, so they come first.
+                self._checkin(server)
+                raise
+            except OSError:
+                # Socket-level failure (reset, timeout): the session is gone
+                _quit(server)
+                raise
+            except Exception:
+                self._checkin(server)
+                raise
+            self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def sendmail(self, from_addr: str, to_addrs: list[str], message: str) -> dict:
+        """Send one message, reconnecting once if the session was dropped."""
+        try:
+            with self.connection() as server:
+                return server.sendmail(from_addr, to_addrs, message)
+        except smtplib.SMTPServerDisconnected:
+            with self._lock:
+                self.reconnects += 1
+            with self.connection() as server:
+                return server.sendmail(from_addr, to_addrs, message)
+
+    def close(self) -> None:
+        """Quit every idle session; sessions in use are closed on return."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            _quit(server)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "opened": self.opened,
+                "reused": self.reused,
+                "reconnects": self.reconnects,
+                "idle": len(self._idle),
+            }
+
+
+def _quit(server) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+_default_pool: SMTPPool | None = None
+_default_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Return the process-wide pool for the SMTP settings in .env."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SMTPPool(
+                SMTP_HOST,
+                SMTP_PORT,
+                SMTP_USERNAME,
+                SMTP_PASSWORD,
+                starttls=SMTP_STARTTLS,
+                max_connections=SMTP_POOL_MAX_CONNECTIONS,
+                max_idle_seconds=SMTP_POOL_IDLE_SECONDS,
+                timeout=SMTP_TIMEOUT_SECONDS,
+            )
+            atexit.register(_default_pool.close)
+        return _default_pool
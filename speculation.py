@@ -0,0 +1,249 @@
+"""Speculative role execution while the Orchestrator decides.
+
+Without explicit role keywords, run_with_orchestrator_multi waits for the
+Orchestrator (a full LLM call) before any role starts. With speculation the
+likeliest roles start at the same time as the Orchestrator:
+
+    speculation = get_speculator().start(prompt, num_roles, build_role_task, execute)
+    roles = decide_roles_with_orchestrator(prompt, num_roles)
+    speculation.resolve(roles)             # keep matching runs, cancel the rest
+    speculation.claim(role, task)          # the kept run's future (or None)
+
+Roles are predicted from the router's keyword scores (weak or fuzzy matches
+that were below ROUTER_CONFIDENCE_THRESHOLD) plus how often the Orchestrator
+chose each role before. Spend is capped per request by SPECULATION_MAX_ROLES
+and SPECULATION_MAX_TOKENS (estimated prompt + completion tokens).
+
+Role runs have no side effects (email goes out only after the decision), so
+a wrong guess costs tokens only. Runs that were not started yet are
+cancelled; LLM calls already in progress finish in the background and their
+output is discarded (it still lands in the result cache). Hits, misses,
+wasted tokens and the head start gained are exported by stats() and as
+Prometheus gauges.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+from config import SPECULATION_MAX_ROLES, SPECULATION_MAX_TOKENS
+from ratelimit import estimate_call_tokens
+from router import ROLE_ORDER, route
+from streaming import capture_chunks
+
+# Weight of the Orchestrator's past choices (share of decisions, 0..1) next to keyword scores (0.6+ per match)
+HISTORY_WEIGHT = 0.5
+
+
+class _Run:
+    """One speculative role run; buffers stream chunks until a caller claims it."""
+
+    def __init__(self, role: str, task, estimated_tokens: int):
+        self.role = role
+        self.task = task
+        self.estimated_tokens = estimated_tokens
+        self.future: Future | None = None
+        self.started: float | None = None
+        self._chunks: list[str] = []
+        self._sink = None
+        self._lock = threading.Lock()
+
+    def on_chunk(self, text: str) -> None:
+        with self._lock:
+            self._chunks.append(text)
+            if self._sink is not None:
+                self._sink(text)
+
+    def attach(self, sink) -> None:
+        """Replay the chunks so far to sink, then forward new ones as they arrive."""
+        with self._lock:
+            for text in self._chunks:
+                sink(text)
+            self._sink = sink
+
+    def matches(self, task) -> bool:
+        # Pipeline tasks carry upstream context, so their description differs from the speculative one
+        return task.description == self.task.description and task.expected_output == self.task.expected_output
+
+
+class Speculation:
+    """Speculative runs for one request."""
+
+    def __init__(self, speculator: "Speculator", runs: list[_Run]):
+        self._speculator = speculator
+        self._runs = {run.role: run for run in runs}
+        self._kept: set[str] = set()
+        self._resolved = False
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(runs)), thread_name_prefix="speculate")
+
+    @property
+    def roles(self) -> list[str]:
+        return list(self._runs)
+
+    def _launch(self, execute, stream: bool) -> None:
+        for run in self._runs.values():
+            def work(run=run):
+                run.started = time.perf_counter()
+                if stream:
+                    with capture_chunks(run.role, run.on_chunk, run.task.agent):
+                        return execute(run.role, run.task)
+                return execute(run.role, run.task)
+
+            run.future = self._pool.submit(metrics.bind(work))
+
+    def resolve(self, chosen: list[str], keep: list[str] | None = None) -> None:
+        """Apply the Orchestrator's decision: runs for roles in keep (default chosen) stay, the rest go.
+
+        keep is narrower than chosen when some chosen roles will not run from
+        the prompt alone (pipeline roles that get upstream context).
+        """
+        if self._resolved:
+            return
+        self._resolved = True
+        keep = set(chosen if keep is None else keep)
+        now = time.perf_counter()
+        hits, head_start = [], 0.0
+        wasted, cancelled = [], []
+        for role, run in self._runs.items():
+            if role in keep:
+                self._kept.add(role)
+                hits.append(role)
+                if run.started is not None:
+                    head_start += now - run.started
+            elif run.future.cancel():
+                cancelled.append(role)
+            else:
+                wasted.append(role)
+                run.future.add_done_callback(self._speculator._discarded)
+        self._speculator._resolved(chosen, hits, wasted, cancelled, head_start)
+
+    def claim(self, role: str, task, on_chunk=None) -> Future | None:
+        """The kept speculative run for this role and task, or None to run it normally.
+
+        Each run is handed out once; on_chunk receives its buffered and future stream chunks.
+        """
+        run = self._runs.get(role)
+        if run is None or role not in self._kept or not run.matches(task):
+            return None
+        self._kept.discard(role)
+        if on_chunk is not None:
+            run.attach(on_chunk)
+        return run.future
+
+    def close(self) -> None:
+        """Cancel whatever is still queued; call once the request is finished."""
+        if not self._resolved:
+            self.resolve([])
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class Speculator:
+    def __init__(self, max_roles: int = 2, max_tokens: int = 6000):
+        self.max_roles = max(0, int(max_roles))
+        self.max_tokens = max(0, int(max_tokens))
+        self._history: Counter = Counter()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.cancelled = 0
+        self.missed = 0
+        self.head_start_s = 0.0
+        self.wasted_tokens = 0
+
+    def predict(self, user_input: str, limit: int) -> list[str]:
+        """Roles most likely to be chosen, best first (empty when there is no signal at all)."""
+        scores = route(user_input or "").scores
+        with self._lock:
+            total = sum(self._history.values())
+            shares = {role: count / total for role, count in self._history.items()} if total else {}
+        combined = {
+            role: scores.get(role, 0.0) + HISTORY_WEIGHT * shares.get(role, 0.0)
+            for role in ROLE_ORDER
+        }
+        ranked = sorted((role for role in ROLE_ORDER if combined[role] > 0), key=lambda role: -combined[role])
+        return ranked[: max(0, limit)]
+
+    def start(self, user_input: str, num_roles: int, build_task, execute, stream: bool = False) -> Speculation | None:
+        """Start the predicted roles within the spend cap; None when nothing is worth starting.
+
+        build_task(role, user_input) builds the task (as the final run will);
+        execute(role, task) runs it. With stream, chunks are buffered for claim().
+        """
+        runs, budget = [], self.max_tokens
+        for role in self.predict(user_input, min(int(num_roles), self.max_roles)):
+            task = build_task(role, user_input)
+            tokens = estimate_call_tokens(task.description + task.expected_output)
+            if tokens > budget:
+                break
+            budget -= tokens
+            runs.append(_Run(role, task, tokens))
+        if not runs:
+            return None
+        with self._lock:
+            self.requests += 1
+            self.started += len(runs)
+        speculation = Speculation(self, runs)
+        speculation._launch(execute, stream)
+        return speculation
+
+    def _resolved(self, chosen: list[str], hits: list[str], wasted: list[str], cancelled: list[str], head_start: float) -> None:
+        with self._lock:
+            self._history.update(chosen)
+            self.hits += len(hits)
+            self.wasted += len(wasted)
+            self.cancelled += len(cancelled)
+            # Chosen roles nobody guessed still wait for the Orchestrator
+            self.missed += len([role for role in chosen if role not in hits])
+            self.head_start_s += head_start
+
+    def _discarded(self, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        usage: dict = {}
+        metrics.add_usage(usage, future.result())
+        with self._lock:
+            self.wasted_tokens += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "started": self.started,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "cancelled": self.cancelled,
+                "missed": self.missed,
+                "hit_rate": round(self.hits / self.started, 3) if self.started else 0.0,
+                "head_start_s": round(self.head_start_s, 3),
+                "wasted_tokens": self.wasted_tokens,
+            }
+
+    def gauges(self) -> dict:
+        stats = self.stats()
+        return {
+            "speculation_started_total": ("Roles started before the Orchestrator decided", stats["started"]),
+            "speculation_hits_total": ("Speculative roles the Orchestrator chose", stats["hits"]),
+            "speculation_wasted_total": ("Speculative roles run but not chosen", stats["wasted"]),
+            "speculation_cancelled_total": ("Speculative roles cancelled before they started", stats["cancelled"]),
+            "speculation_missed_total": ("Chosen roles that were not started speculatively", stats["missed"]),
+            "speculation_hit_rate": ("Share of speculative roles that were chosen", stats["hit_rate"]),
+            "speculation_head_start_seconds_total": ("Time kept runs had been running when the Orchestrator decided", stats["head_start_s"]),
+            "speculation_wasted_tokens_total": ("Tokens spent on speculative roles that were discarded", stats["wasted_tokens"]),
+        }
+
+
+_default_speculator: Speculator | None = None
+_default_lock = threading.Lock()
+
+
+def get_speculator() -> Speculator:
+    """Process-wide speculator configured in .env (history and counters are shared)."""
+    global _default_speculator
+    with _default_lock:
+        if _default_speculator is None:
+            _default_speculator = Speculator(SPECULATION_MAX_ROLES, SPECULATION_MAX_TOKENS)
+            metrics.add_gauges(_default_speculator.gauges)
+        return _default_speculator
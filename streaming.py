@@ -0,0 +1,108 @@
+"""Route crewai LLM stream chunks to the role that produced them.
+
+crewai publishes an LLMStreamChunkEvent on its event bus for every token
+chunk when the agent's LLM has stream=True. capture_chunks() registers a
+callback for the current thread (each role runs in its own worker thread)
+and falls back to matching the event's agent_role. When the installed
+crewai has no stream events, nothing is captured and callers only see the
+final result.
+"""
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+_sinks: dict[int, tuple[str, object]] = {}
+_lock = threading.Lock()
+_listener_state = {"installed": False, "available": False}
+
+
+@dataclass
+class RoleEvent:
+    """One step of a streamed run.
+
+    kind is "selected" (text lists the chosen roles), "chunk" (partial
+    output), "done" (final output) or "error" (failure message).
+    """
+    role: str
+    kind: str
+    text: str = ""
+
+
+def _dispatch(agent_role: str | None, chunk: str) -> None:
+    if not chunk:
+        return
+    with _lock:
+        sink = _sinks.get(threading.get_ident())
+        if sink is None and agent_role:
+            matches = [s for s in _sinks.values() if s[0] == agent_role]
+            sink = matches[0] if len(matches) == 1 else None
+    if sink is not None:
+        sink[1](chunk)
+
+
+def _install_listener() -> bool:
+    with _lock:
+        if _listener_state["installed"]:
+            return _listener_state["available"]
+        _listener_state["installed"] = True
+        try:
+            from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+        except ImportError:
+            try:
+                from crewai.utilities.events import crewai_event_bus, LLMStreamChunkEvent
+            except ImportError:
+                return False
+
+        @crewai_event_bus.on(LLMStreamChunkEvent)
+        def _on_chunk(source, event):
+            _dispatch(getattr(event, "agent_role", None), getattr(event, "chunk", "") or "")
+
+        _listener_state["available"] = True
+        return True
+
+
+def streaming_available() -> bool:
+    """True when the installed crewai emits token stream events."""
+    return _install_listener()
+
+
+@contextmanager
+def capture_chunks(role: str, on_chunk, agent=None):
+    """Call on_chunk(text) for every LLM chunk produced while the block runs.
+
+    When agent is given, its LLM is switched to streaming mode first.
+    """
+    if _install_listener() and agent is not None:
+        llm = getattr(agent, "llm", None)
+        if llm is not None and hasattr(llm, "stream"):
+            llm.stream = True
+    ident = threading.get_ident()
+    with _lock:
+        _sinks[ident] = (role, on_chunk)
+    try:
+        yield
+    finally:
+        with _lock:
+            _sinks.pop(ident, None)
+
+
+def bind_sink(fn, mute: bool = False):
+    """Wrap fn to run on another thread with the calling thread's chunk sink.
+
+    With mute, chunks fn produces are dropped instead, e.g. for a duplicate
+    call whose output must not interleave with the original's.
+    """
+    owner = threading.get_ident()
+    with _lock:
+        sink = _sinks.get(owner)
+    if sink is None:
+        return fn
+    role, on_chunk = sink
+
+    def bound(*args, **kwargs):
+        if threading.get_ident() == owner and not mute:
+            return fn(*args, **kwargs)
+        with capture_chunks(role, (lambda chunk: None) if mute else on_chunk):
+            return fn(*args, **kwargs)
+
+    return bound
@@ -1,199 +1,122 @@
-from crewai import Task, Crew
-from agents import researcher, writer, summarizer, reviewer, orchestrator, emailer
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from agents import get_agent, ROLE_NAMES
+from config import ROUTER_CONFIDENCE_THRESHOLD
+from prompts import render
+from ratelimit import estimate_call_tokens, limited_call, settle_usage
+from router import route
+import metrics
 import re
 
-def get_task(input_text):
-    original_text = input_text
-    input_text = input_text.lower()
-
-    # Keyword aliases (include some common typos)
-    has_research = any(k in input_text for k in ["research", "reseach", "reaearch", "investigate", "explore"]) 
-    has_write = any(k in input_text for k in ["write", "article", "draft", "compose"]) 
-    has_summarize = any(k in input_text for k in ["summarize", "summary", "summarise", "summerize"]) 
-    has_review = any(k in input_text for k in ["review", "critique", "evaluate"]) 
-    has_email = any(k in input_text for k in ["email", "e-mail", "mail", "send mail", "send email", "send a mail", "send to", "mail to"]) 
-
-    if has_research:
-        return Task(
-            description=(
-                f"You are the Researcher. Conduct thorough, factual research on the topic below.\n"
-                f"- Provide structured sections with bullet points.\n"
-                f"- Cite key sources or references (titles/links if known).\n"
-                f"- Avoid writing prose articles; focus on findings.\n\n"
-                f"Topic: {original_text}"
-            ),
-            agent=researcher,
-            expected_output=(
-                "A structured research brief with key findings, evidence, and sources."
-            ),
-        ), "Researcher"
-
-    if has_write:
-        return Task(
-            description=(
-                f"You are the Writer. Create an engaging, well-structured article based on the topic below.\n"
-                f"- Include a clear intro, body with subheadings, and a conclusion.\n"
-                f"- Maintain a cohesive narrative; do not list bullets only.\n\n"
-                f"Topic: {original_text}"
-            ),
-            agent=writer,
-            expected_output=(
-                "A polished article (500-800 words) with headings and clear flow."
-            ),
-        ), "Writer"
-
-    if has_summarize:
-        return Task(
-            description=(
-                f"You are the Summarizer. Produce a concise summary of the topic below.\n"
-                f"- Capture only the most important points.\n"
-                f"- Use short bullet points and keep it under 150 words.\n\n"
-                f"Topic: {original_text}"
-            ),
-            agent=summarizer,
-            expected_output=(
-                "A bullet-point summary under 150 words highlighting key takeaways."
-            ),
-        ), "Summarizer"
-
-    if has_review:
-        return Task(
-            description=(
-                f"You are the Reviewer. Critically review the content/topic below.\n"
-                f"- Identify strengths, weaknesses, and potential improvements.\n"
-                f"- Provide 3-5 actionable suggestions.\n\n"
-                f"Subject: {original_text}"
-            ),
-            agent=reviewer,
-            expected_output=(
-                "A concise review with strengths, weaknesses, and 3-5 concrete improvements."
-            ),
-        ), "Reviewer"
-
-    if has_email:
-        return Task(
-            description=(
-                f"You are the Emailer. Draft a concise, professional email based on the user's request and any prior content.\n"
-                f"- Include a clear subject line.\n"
-                f"- Keep the body brief with key points.\n"
-                f"- Close with an appropriate sign-off.\n\n"
-                f"Prompt: {original_text}"
-            ),
-            agent=emailer,
-            expected_output=(
-                "A subject line and short email body ready to be sent."
-            ),
-        ), "Emailer"
+if TYPE_CHECKING:
+    from crewai import Task
+
+
+def _new_task(**kwargs) -> Task:
+    # crewai is imported on first use so non-LLM paths start quickly
+    from crewai import Task
+
+    return Task(**kwargs)
 
+
+def _kickoff(task: Task):
+    # Only used for Orchestrator decisions; recorded in metrics.py
+    from crewai import Crew
+
+    with metrics.measure("Orchestrator", kind="orchestrator", source="llm") as entry:
+        crew = Crew(agents=[task.agent], tasks=[task])
+        estimate = estimate_call_tokens(task.description + task.expected_output)
+        result = limited_call(crew.kickoff, estimate, "Orchestrator")
+        metrics.add_usage(entry, result, getattr(getattr(task.agent, "llm", None), "model", None), crew)
+        settle_usage(estimate, entry["prompt_tokens"] + entry["completion_tokens"])
+        return result
+
+
+def get_task(input_text):
+    """Task for the first role whose keywords appear in the text, as (task, role); (None, None) if none."""
+    # Whole-word keyword aliases (typos and inflections handled by router.py)
+    matched = route(input_text).roles
+    for role in ROLE_NAMES:
+        if role in matched:
+            return build_role_task(role, input_text), role
     return None, None
 
 
-# Builders for running a specific role on demand with the same prompt
-def build_research_task(original_text: str) -> Task:
-    return Task(
-        description=(
-            f"You are the Researcher. Conduct thorough, factual research on the topic below.\n"
-            f"- Provide structured sections with bullet points.\n"
-            f"- Cite key sources or references (titles/links if known).\n"
-            f"- Avoid writing prose articles; focus on findings.\n\n"
-            f"Topic: {original_text}"
-        ),
-        agent=researcher,
-        expected_output=(
-            "A structured research brief with key findings, evidence, and sources."
-        ),
+def _build_task(role: str, original_text: str, context: dict[str, str] | None = None) -> Task:
+    # Prompt layout and token budget live in prompts.py
+    prompt = render(role, original_text, context)
+    return _new_task(
+        description=prompt.description,
+        agent=get_agent(role),
+        expected_output=prompt.expected_output,
     )
 
 
-def build_writer_task(original_text: str) -> Task:
-    return Task(
-        description=(
-            f"You are the Writer. Create an engaging, well-structured article based on the topic below.\n"
-            f"- Include a clear intro, body with subheadings, and a conclusion.\n"
-            f"- Maintain a cohesive narrative; do not list bullets only.\n\n"
-            f"Topic: {original_text}"
-        ),
-        agent=writer,
-        expected_output=(
-            "A polished article (500-800 words) with headings and clear flow."
-        ),
-    )
+# Builders for running a specific role on demand with the same prompt
+def build_research_task(original_text: str, context: dict[str, str] | None = None) -> Task:
+    return _build_task("Researcher", original_text, context)
 
 
-def build_summarizer_task(original_text: str) -> Task:
-    return Task(
-        description=(
-            f"You are the Summarizer. Produce a concise summary of the topic below.\n"
-            f"- Capture only the most important points.\n"
-            f"- Use short bullet points and keep it under 150 words.\n\n"
-            f"Topic: {original_text}"
-        ),
-        agent=summarizer,
-        expected_output=(
-            "A bullet-point summary under 150 words highlighting key takeaways."
-        ),
-    )
+def build_writer_task(original_text: str, context: dict[str, str] | None = None) -> Task:
+    return _build_task("Writer", original_text, context)
 
 
-def build_reviewer_task(original_text: str) -> Task:
-    return Task(
-        description=(
-            f"You are the Reviewer. Critically review the content/topic below.\n"
-            f"- Identify strengths, weaknesses, and potential improvements.\n"
-            f"- Provide 3-5 actionable suggestions.\n\n"
-            f"Subject: {original_text}"
-        ),
-        agent=reviewer,
-        expected_output=(
-            "A concise review with strengths, weaknesses, and 3-5 concrete improvements."
-        ),
-    )
+def build_summarizer_task(original_text: str, context: dict[str, str] | None = None) -> Task:
+    return _build_task("Summarizer", original_text, context)
 
 
-def build_emailer_task(original_text: str) -> Task:
-    return Task(
-        description=(
-            f"You are the Emailer. Draft a concise, professional email based on the user's request and any prior content.\n"
-            f"- Include a clear subject line.\n"
-            f"- Keep the body brief with key points.\n"
-            f"- Close with an appropriate sign-off.\n\n"
-            f"Prompt: {original_text}"
-        ),
-        agent=emailer,
-        expected_output=(
-            "A subject line and short email body ready to be sent."
-        ),
-    )
+def build_reviewer_task(original_text: str, context: dict[str, str] | None = None) -> Task:
+    return _build_task("Reviewer", original_text, context)
+
 
+def build_emailer_task(original_text: str, context: dict[str, str] | None = None) -> Task:
+    return _build_task("Emailer", original_text, context)
 
-def get_all_role_tasks(original_text: str):
-    return {
-        "Researcher": build_research_task(original_text),
-        "Writer": build_writer_task(original_text),
-        "Summarizer": build_summarizer_task(original_text),
-        "Reviewer": build_reviewer_task(original_text),
-        "Emailer": build_emailer_task(original_text),
-    }
 
+ROLE_TASK_BUILDERS = {
+    "Researcher": build_research_task,
+    "Writer": build_writer_task,
+    "Summarizer": build_summarizer_task,
+    "Reviewer": build_reviewer_task,
+    "Emailer": build_emailer_task,
+}
 
-def decide_role_with_orchestrator(original_text: str) -> str | None:
+
+def build_role_task(role: str, original_text: str, context: dict[str, str] | None = None) -> Task:
+    """Build one role's task, optionally with upstream outputs as context."""
+    return ROLE_TASK_BUILDERS[role](original_text, context)
+
+
+def get_all_role_tasks(original_text: str, roles: list[str] | None = None):
+    """Build tasks for the given roles (all roles when None), skipping unknown ones."""
+    selected = ROLE_NAMES if roles is None else [r for r in roles if r in ROLE_TASK_BUILDERS]
+    return {role: ROLE_TASK_BUILDERS[role](original_text) for role in selected}
+
+
+def decide_role_with_orchestrator(original_text: str, use_router: bool = True) -> str | None:
     """Use the Orchestrator agent (LLM) to choose the best role name.
 
+    The local router answers first; the LLM is only asked when its confidence
+    is below ROUTER_CONFIDENCE_THRESHOLD (or use_router is False).
     Returns one of: Researcher, Writer, Summarizer, Reviewer, Emailer; or None.
     """
-    decision_task = Task(
-        description=(
-            "You are the Orchestrator. Decide which single role should handle the user's request.\n"
-            "Valid roles: Researcher, Writer, Summarizer, Reviewer, Emailer.\n"
-            "Return only the role name with no extra words.\n\n"
-            f"User request: {original_text}"
-        ),
-        agent=orchestrator,
-        expected_output="One of: Researcher | Writer | Summarizer | Reviewer | Emailer"
+    if use_router:
+        with metrics.measure("Router", kind="router", source="router") as entry:
+            decision = route(original_text)
+            entry["source"] = "router" if decision.confidence >= ROUTER_CONFIDENCE_THRESHOLD else "router_miss"
+        if decision.roles and decision.confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+            return max(decision.roles, key=lambda r: decision.scores.get(r, 0.0))
+
+    prompt = render("Orchestrator", original_text)
+    decision_task = _new_task(
+        description=prompt.description,
+        agent=get_agent("Orchestrator"),
+        expected_output=prompt.expected_output,
     )
 
-    crew = Crew(agents=[orchestrator], tasks=[decision_task])
-    raw = crew.kickoff()
+    raw = _kickoff(decision_task)
     if not raw:
         return None
     text = str(raw).strip()
@@ -203,26 +126,29 @@ def decide_role_with_orchestrator(original_text: str) -> str | None:
     return None
 
 
-def decide_roles_with_orchestrator(original_text: str, num_roles: int) -> list[str]:
+def decide_roles_with_orchestrator(original_text: str, num_roles: int, use_router: bool = True) -> list[str]:
     """Use the Orchestrator to pick up to num_roles distinct roles.
 
+    The local router answers first; the LLM is only asked when its confidence
+    is below ROUTER_CONFIDENCE_THRESHOLD (or use_router is False).
     Returns a list containing any of: Researcher, Writer, Summarizer, Reviewer, Emailer.
     """
     num = max(1, min(5, int(num_roles)))
-    decision_task = Task(
-        description=(
-            "You are the Orchestrator. Choose the top roles that should work on the user's request.\n"
-            "Valid roles: Researcher, Writer, Summarizer, Reviewer, Emailer.\n"
-            "Return only the role names, comma-separated, no extra words.\n"
-            f"Number of roles to return: {num}\n\n"
-            f"User request: {original_text}"
-        ),
-        agent=orchestrator,
-        expected_output="Comma-separated list of roles from: Researcher, Writer, Summarizer, Reviewer, Emailer"
+    if use_router:
+        with metrics.measure("Router", kind="router", source="router") as entry:
+            decision = route(original_text, num)
+            entry["source"] = "router" if decision.confidence >= ROUTER_CONFIDENCE_THRESHOLD else "router_miss"
+        if decision.roles and decision.confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+            return decision.roles
+    # The role count varies, so it goes after the request to keep the prefix stable
+    prompt = render("Orchestrator (multi)", original_text, suffix=f"\n\nNumber of roles to return: {num}")
+    decision_task = _new_task(
+        description=prompt.description,
+        agent=get_agent("Orchestrator"),
+        expected_output=prompt.expected_output,
     )
 
-    crew = Crew(agents=[orchestrator], tasks=[decision_task])
-    raw = crew.kickoff()
+    raw = _kickoff(decision_task)
     if not raw:
         return []
     text = str(raw)
@@ -241,18 +167,15 @@ def decide_roles_with_orchestrator(original_text: str, num_roles: int) -> list[s
 def detect_roles_from_text(original_text: str) -> list[str]:
     """Detect roles explicitly requested in the user text by keywords.
 
+    Uses the local router and only trusts it when its confidence reaches
+    ROUTER_CONFIDENCE_THRESHOLD; otherwise returns [] so callers ask the
+    Orchestrator.
     Returns a list of unique roles in order: Researcher, Writer, Summarizer, Reviewer, Emailer.
     """
-    text = (original_text or "").lower()
-    role_flags = {
-        "Researcher": any(k in text for k in ["research", "researcher"]),
-        "Writer": any(k in text for k in ["write","writer"]),
-        "Summarizer": any(k in text for k in ["summarize", "summary", "summarise", "summerize", "summarizer"]),
-        "Reviewer": any(k in text for k in ["review","reviewer"]) ,
-        "Emailer": any(k in text for k in ["email", "e-mail", "mail", "send mail", "send email", "send a mail"]) ,
-    }
-    ordered = ["Researcher", "Writer", "Summarizer", "Reviewer", "Emailer"]
-    return [r for r in ordered if role_flags[r]]
+    decision = route(original_text or "")
+    if decision.confidence < ROUTER_CONFIDENCE_THRESHOLD:
+        return []
+    return decision.roles
 
 
 def extract_email_addresses(original_text: str) -> list[str]:
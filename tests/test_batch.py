@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from batch import completed_ids, run_batch
+
+
+def _write_prompts(path, prompts):
+    path.write_text("".join(json.dumps({"id": i, "prompt": p}) + "\n" for i, p in prompts), encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    "failed_outputs",
+    [
+        {"Writer": "Failed to run Writer: boom"},
+        {"Writer": "Timed out: Writer did not finish within the 5s role timeout"},
+        {"Error": "Unknown agent 'Poet'."},
+    ],
+)
+def test_failed_prompts_are_retried_on_a_rerun(tmp_path, failed_outputs):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_prompts(source, [("a", "first"), ("b", "second")])
+
+    def flaky(prompt):
+        return failed_outputs if prompt == "second" else {"Writer": "An article"}
+
+    summary = run_batch(str(source), str(output), flaky)
+    assert (summary["completed"], summary["failed"]) == (1, 1)
+    assert completed_ids(str(output)) == {"a"}
+
+    calls = []
+
+    def fixed(prompt):
+        calls.append(prompt)
+        return {"Writer": "An article"}
+
+    summary = run_batch(str(source), str(output), fixed)
+    assert calls == ["second"]
+    assert (summary["completed"], summary["skipped"]) == (1, 1)
+    assert completed_ids(str(output)) == {"a", "b"}
+
+
+def test_raising_runner_is_recorded_as_failed(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_prompts(source, [("a", "first")])
+
+    def broken(prompt):
+        raise RuntimeError("no network")
+
+    run_batch(str(source), str(output), broken)
+    record = json.loads(output.read_text(encoding="utf-8"))
+    assert record["ok"] is False
+    assert record["error"] == "RuntimeError: no network"
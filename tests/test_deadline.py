@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import metrics
+from deadline import Budget, DeadlineExceeded, RoleTimeout, call_with_deadline, is_incomplete
+
+
+def test_call_with_deadline_returns_and_raises():
+    assert call_with_deadline(lambda: 42, 1.0) == 42
+    assert call_with_deadline(lambda: 42, None) == 42
+    with pytest.raises(ValueError):
+        call_with_deadline(lambda: int("x"), 1.0)
+    with pytest.raises(DeadlineExceeded):
+        call_with_deadline(lambda: time.sleep(0.5), 0.05)
+
+
+def test_role_timeout_message():
+    budget = Budget(role_timeout=0.05)
+    with pytest.raises(RoleTimeout) as info:
+        budget.run("Writer", lambda: time.sleep(0.5))
+    assert str(info.value).startswith("Timed out: Writer did not finish within the 0.05s role timeout")
+    assert is_incomplete(str(info.value))
+
+
+def test_request_deadline_skips_roles_not_started():
+    budget = Budget(total=0.05)
+    time.sleep(0.1)
+    assert budget.expired()
+    assert budget.remaining() == 0.0
+    with pytest.raises(RoleTimeout, match="was not started before"):
+        budget.run("Reviewer", lambda: "never")
+
+
+def test_role_deadline_is_the_earlier_limit():
+    budget = Budget(role_timeout=10, total=1)
+    started = time.monotonic()
+    assert budget.role_deadline(started) == budget.expires
+    assert Budget().role_deadline(started) is None
+    assert Budget().run("Writer", lambda: "done") == "done"
+
+
+def test_is_incomplete():
+    assert is_incomplete("Failed to run Writer: boom")
+    assert not is_incomplete("An article")
+
+
+def test_call_with_deadline_keeps_the_queue_time():
+    def role():
+        with metrics.measure("Writer", kind="deadline-test") as entry:
+            pass
+        return entry
+
+    def queued():
+        return call_with_deadline(role, timeout=5)
+
+    bound = metrics.bind(queued)
+    time.sleep(0.05)
+    entry = bound()
+    assert entry["queue_s"] >= 0.05
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from hedge import Hedger, simulate
+
+
+def _warm(hedger, key="role", seconds=0.01):
+    for _ in range(hedger.min_samples):
+        hedger.call(key, lambda: time.sleep(seconds))
+
+
+def test_no_hedge_until_enough_samples():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    assert hedger.delay("role") is None
+    _warm(hedger)
+    assert hedger.delay("role") is not None
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_beaten_by_backup():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    _warm(hedger)
+    result, hedge = hedger.call("role", lambda: time.sleep(0.5) or "primary", lambda: "backup")
+    assert (result, hedge) == ("backup", "won")
+    assert hedger.stats()["won"] == 1
+
+
+def test_fast_primary_sends_no_hedge():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    _warm(hedger, seconds=0.05)
+    backup_ran = threading.Event()
+    result, hedge = hedger.call("role", lambda: "primary", backup_ran.set)
+    assert (result, hedge) == ("primary", None)
+    assert not backup_ran.is_set()
+
+
+def test_failed_attempt_falls_back_to_the_other():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    _warm(hedger)
+
+    def primary():
+        time.sleep(0.1)
+        raise RuntimeError("primary failed")
+
+    result, hedge = hedger.call("role", primary, lambda: time.sleep(0.2) or "backup")
+    assert (result, hedge) == ("backup", "won")
+
+
+def test_error_raised_when_every_attempt_fails():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    _warm(hedger)
+
+    def fail():
+        time.sleep(0.1)
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        hedger.call("role", fail, fail)
+
+
+def test_rate_cap_limits_hedges():
+    # The median stays at the warm-up latency, so every slow call wants a hedge
+    hedger = Hedger(percentile=0.5, min_samples=20, max_rate=0.1)
+    _warm(hedger)
+    for _ in range(10):
+        hedger.call("role", lambda: time.sleep(0.05), lambda: time.sleep(0.05))
+    stats = hedger.stats()
+    assert stats["calls"] == 30
+    assert 1 <= stats["hedged"] <= 3
+
+
+def test_simulated_slow_backend_tail_drops():
+    report = simulate(calls=400, slow_rate=0.05, slow_factor=8, latency_ms=10, concurrency=8)
+    assert report["hedged"]["p99_ms"] < report["plain"]["p99_ms"]
+    assert report["hedges"]["hedge_rate"] <= 0.1
@@ -0,0 +1,32 @@
+import threading
+
+import jobs
+from jobs import JobManager
+
+
+def test_cancel_during_submit_stops_the_job(monkeypatch):
+    ran = threading.Event()
+    monkeypatch.setattr(jobs.Job, "events", lambda self: ran.set() or iter(()))
+    manager = JobManager(max_workers=1)
+    blocker = threading.Event()
+    manager._pool.submit(blocker.wait)
+    results, threads = [], []
+    submit = manager._pool.submit
+
+    def submit_racing_cancel(fn, job):
+        # cancel() arrives while the job is registered but not yet handed to the pool
+        canceller = threading.Thread(target=lambda: results.append(manager.cancel(job.id)))
+        canceller.start()
+        canceller.join(0.2)
+        future = submit(fn, job)
+        threads.append(canceller)
+        return future
+
+    monkeypatch.setattr(manager._pool, "submit", submit_racing_cancel)
+    job_id = manager.submit("all", "solar storage")
+    threads[0].join()
+    blocker.set()
+    manager._pool.shutdown(wait=True)
+    assert results == [True]
+    assert manager.snapshot(job_id)["status"] == "cancelled"
+    assert not ran.is_set()
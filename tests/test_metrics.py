@@ -0,0 +1,49 @@
+import metrics
+
+
+def test_summary_groups_by_kind_and_role():
+    entries = [
+        {"kind": "router", "role": "Router", "wall_s": 0.001},
+        {"kind": "router", "role": "Router", "wall_s": 0.002},
+        {"kind": "orchestrator", "role": "Orchestrator", "wall_s": 2.0},
+        {"kind": "role", "role": "Writer", "wall_s": 3.0, "cache": "hit"},
+    ]
+    rows = {(row["kind"], row["role"]): row for row in metrics.summarize(entries)}
+    assert rows[("router", "Router")]["count"] == 2
+    assert rows[("orchestrator", "Orchestrator")]["p50_s"] == 2.0
+    assert rows[("role", "Writer")]["cache_hits"] == 1
+
+
+def test_record_rotates_the_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "METRICS_JSONL_PATH", path)
+    monkeypatch.setattr(metrics, "METRICS_JSONL_MAX_BYTES", 200)
+    for _ in range(10):
+        metrics.record({"kind": "role", "role": "Writer", "wall_s": 1.0})
+    assert (tmp_path / "metrics.jsonl.1").exists()
+    assert (tmp_path / "metrics.jsonl").stat().st_size < 200 + 100
+
+
+def test_measure_records_errors_and_request_id():
+    with metrics.request("req-1"):
+        try:
+            with metrics.measure("Writer") as entry:
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    assert entry["request_id"] == "req-1"
+    assert entry["error"] == "ValueError: boom"
+
+
+def test_cache_hits_stay_out_of_the_percentiles():
+    entries = [
+        {"kind": "role", "role": "Writer", "wall_s": 3.0},
+        {"kind": "role", "role": "Writer", "wall_s": 0.001, "cache": "hit"},
+        {"kind": "role", "role": "Writer", "wall_s": 0.002, "cache": "semantic"},
+        {"kind": "role", "role": "Writer", "wall_s": 0.003, "cache": "coalesced"},
+    ]
+    (row,) = metrics.summarize(entries)
+    assert row["count"] == 4
+    assert row["timed"] == 1
+    assert row["p50_s"] == 3.0
+    assert 'agents_duration_seconds_count{kind="role",role="Writer"} 1' in metrics.prometheus_text(entries)
@@ -0,0 +1,82 @@
+import smtplib
+
+import pytest
+
+from outbox import Outbox, make_email_key
+
+
+class FakeSender:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def __call__(self, subject, body, recipients):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((subject, recipients))
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "outbox.sqlite3")
+
+
+def test_queued_message_is_sent(outbox_path):
+    sender = FakeSender()
+    outbox = Outbox(outbox_path, sender=sender)
+    entry = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    assert entry["status"] in ("queued", "sending", "sent")
+    assert outbox.drain(5) == 0
+    assert sender.sent == [("Hi", ["a@example.com"])]
+    assert outbox.status(entry["id"])["status"] == "sent"
+
+
+def test_same_request_is_sent_once_and_reports_sent(outbox_path):
+    sender = FakeSender()
+    outbox = Outbox(outbox_path, sender=sender)
+    outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    outbox.drain(5)
+    again = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    outbox.drain(5)
+    assert again["status"] == "sent"
+    assert len(sender.sent) == 1
+
+
+def test_same_content_from_another_request_is_sent_again(outbox_path):
+    sender = FakeSender()
+    outbox = Outbox(outbox_path, sender=sender)
+    first = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    outbox.drain(5)
+    second = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r2")
+    outbox.drain(5)
+    assert first["id"] != second["id"]
+    assert len(sender.sent) == 2
+
+
+def test_permanent_rejection_is_dead_and_reported(outbox_path):
+    refused = smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")})
+    outbox = Outbox(outbox_path, sender=FakeSender([refused]))
+    entry = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    outbox.drain(5)
+    again = outbox.enqueue("Hi", "Body", ["a@example.com"], scope="r1")
+    assert again["status"] == "dead"
+    assert "SMTPRecipientsRefused" in again["last_error"]
+    assert outbox.requeue(entry["id"])
+    outbox.drain(5)
+    assert outbox.status(entry["id"])["status"] == "sent"
+
+
+def test_transient_failure_is_retried(outbox_path):
+    sender = FakeSender([OSError("connection reset")])
+    outbox = Outbox(outbox_path, sender=sender, backoff_seconds=0.05)
+    entry = outbox.enqueue("Hi", "Body", ["a@example.com"])
+    assert outbox.drain(5) == 0
+    status = outbox.status(entry["id"])
+    assert status["status"] == "sent"
+    assert status["attempts"] == 2
+
+
+def test_key_is_independent_of_recipient_order():
+    assert make_email_key("s", "b", ["b@x.org", "a@x.org"], "r") == make_email_key("s", "b", ["a@x.org", "b@x.org"], "r")
+    assert make_email_key("s", "b", ["a@x.org"], "r1") != make_email_key("s", "b", ["a@x.org"], "r2")
+
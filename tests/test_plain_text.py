@@ -0,0 +1,18 @@
+import pytest
+
+from bench_plain_text import GOLDEN_CORPUS, legacy_to_plain_text
+from plain_text import PlainTextConverter, convert, to_plain_text
+
+
+@pytest.mark.parametrize("doc", GOLDEN_CORPUS)
+def test_convert_and_chunked_converter_match_reference(doc):
+    expected = legacy_to_plain_text(doc)
+    assert convert(doc) == expected
+    converter = PlainTextConverter()
+    for start in range(0, len(doc), 7):
+        converter.feed(doc[start:start + 7])
+    assert converter.close() == expected
+
+
+def test_to_plain_text_accepts_none():
+    assert to_plain_text(None) == ""
@@ -0,0 +1,21 @@
+from prompts import TEMPLATES, render, variable_text
+
+
+def test_prefix_is_the_role_instructions_only():
+    template = TEMPLATES["Writer"]
+    assert template.prefix == f"{template.instructions}\n\n{template.input_label}: "
+    assert render("Writer", "one topic").description.startswith(template.prefix)
+    assert render("Writer", "another topic").description.startswith(template.prefix)
+
+
+def test_user_input_comes_after_the_stable_prefix():
+    rendered = render("Writer", "Solid-state batteries", context={"Researcher": "Findings"})
+    assert rendered.description.startswith(TEMPLATES["Writer"].prefix)
+    assert variable_text("Writer", rendered.description).startswith("Solid-state batteries")
+    assert rendered.description.endswith("Findings")
+
+
+def test_context_is_trimmed_before_the_prompt():
+    rendered = render("Writer", "Short topic", context={"Researcher": "word " * 5000}, max_tokens=300)
+    assert rendered.truncated
+    assert "Short topic" in rendered.description
@@ -0,0 +1,28 @@
+from ratelimit import is_rate_limit_error
+
+
+class FakeStatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_rate_limit_errors_are_recognised():
+    assert is_rate_limit_error(FakeStatusError("slow down", 429))
+    assert is_rate_limit_error(Exception("Error code: 429 - {'error': 'quota'}"))
+    assert is_rate_limit_error(Exception("HTTP/1.1 429 Too Many Requests"))
+    assert is_rate_limit_error(Exception("Rate limit reached for gpt-4o-mini"))
+    try:
+        try:
+            raise Exception("status_code=429")
+        except Exception as inner:
+            raise RuntimeError("Failed to run Writer") from inner
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped)
+
+
+def test_other_errors_containing_429_are_not():
+    assert not is_rate_limit_error(Exception("context length is 4290 tokens"))
+    assert not is_rate_limit_error(Exception("invalid request id req_429abc"))
+    assert not is_rate_limit_error(Exception("prompt has 429 tokens, maximum is 128"))
+    assert not is_rate_limit_error(FakeStatusError("server error", 500))
@@ -0,0 +1,53 @@
+import time
+
+from result_cache import ResultCache, make_cache_key
+
+
+def test_key_depends_on_every_input():
+    base = make_cache_key("Writer", "desc", "out", {"model": "a"})
+    assert base == make_cache_key("Writer", "desc", "out", {"model": "a"})
+    assert base != make_cache_key("Writer", "desc", "out", {"model": "b"})
+    assert base != make_cache_key("Reviewer", "desc", "out", {"model": "a"})
+    assert base != make_cache_key("Writer", "other", "out", {"model": "a"})
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = ResultCache(None, max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_values_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    ResultCache(path).set("k", "v")
+    assert ResultCache(path).get("k") == "v"
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), ttl_seconds=0.05)
+    cache.set("k", "v")
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+
+def test_file_keeps_at_most_max_rows(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_entries=1, max_rows=3)
+    for i in range(6):
+        cache.set(str(i), f"v{i}")
+    rows = cache._db.execute("SELECT key FROM results ORDER BY key").fetchall()
+    assert [key for (key,) in rows] == ["3", "4", "5"]
+
+
+def test_a_miss_is_counted_once(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    assert cache.get("missing") is None
+    assert cache.get("missing", count=False) is None
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from router import route, route_batch
+from router_corpus import LABELLED_PROMPTS, evaluate_router
+
+
+def test_corpus_answers_agree_with_labels():
+    report = evaluate_router(threshold=0.7)
+    assert report["misses"] == []
+    assert report["coverage"] >= 0.75
+
+
+@pytest.mark.parametrize(
+    "prompt, roles",
+    [
+        ("reaearch the history of the printing press", ["Researcher"]),
+        ("summerize the main causes of inflation", ["Summarizer"]),
+        ("Research and summarize topic X and email results to name@example.com", ["Researcher", "Summarizer", "Emailer"]),
+    ],
+)
+def test_typos_and_multiple_roles(prompt, roles):
+    assert route(prompt).roles == roles
+
+
+def test_keywords_only_match_whole_words():
+    decision = route("Check my gmail settings guide for mistakes")
+    assert "Emailer" not in decision.roles
+
+
+def test_address_alone_selects_emailer():
+    decision = route("results to ops@example.org")
+    assert decision.roles == ["Emailer"]
+    assert "ops@example.org" in decision.evidence["Emailer"]
+
+
+def test_no_match_has_zero_confidence():
+    decision = route("Tell me about the Roman empire")
+    assert decision.roles == []
+    assert decision.confidence == 0.0
+
+
+def test_single_fuzzy_match_stays_below_threshold():
+    assert route("reserch it").confidence < 0.7
+
+
+def test_max_roles_keeps_the_strongest():
+    decision = route("Research research research, then write and email it", max_roles=1)
+    assert decision.roles == ["Researcher"]
+
+
+def test_route_batch_matches_route():
+    prompts = [prompt for prompt, _ in LABELLED_PROMPTS[:5]] * 2
+    assert [d.roles for d in route_batch(prompts)] == [route(p).roles for p in prompts]
@@ -0,0 +1,39 @@
+from sanitize import Rule, Sanitizer, secret_rules
+
+
+def _sanitizer():
+    return Sanitizer()
+
+
+def test_boilerplate_lines_are_dropped():
+    text = "Subject: Hi\nDear Team,\nThe findings.\nBest regards,\n[Your Name]"
+    assert _sanitizer().sanitize(text) == "The findings."
+
+
+def test_block_rule_drops_until_blank_line():
+    text = "Intro\nTo send this email, run:\nsmtp login\nsend\n\nAfter"
+    assert _sanitizer().sanitize(text) == "Intro\nAfter"
+
+
+def test_secret_lines_are_dropped():
+    sanitizer = Sanitizer(secret_rules(["smtp_*", "openai_api_key"]))
+    text = "Keep\nSMTP_PASSWORD = hunter2\nOPENAI_API_KEY=sk-123\nKeep too"
+    assert sanitizer.sanitize(text) == "Keep\nKeep too"
+    assert sanitizer.stats() == {"secret:smtp_*": 1, "secret:openai_api_key": 1}
+
+
+def test_secret_on_the_line_after_a_near_match():
+    sanitizer = Sanitizer(secret_rules(["smtp_*"]))
+    text = "config: smtp_host\n= see below; SMTP_PASSWORD = hunter2\nnormal"
+    assert sanitizer.sanitize(text) == "config: smtp_host\nnormal"
+
+
+def test_custom_rule_spanning_lines_still_finds_the_next_line():
+    sanitizer = Sanitizer([Rule("secret", r"token\s*=.*")])
+    text = "token\n= x; token = abc\nnormal"
+    assert sanitizer.sanitize(text) == "token\nnormal"
+
+
+def test_filter_lines_streams():
+    lines = ["Subject: x", "kept", "", "Dear Bob,", "also kept"]
+    assert list(_sanitizer().filter_lines(lines)) == ["kept", "also kept"]
@@ -0,0 +1,60 @@
+import pytest
+
+from semantic_cache import SemanticCache, cosine, vectorize
+
+
+def _similarity(a, b):
+    return cosine(vectorize(a), vectorize(b))
+
+
+def test_request_framing_does_not_count():
+    assert _similarity("research solar storage and email me", "please research solar storage, mail the results") > 0.99
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ("Research AI regulation in the US", "Research AI regulation"),
+        ("IT outsourcing", "outsourcing"),
+    ],
+)
+def test_acronyms_are_topic_words(a, b):
+    assert _similarity(a, b) < 0.9
+
+
+def test_paraphrase_hits_and_different_topic_misses():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("scope", "Writer", "write a blog post about solar storage", "Article")
+    hit = cache.lookup("scope", "Writer", "Please write a blog post on solar storage")
+    assert hit is not None and hit.output == "Article"
+    assert cache.lookup("scope", "Writer", "write a blog post about wind farms") is None
+    assert cache.lookup("other", "Writer", "write a blog post about solar storage") is None
+
+
+def test_different_formats_miss():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("scope", "Writer", "write an essay on solar storage", "Essay")
+    assert cache.lookup("scope", "Writer", "write a blog post on solar storage") is None
+    assert cache.lookup("scope", "Writer", "write an article on solar storage") is None
+    assert cache.lookup("scope", "Writer", "compose an essay about solar storage") is not None
+
+
+def test_numbers_must_match():
+    cache = SemanticCache(threshold=0.5)
+    cache.add("scope", "Summarizer", "summarize inflation in 100 words", "Short")
+    assert cache.lookup("scope", "Summarizer", "summarize inflation in 500 words") is None
+
+
+def test_emailer_output_is_never_reused():
+    cache = SemanticCache(threshold=0.5)
+    cache.add("scope", "Emailer", "email the report to a@example.com", "Dear A")
+    assert cache.lookup("scope", "Emailer", "email the report to b@example.com") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=1, threshold=0.9)
+    cache.add("scope", "Writer", "solar storage", "A")
+    cache.add("scope", "Writer", "wind farms", "B")
+    assert cache.lookup("scope", "Writer", "solar storage") is None
+    assert cache.lookup("scope", "Writer", "wind farms").output == "B"
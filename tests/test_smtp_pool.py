@@ -0,0 +1,77 @@
+import smtplib
+
+import pytest
+
+from bench_offline import SMTPSink
+from smtp_pool import SMTPPool
+
+
+class FakeSMTP:
+    def __init__(self, host, port, timeout=None, errors=None):
+        self.errors = errors if errors is not None else []
+        self.closed = False
+
+    def noop(self):
+        return (250, b"OK")
+
+    def sendmail(self, from_addr, to_addrs, message):
+        if self.errors:
+            raise self.errors.pop(0)
+        return {}
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
+
+
+def _pool(errors):
+    return SMTPPool(
+        "smtp.test", 25, starttls=False, max_connections=1,
+        smtp_factory=lambda host, port, timeout: FakeSMTP(host, port, timeout, errors),
+    )
+
+
+def test_smtp_pool_reuses_sessions_with_local_server():
+    sink = SMTPSink()
+    try:
+        pool = SMTPPool("127.0.0.1", sink.port, "user", "secret", starttls=False, max_connections=1)
+        for _ in range(3):
+            pool.sendmail("from@example.com", ["to@example.com"], "Subject: hi\r\n\r\nbody")
+        pool.close()
+        assert sink.messages == 3
+        assert pool.stats()["opened"] == 1
+        assert pool.stats()["reused"] == 2
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}),
+        smtplib.SMTPDataError(554, b"message rejected"),
+    ],
+)
+def test_smtp_reply_errors_keep_the_session(error):
+    pool = _pool([error])
+    with pytest.raises(type(error)):
+        pool.sendmail("from@example.com", ["a@example.com"], "body")
+    pool.sendmail("from@example.com", ["b@example.com"], "body")
+    assert pool.stats()["opened"] == 1
+    assert pool.stats()["reused"] == 1
+
+
+def test_socket_errors_drop_the_session():
+    pool = _pool([ConnectionResetError("reset")])
+    with pytest.raises(ConnectionResetError):
+        pool.sendmail("from@example.com", ["a@example.com"], "body")
+    pool.sendmail("from@example.com", ["a@example.com"], "body")
+    assert pool.stats()["opened"] == 2
+
+
+def test_dropped_session_is_retried_once():
+    pool = _pool([smtplib.SMTPServerDisconnected("gone")])
+    pool.sendmail("from@example.com", ["a@example.com"], "body")
+    assert pool.stats()["reconnects"] == 1